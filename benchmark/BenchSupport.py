@@ -0,0 +1,270 @@
+import asyncio
+import os
+import resource
+import socket
+import struct
+import sys
+import tempfile
+
+import asyncssh
+import uvicorn
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT_DIR, "server")
+CLIENT_DIR = os.path.join(ROOT_DIR, "client")
+
+CHUNK_SIZE = 64 * 1024
+
+
+def get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def get_peak_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    def __init__(self, interval=0.05):
+        self.__interval = interval
+        self.__task = None
+        self.baseline = 0
+        self.peak = 0
+
+    async def __aenter__(self):
+        self.baseline = get_rss_bytes()
+        self.peak = self.baseline
+        self.__task = asyncio.create_task(self.__run())
+        return self
+
+    async def __aexit__(self, *exc):
+        self.__task.cancel()
+        self.peak = max(self.peak, get_rss_bytes())
+
+    async def __run(self):
+        while True:
+            self.peak = max(self.peak, get_rss_bytes())
+            await asyncio.sleep(self.__interval)
+
+    @property
+    def growth(self):
+        return self.peak - self.baseline
+
+
+async def pipe_stream(reader, writer):
+    try:
+        while True:
+            data = await reader.read(CHUNK_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+# ssh forward_socks 를 대신하는 로컬 SOCKS5 서버
+async def handle_socks_client(reader, writer):
+    try:
+        await negotiate_socks(reader, writer)
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+        writer.close()
+
+
+async def negotiate_socks(reader, writer):
+    header = await reader.readexactly(2)
+    await reader.readexactly(header[1])
+    writer.write(b"\x05\x00")
+
+    version, command, _, address_type = await reader.readexactly(4)
+    if address_type == 1:
+        host = socket.inet_ntoa(await reader.readexactly(4))
+    elif address_type == 3:
+        length = (await reader.readexactly(1))[0]
+        host = (await reader.readexactly(length)).decode()
+    else:
+        host = socket.inet_ntop(socket.AF_INET6, await reader.readexactly(16))
+    port = struct.unpack("!H", await reader.readexactly(2))[0]
+
+    upstream_reader, upstream_writer = await asyncio.open_connection(host, port)
+    writer.write(b"\x05\x00\x00\x01" + socket.inet_aton("0.0.0.0") + struct.pack("!H", 0))
+    await writer.drain()
+
+    await asyncio.gather(
+        pipe_stream(reader, upstream_writer),
+        pipe_stream(upstream_reader, writer)
+    )
+
+
+async def start_socks_server(port=None):
+    port = port or get_free_port()
+    server = await asyncio.start_server(handle_socks_client, "127.0.0.1", port)
+    return server, port
+
+
+# route_port 역할을 하는 더미 백엔드
+# GET /bytes/{n}: n 바이트 응답, POST /sink: 본문을 버리고 크기만 응답, 그 외: 짧은 JSON
+async def handle_backend_client(reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode().split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, value = line.decode().split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+            received = 0
+            remaining = int(headers.get("content-length", "0"))
+            while remaining:
+                data = await reader.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                received += len(data)
+                remaining -= len(data)
+
+            path = target.split("?", 1)[0]
+            if method == "GET" and path.startswith("/bytes/"):
+                size = int(path[len("/bytes/"):])
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n"
+                    + f"Content-Length: {size}\r\n\r\n".encode()
+                )
+                chunk = b"\0" * CHUNK_SIZE
+                while size:
+                    part = chunk if size >= CHUNK_SIZE else chunk[:size]
+                    writer.write(part)
+                    size -= len(part)
+                    await writer.drain()
+            else:
+                body = f'{{"method": "{method}", "path": "{path}", "received": {received}}}'.encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+    except (ConnectionError, ValueError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_backend_server(port=None):
+    port = port or get_free_port()
+    server = await asyncio.start_server(handle_backend_client, "127.0.0.1", port)
+    return server, port
+
+
+# 게이트웨이 호스트의 sshd 와 노드의 sshd 를 함께 대신하는 asyncssh 서버
+# 어떤 계정이든 허용하고 리버스/로컬 포워딩을 모두 허용
+class StandInSSHServer(asyncssh.SSHServer):
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return True
+
+    def connection_requested(self, dest_host, dest_port, orig_host, orig_port):
+        return True
+
+    def server_requested(self, listen_host, listen_port):
+        return True
+
+
+async def start_ssh_server(port=None):
+    port = port or get_free_port()
+    host_key = asyncssh.generate_private_key('ssh-ed25519')
+    server = await asyncssh.create_server(StandInSSHServer, "127.0.0.1", port, server_host_keys=[host_key])
+    return server, port
+
+
+def import_client_modules():
+    if CLIENT_DIR not in sys.path:
+        sys.path.insert(0, CLIENT_DIR)
+    import ClientAgent
+    import ClientNodeStatus
+    return ClientAgent, ClientNodeStatus
+
+
+# ClientNode 는 import 시 환경 변수를 기본값으로 덮어쓰므로 import 후에 다시 설정해야 함
+def import_client_node():
+    if CLIENT_DIR not in sys.path:
+        sys.path.insert(0, CLIENT_DIR)
+    import ClientNode
+    return ClientNode
+
+
+# ServerNode 는 현재 디렉터리에 nodes.db 를 만들기 때문에 임시 디렉터리에서 import
+def import_server_node():
+    if "ServerNode" in sys.modules:
+        return sys.modules["ServerNode"]
+    work_dir = tempfile.mkdtemp(prefix="gateway-bench-")
+    os.chdir(work_dir)
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)
+    import ServerNode
+    return ServerNode
+
+
+# 게이트웨이는 시작할 때 DB 의 연결 상태를 초기화하므로 start_uvicorn 이후에 호출
+async def register_node(server_node, node_name, route_port, proxy_port, reload=True):
+    server_node.Node.delete().where(server_node.Node.node_name == node_name).execute()
+    server_node.Node.create(
+        node_name=node_name,
+        node_password=node_name,
+        route_port=route_port,
+        proxy_port=proxy_port,
+        connection_valid=True
+    )
+    if reload:
+        await server_node.node_routing_table.load()
+
+
+async def start_uvicorn(app, port=None):
+    port = port or get_free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return server, task, port
+
+
+async def stop_uvicorn(server, task):
+    server.should_exit = True
+    await task
+
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    index = min(int(len(sorted_values) * percentile / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
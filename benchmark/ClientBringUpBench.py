@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from BenchSupport import (
+    import_client_modules, import_server_node, start_backend_server, start_ssh_server,
+    start_uvicorn, stop_uvicorn
+)
+
+# ClientAgent 로 N 개 노드를 DisconnectState -> EstablishedProxyPort 까지 올리는 시간 측정
+# asyncssh 대역 서버가 게이트웨이 호스트와 노드의 sshd 역할을 함께 한다
+# 사용법: python benchmark/ClientBringUpBench.py --nodes 100 1000 --concurrency 64
+
+
+async def measure_bring_up(client_agent_module, server_node, ssh_port, backend_port, nodes, concurrency):
+    node_names = [f"bench-{nodes}-{i}" for i in range(nodes)]
+    with server_node.db.atomic():
+        for node_name in node_names:
+            server_node.Node.create(node_name=node_name, node_password=node_name, route_port=backend_port)
+    await server_node.node_routing_table.load()
+
+    client_agent = client_agent_module.ClientAgent(max_concurrency=concurrency)
+    for node_name in node_names:
+        client_agent.add_node("127.0.0.1", ssh_port, node_name, node_name)
+
+    started = time.perf_counter()
+    results = await client_agent.bring_up_all()
+    elapsed = time.perf_counter() - started
+
+    # 서버 쪽 SOCKS 터널까지 모두 올라올 때까지 대기
+    while sum(
+        1 for node_name in node_names if server_node.node_routing_table.get(node_name).connection_valid
+    ) < nodes and time.perf_counter() - started < elapsed + 60:
+        await asyncio.sleep(0.05)
+    routable = time.perf_counter() - started
+
+    per_node = sorted(result.seconds for result in results if result.error is None)
+    errors = [result.error for result in results if result.error is not None]
+    await client_agent.close()
+    return {
+        "nodes": nodes,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "seconds_until_routable": routable,
+        "nodes_per_second": nodes / elapsed,
+        "per_node_p50": per_node[len(per_node) // 2] if per_node else None,
+        "per_node_p99": per_node[int(len(per_node) * 0.99)] if per_node else None,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+async def main(args):
+    ssh_server, ssh_port = await start_ssh_server()
+    backend_server, backend_port = await start_backend_server()
+    server_node = import_server_node()
+    gateway, gateway_task, gateway_port = await start_uvicorn(server_node.server_node_app)
+
+    os.environ['SERVER_CONTROL_API_PORT'] = str(gateway_port)
+    os.environ['SERVER_SSH_USER'] = "bench"
+    os.environ['SERVER_SSH_USER_PASSWORD'] = "bench"
+    os.environ['LOCAL_SSH_PORT'] = str(ssh_port)
+    client_agent_module, _ = import_client_modules()
+
+    results = []
+    try:
+        for nodes in args.nodes:
+            result = await measure_bring_up(
+                client_agent_module, server_node, ssh_port, backend_port, nodes, args.concurrency
+            )
+            results.append(result)
+            print(
+                f"{nodes:5d} nodes: {result['seconds']:.2f}s ({result['nodes_per_second']:.1f} nodes/s), "
+                f"routable after {result['seconds_until_routable']:.2f}s, "
+                f"per-node p50 {result['per_node_p50'] or 0:.3f}s p99 {result['per_node_p99'] or 0:.3f}s, "
+                f"errors {result['errors']}"
+            )
+    finally:
+        await stop_uvicorn(gateway, gateway_task)
+        ssh_server.close()
+        backend_server.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
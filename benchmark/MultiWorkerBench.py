@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from BenchSupport import (
+    SERVER_DIR, get_free_port, import_server_node, register_node, start_backend_server, start_socks_server,
+    start_uvicorn, stop_uvicorn
+)
+
+# /route 처리량 비교: ServerNode 단일 프로세스 vs RouteWorker 1개 / N개
+# SOCKS/백엔드 대역 서버와 부하 생성기는 각각 별도 프로세스에서 실행
+# 사용법: python benchmark/MultiWorkerBench.py --workers 1 4 --requests 20000 --clients 4
+
+
+async def serve_stand_ins(socks_port, backend_port):
+    socks_server, _ = await start_socks_server(socks_port)
+    backend_server, _ = await start_backend_server(backend_port)
+    async with socks_server, backend_server:
+        await asyncio.Event().wait()
+
+
+def run_stand_ins(socks_port, backend_port):
+    asyncio.run(serve_stand_ins(socks_port, backend_port))
+
+
+async def generate_load(url, total, concurrency):
+    remaining = [total]
+
+    async def worker(client):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            response = await client.get(url)
+            response.raise_for_status()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+
+
+def run_load(url, total, concurrency):
+    asyncio.run(generate_load(url, total, concurrency))
+    return total
+
+
+def measure_requests(pool, url, total, clients, concurrency):
+    # 워밍업 후 측정
+    pool.starmap(run_load, [(url, concurrency * 4, concurrency)] * clients)
+    started = time.perf_counter()
+    pool.starmap(run_load, [(url, total // clients, concurrency)] * clients)
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total // clients * clients,
+        "seconds": elapsed,
+        "requests_per_second": total // clients * clients / elapsed,
+    }
+
+
+async def wait_worker_synced(base_url, version, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                status = (await client.get("/routing/status")).json()
+                if status["version"] >= version:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise TimeoutError("Route worker did not sync")
+
+
+def start_route_workers(control_url, port, workers):
+    env = dict(
+        os.environ,
+        GATEWAY_CONTROL_URL=control_url,
+        ROUTE_WORKER_HOST="127.0.0.1",
+        ROUTE_WORKER_PORT=str(port),
+        ROUTE_WORKERS=str(workers),
+    )
+    return subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, "RouteWorker.py")],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def main(args):
+    socks_port, backend_port = get_free_port(), get_free_port()
+    stand_ins = multiprocessing.Process(target=run_stand_ins, args=(socks_port, backend_port), daemon=True)
+    stand_ins.start()
+
+    server_node = import_server_node()
+    gateway, gateway_task, gateway_port = await start_uvicorn(server_node.server_node_app)
+    await register_node(server_node, "bench-node", backend_port, socks_port)
+    control_url = f"http://127.0.0.1:{gateway_port}"
+
+    results = {"cpus": os.cpu_count(), "clients": args.clients, "concurrency": args.concurrency, "modes": {}}
+    loop = asyncio.get_running_loop()
+    with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+        try:
+            # 기존 방식: ServerNode 하나가 제어 API 와 /route 를 함께 처리
+            results["modes"]["server_node"] = await loop.run_in_executor(
+                None, measure_requests, pool, f"{control_url}/route/bench-node/ping",
+                args.requests, args.clients, args.concurrency
+            )
+            for workers in args.workers:
+                worker_port = get_free_port()
+                process = start_route_workers(control_url, worker_port, workers)
+                try:
+                    worker_url = f"http://127.0.0.1:{worker_port}"
+                    await wait_worker_synced(worker_url, server_node.node_routing_table.version)
+                    results["modes"][f"route_workers_{workers}"] = await loop.run_in_executor(
+                        None, measure_requests, pool, f"{worker_url}/route/bench-node/ping",
+                        args.requests, args.clients, args.concurrency
+                    )
+                finally:
+                    process.terminate()
+                    process.wait()
+        finally:
+            await stop_uvicorn(gateway, gateway_task)
+            stand_ins.terminate()
+
+    print(f"cpus {results['cpus']}, load clients {args.clients} x {args.concurrency}")
+    for mode, result in results["modes"].items():
+        print(f"{mode:18s} {result['requests_per_second']:8.1f} req/s ({result['requests']} requests)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
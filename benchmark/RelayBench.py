@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+from BenchSupport import (
+    RssSampler, format_bytes, get_percentile, import_client_node, import_server_node,
+    start_backend_server, start_ssh_server, start_uvicorn, stop_uvicorn
+)
+
+# 릴레이 경로 전체 벤치마크
+# asyncssh 대역 서버(게이트웨이 sshd + 노드 sshd), route_port 더미 백엔드, ServerNode, ClientNode 를 모두 loopback 에서 실행하고
+# ClientNode API 로 터널을 올린 뒤 /route 지연시간/처리량/RSS 와 연결/해제 반복 시간을 측정
+# 사용법:
+#   python benchmark/RelayBench.py --concurrency 1 16 64 --sizes 0 65536 --output result.json
+#   python benchmark/RelayBench.py --compare result.json --tolerance 0.2
+
+
+NODE_NAME = "relay-bench"
+ESTABLISHED_STATE = "EstablishedProxyPort"
+DISCONNECT_STATE = "Disconnect"
+
+
+async def wait_state(client_node_client, state_name, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client_node_client.get("/connction/status")
+        if response.json()["message"] == state_name:
+            return
+        await asyncio.sleep(0.005)
+    raise TimeoutError(f"ClientNode did not reach {state_name}")
+
+
+async def wait_routable(gateway_client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await gateway_client.get(f"/route/{NODE_NAME}/ping")
+        if response.status_code == 200:
+            return
+        await asyncio.sleep(0.005)
+    raise TimeoutError("Route did not become available")
+
+
+# DisconnectState -> EstablishedProxyPort (ClientNode /connction/proceed 반복)
+async def connect(client_node_client, gateway_client):
+    started = time.perf_counter()
+    for state_name in ("RequestConnectReverseSSHPort", "EstablishedReverseSSHPort",
+                       "RequestConnectProxyPort", ESTABLISHED_STATE):
+        await client_node_client.post("/connction/proceed")
+        await wait_state(client_node_client, state_name)
+    established = time.perf_counter() - started
+    await wait_routable(gateway_client)
+    return established, time.perf_counter() - started
+
+
+async def disconnect(client_node_client):
+    started = time.perf_counter()
+    for _ in range(4):
+        await client_node_client.post("/connection/back")
+    await wait_state(client_node_client, DISCONNECT_STATE)
+    return time.perf_counter() - started
+
+
+async def measure_route(base_url, method, size, total, concurrency):
+    if method == "GET":
+        path, content = f"/route/{NODE_NAME}/bytes/{size}", None
+    else:
+        path, content = f"/route/{NODE_NAME}/sink", b"\0" * size
+    latencies = []
+    remaining = [total]
+
+    async def worker(client):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = time.perf_counter()
+            response = await client.request(method, path, content=content)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        # 워밍업
+        await client.request(method, path, content=content)
+        async with RssSampler() as sampler:
+            started = time.perf_counter()
+            # 벤치마크 프로세스 전체(대역 sshd/백엔드 포함) CPU 시간이므로 같은 환경의 결과끼리만 비교
+            cpu_started = time.process_time()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            cpu_time = time.process_time() - cpu_started
+            elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "method": method,
+        "size": size,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50": get_percentile(latencies, 50),
+        "p99": get_percentile(latencies, 99),
+        "max": latencies[-1],
+        "cpu_per_request": cpu_time / len(latencies),
+        "rss_peak": sampler.peak,
+        "rss_growth": sampler.growth,
+    }
+
+
+# 게이트웨이가 기록한 연결 단계별 시간 (/node/onboarding)
+async def get_onboarding_steps(gateway_client):
+    response = await gateway_client.get("/node/onboarding", params={"node_name": NODE_NAME})
+    response.raise_for_status()
+    return response.json()["steps"]
+
+
+async def measure_churn(client_node_client, gateway_client, cycles):
+    connects = []
+    routables = []
+    disconnects = []
+    onboarding_steps = {}
+    for _ in range(cycles):
+        disconnects.append(await disconnect(client_node_client))
+        established, routable = await connect(client_node_client, gateway_client)
+        connects.append(established)
+        routables.append(routable)
+        for step, elapsed in (await get_onboarding_steps(gateway_client)).items():
+            onboarding_steps.setdefault(step, []).append(elapsed)
+    connects.sort()
+    routables.sort()
+    disconnects.sort()
+    return {
+        "cycles": cycles,
+        "connect_p50": get_percentile(connects, 50),
+        "connect_p99": get_percentile(connects, 99),
+        "routable_p50": get_percentile(routables, 50),
+        "routable_p99": get_percentile(routables, 99),
+        "disconnect_p50": get_percentile(disconnects, 50),
+        "disconnect_p99": get_percentile(disconnects, 99),
+        "onboarding_p50": {
+            step: get_percentile(sorted(values), 50) for step, values in onboarding_steps.items()
+        },
+    }
+
+
+def get_route_key(result):
+    return f"{result['method']} {result['size']} x{result['concurrency']}"
+
+
+# 이전 결과와 비교해 처리량이 tolerance 이상 떨어지거나 p99 / 요청당 CPU 시간이 그만큼 늘어난 항목을 반환
+def compare_results(baseline, results, tolerance):
+    regressions = []
+    baseline_routes = {get_route_key(result): result for result in baseline.get("route", [])}
+    for result in results["route"]:
+        previous = baseline_routes.get(get_route_key(result))
+        if previous is None:
+            continue
+        if result["requests_per_second"] < previous["requests_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{get_route_key(result)}: {previous['requests_per_second']:.1f} -> "
+                f"{result['requests_per_second']:.1f} req/s"
+            )
+        if result["p99"] > previous["p99"] * (1 + tolerance):
+            regressions.append(
+                f"{get_route_key(result)}: p99 {previous['p99'] * 1000:.2f} -> {result['p99'] * 1000:.2f} ms"
+            )
+        if "cpu_per_request" in previous and result["cpu_per_request"] > previous["cpu_per_request"] * (1 + tolerance):
+            regressions.append(
+                f"{get_route_key(result)}: cpu {previous['cpu_per_request'] * 1000:.3f} -> "
+                f"{result['cpu_per_request'] * 1000:.3f} ms/req"
+            )
+    return regressions
+
+
+async def main(args):
+    ssh_server, ssh_port = await start_ssh_server()
+    backend_server, backend_port = await start_backend_server()
+    server_node = import_server_node()
+    gateway, gateway_task, gateway_port = await start_uvicorn(server_node.server_node_app)
+
+    client_node = import_client_node()
+    os.environ['SERVER_CONTROL_API_PORT'] = str(gateway_port)
+    os.environ['SERVER_SSH_USER'] = "bench"
+    os.environ['SERVER_SSH_USER_PASSWORD'] = "bench"
+    os.environ['LOCAL_SSH_PORT'] = str(ssh_port)
+    client_node_server, client_node_task, client_node_port = await start_uvicorn(client_node.client_node_app)
+
+    gateway_url = f"http://127.0.0.1:{gateway_port}"
+    results = {"route": []}
+    gateway_client = httpx.AsyncClient(base_url=gateway_url)
+    client_node_client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{client_node_port}")
+    try:
+        response = await gateway_client.post("/node/account", json={
+            "node_name": NODE_NAME, "node_password": NODE_NAME, "node_ssh_password": NODE_NAME,
+            "route_port": backend_port
+        })
+        response.raise_for_status()
+        await client_node_client.post("/node/info", json={
+            "server_host": "127.0.0.1", "server_port": ssh_port,
+            "node_name": NODE_NAME, "node_password": NODE_NAME
+        })
+
+        established, routable = await connect(client_node_client, gateway_client)
+        onboarding_steps = await get_onboarding_steps(gateway_client)
+        results["tunnel_setup"] = {"established": established, "routable": routable, "onboarding": onboarding_steps}
+        print(f"tunnel setup: established {established * 1000:.1f} ms, routable {routable * 1000:.1f} ms")
+        print("onboarding: " + ", ".join(f"{step} {elapsed * 1000:.1f} ms" for step, elapsed in onboarding_steps.items()))
+
+        for method in args.methods:
+            for size in args.sizes:
+                for concurrency in args.concurrency:
+                    result = await measure_route(gateway_url, method, size, args.requests, concurrency)
+                    results["route"].append(result)
+                    print(
+                        f"{method:4s} {format_bytes(size):>10s} x{concurrency:<4d} "
+                        f"{result['requests_per_second']:8.1f} req/s  "
+                        f"p50 {result['p50'] * 1000:7.2f} ms  p99 {result['p99'] * 1000:7.2f} ms  "
+                        f"cpu {result['cpu_per_request'] * 1000:6.3f} ms/req  "
+                        f"rss {format_bytes(result['rss_peak'])}"
+                    )
+
+        if args.churn:
+            results["churn"] = await measure_churn(client_node_client, gateway_client, args.churn)
+            churn = results["churn"]
+            print(
+                f"churn x{args.churn}: connect p50 {churn['connect_p50'] * 1000:.1f} ms "
+                f"p99 {churn['connect_p99'] * 1000:.1f} ms, "
+                f"routable p50 {churn['routable_p50'] * 1000:.1f} ms "
+                f"p99 {churn['routable_p99'] * 1000:.1f} ms, "
+                f"disconnect p50 {churn['disconnect_p50'] * 1000:.1f} ms "
+                f"p99 {churn['disconnect_p99'] * 1000:.1f} ms"
+            )
+            print("onboarding p50: " + ", ".join(
+                f"{step} {elapsed * 1000:.1f} ms" for step, elapsed in churn["onboarding_p50"].items()
+            ))
+        await disconnect(client_node_client)
+    finally:
+        await gateway_client.aclose()
+        await client_node_client.aclose()
+        await stop_uvicorn(client_node_server, client_node_task)
+        await stop_uvicorn(gateway, gateway_task)
+        ssh_server.close()
+        backend_server.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--methods", nargs="+", default=["GET", "POST"], choices=["GET", "POST"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 64 * 1024])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--churn", type=int, default=10, help="connect/disconnect cycles (0 to skip)")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="previous --output file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    asyncio.run(main(parser.parse_args()))
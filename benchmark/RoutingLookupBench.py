@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from BenchSupport import (
+    import_server_node, register_node, start_backend_server, start_socks_server,
+    start_uvicorn, stop_uvicorn
+)
+
+# 노드 조회 비용 비교: 요청마다 DB 조회 vs 메모리 라우팅 테이블
+# 사용법: python benchmark/RoutingLookupBench.py --nodes 1000 --requests 5000
+
+
+# 기존 방식(요청마다 peewee 조회)을 라우팅 테이블 자리에 끼워 비교
+class DatabaseRouteLookup:
+    def __init__(self, node_model, route_class):
+        self.__node_model = node_model
+        self.__route_class = route_class
+
+    def get(self, node_name):
+        node_model = self.__node_model
+        node_instance = node_model.select().where(node_model.node_name == node_name).get()
+        return self.__route_class(
+            node_instance.node_name,
+            node_instance.route_port,
+            node_instance.proxy_port,
+            node_instance.connection_valid
+        )
+
+
+def measure_lookup(lookup, node_names, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        lookup.get(node_names[i % len(node_names)])
+    elapsed = time.perf_counter() - started
+    return {
+        "iterations": iterations,
+        "mean_us": elapsed / iterations * 1e6,
+        "lookups_per_second": iterations / elapsed,
+    }
+
+
+async def measure_requests(base_url, node_name, total, concurrency):
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get(f"{base_url}/route/{node_name}/ping")
+            response.raise_for_status()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "requests_per_second": total / elapsed,
+    }
+
+
+async def main(args):
+    socks_server, socks_port = await start_socks_server()
+    backend_server, backend_port = await start_backend_server()
+
+    server_node = import_server_node()
+    from NodeRoutingTable import NodeRoute
+    # 게이트웨이 시작 시 연결 상태를 초기화하므로 노드는 시작 후에 등록
+    gateway, gateway_task, gateway_port = await start_uvicorn(server_node.server_node_app)
+    with server_node.db.atomic():
+        for i in range(args.nodes):
+            await register_node(server_node, f"node-{i}", backend_port, socks_port, reload=False)
+    await server_node.node_routing_table.load()
+    routing_table = server_node.node_routing_table
+    database_lookup = DatabaseRouteLookup(server_node.Node, NodeRoute)
+    node_names = [f"node-{i}" for i in range(args.nodes)]
+
+    results = {
+        "nodes": args.nodes,
+        "lookup": {
+            "database": measure_lookup(database_lookup, node_names, args.lookups),
+            "table": measure_lookup(routing_table, node_names, args.lookups),
+        },
+        "route": {},
+    }
+
+    base_url = f"http://127.0.0.1:{gateway_port}"
+    try:
+        for mode, lookup in (("database", database_lookup), ("table", routing_table)):
+            server_node.route_forwarder.routing_table = lookup
+            results["route"][mode] = await measure_requests(
+                base_url, node_names[-1], args.requests, args.concurrency
+            )
+    finally:
+        server_node.route_forwarder.routing_table = routing_table
+        await stop_uvicorn(gateway, gateway_task)
+        socks_server.close()
+        backend_server.close()
+
+    for mode in ("database", "table"):
+        lookup = results["lookup"][mode]
+        route = results["route"][mode]
+        print(
+            f"{mode:8s} lookup {lookup['mean_us']:8.2f} us ({lookup['lookups_per_second']:10.0f}/s)  "
+            f"route {route['requests_per_second']:8.1f} req/s"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from BenchSupport import (
+    CHUNK_SIZE, RssSampler, format_bytes, import_server_node, register_node,
+    start_backend_server, start_socks_server, start_uvicorn, stop_uvicorn
+)
+
+# /route 프록시를 통한 대용량 업로드/다운로드 시 RSS가 일정하게 유지되는지 측정
+# 사용법: python benchmark/StreamMemoryBench.py --size-mb 4096
+
+
+async def upload_body(size):
+    chunk = b"\0" * CHUNK_SIZE
+    while size:
+        part = chunk if size >= CHUNK_SIZE else chunk[:size]
+        size -= len(part)
+        yield part
+
+
+async def measure_download(client, url, size):
+    received = 0
+    started = time.perf_counter()
+    first_byte = None
+    async with RssSampler() as sampler:
+        async with client.stream("GET", url) as response:
+            async for chunk in response.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                received += len(chunk)
+    elapsed = time.perf_counter() - started
+    assert received == size, f"received {received} of {size}"
+    return {
+        "bytes": received,
+        "seconds": elapsed,
+        "time_to_first_byte": first_byte,
+        "throughput_mib_s": received / elapsed / 1024 / 1024,
+        "rss_baseline": sampler.baseline,
+        "rss_peak": sampler.peak,
+        "rss_growth": sampler.growth,
+    }
+
+
+async def measure_upload(client, url, size):
+    started = time.perf_counter()
+    async with RssSampler() as sampler:
+        response = await client.post(
+            url,
+            content=upload_body(size),
+            headers={"Content-Length": str(size), "Content-Type": "application/octet-stream"}
+        )
+    elapsed = time.perf_counter() - started
+    received = response.json()["received"]
+    assert received == size, f"backend received {received} of {size}"
+    return {
+        "bytes": received,
+        "seconds": elapsed,
+        "throughput_mib_s": received / elapsed / 1024 / 1024,
+        "rss_baseline": sampler.baseline,
+        "rss_peak": sampler.peak,
+        "rss_growth": sampler.growth,
+    }
+
+
+async def main(args):
+    size = args.size_mb * 1024 * 1024
+    socks_server, socks_port = await start_socks_server()
+    backend_server, backend_port = await start_backend_server()
+
+    server_node = import_server_node()
+    gateway, gateway_task, gateway_port = await start_uvicorn(server_node.server_node_app)
+    await register_node(server_node, "bench", backend_port, socks_port)
+
+    base_url = f"http://127.0.0.1:{gateway_port}/route/bench"
+    results = {"size": size}
+    try:
+        async with httpx.AsyncClient(timeout=None) as client:
+            results["download"] = await measure_download(client, f"{base_url}/bytes/{size}", size)
+            results["upload"] = await measure_upload(client, f"{base_url}/sink", size)
+    finally:
+        await stop_uvicorn(gateway, gateway_task)
+        socks_server.close()
+        backend_server.close()
+
+    for name in ("download", "upload"):
+        result = results[name]
+        print(
+            f"{name:8s} {format_bytes(result['bytes'])} in {result['seconds']:.2f}s "
+            f"({result['throughput_mib_s']:.1f} MiB/s), "
+            f"RSS {format_bytes(result['rss_baseline'])} -> {format_bytes(result['rss_peak'])} "
+            f"(+{format_bytes(result['rss_growth'])})"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+
+from ClientNodeStatus import ConnectionMachine, ProceedException
+
+
+# BackgroundTasks 대신 asyncio 태스크로 터널을 실행
+class TaskRunner:
+    def __init__(self):
+        self.__tasks = set()
+
+    def add_task(self, func, *args, **kwargs):
+        task = asyncio.create_task(func(*args, **kwargs))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+        return task
+
+    async def close(self):
+        tasks = list(self.__tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class BringUpResult:
+    def __init__(self, node_name):
+        self.node_name = node_name
+        self.state_name = None
+        self.seconds = None
+        self.error = None
+
+
+# 하나의 프로세스에서 여러 노드의 ConnectionMachine 을 동시에 구동
+class ClientAgent:
+    def __init__(self, max_concurrency=None, state_timeout=None):
+        self.__max_concurrency = max_concurrency if max_concurrency is not None \
+            else int(os.getenv('CLIENT_AGENT_CONCURRENCY', '32'))
+        self.__state_timeout = state_timeout if state_timeout is not None \
+            else float(os.getenv('CLIENT_AGENT_STATE_TIMEOUT', '30'))
+        self.__semaphore = asyncio.Semaphore(self.__max_concurrency)
+        self.__task_runner = TaskRunner()
+        self.__machines = {}
+
+    @property
+    def machines(self):
+        return self.__machines
+
+    def add_node(self, server_host, server_port, node_name, node_password, services=None):
+        connection_machine = ConnectionMachine()
+        connection_machine.server_host = server_host
+        connection_machine.server_port = server_port
+        connection_machine.node_name = node_name
+        connection_machine.node_password = node_password
+        connection_machine.services = services
+        connection_machine.background_tasks = self.__task_runner
+        self.__machines[node_name] = connection_machine
+        return connection_machine
+
+    async def __wait_tunnel(self, connection_machine):
+        # 리버스 SSH 터널은 백그라운드 태스크에서 열리므로 상태 전이를 기다림 (실패하면 Disconnect 로 돌아감)
+        try:
+            state = await connection_machine.wait_until(lambda state: state.get_level() != 1, self.__state_timeout)
+        except asyncio.TimeoutError:
+            raise ProceedException(f"Timeout waiting for tunnel in {connection_machine.get_state_name()}")
+        if state.get_level() < 2:
+            raise ProceedException(f"Tunnel failed in {state.get_state_name()}")
+
+    async def __drive_up(self, connection_machine):
+        # DisconnectState(0) -> ... -> EstablishedProxyPort(4)
+        while connection_machine.state.get_level() < 4:
+            level = connection_machine.state.get_level()
+            state = await connection_machine.proceed()
+            if level == 1:
+                await self.__wait_tunnel(connection_machine)
+            elif state.get_level() == level:
+                raise ProceedException(f"No progress in {state.get_state_name()}")
+
+    async def bring_up(self, node_name):
+        connection_machine = self.__machines[node_name]
+        result = BringUpResult(node_name)
+        async with self.__semaphore:
+            started = time.perf_counter()
+            try:
+                await self.__drive_up(connection_machine)
+            except Exception as e:
+                result.error = getattr(e, "message", None) or repr(e)
+            result.seconds = time.perf_counter() - started
+        result.state_name = connection_machine.get_state_name()
+        return result
+
+    async def bring_up_all(self):
+        return await asyncio.gather(*(self.bring_up(node_name) for node_name in self.__machines))
+
+    async def tear_down(self, node_name):
+        connection_machine = self.__machines[node_name]
+        async with self.__semaphore:
+            while connection_machine.state.get_level() > 0:
+                await connection_machine.turn_back()
+
+    async def tear_down_all(self):
+        await asyncio.gather(
+            *(self.tear_down(node_name) for node_name in self.__machines),
+            return_exceptions=True
+        )
+
+    async def close(self):
+        await self.tear_down_all()
+        await self.__task_runner.close()
+        for connection_machine in self.__machines.values():
+            await connection_machine.aclose()
+
+    def get_status(self):
+        return {
+            node_name: connection_machine.get_state_name()
+            for node_name, connection_machine in self.__machines.items()
+        }
@@ -1,12 +1,18 @@
-from typing import Optional
+import asyncio
+import json
+from typing import Dict, List, Optional
 
 import uvicorn
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from ClientNodeStatus import ConnectionMachine, EstablishedProxyPort, DisconnectState
+from ClientAgent import ClientAgent
 
 connection_machine_instance = ConnectionMachine()
+# 여러 노드를 한 번에 구동하는 에이전트
+client_agent = None
 
 import os
 
@@ -18,6 +24,8 @@ os.environ["SERVER_SSH_USER_PASSWORD"] = ""
 os.environ["LOCAL_SSH_PORT"] = "22"
 
 client_node_app = FastAPI()
+# 종료가 시작되면 set. 열린 /connection/events 스트림을 끝내 종료를 막지 않도록 함
+client_node_app.state.stopping = asyncio.Event()
 
 
 class ConnectRequestModel(BaseModel):
@@ -25,12 +33,15 @@ class ConnectRequestModel(BaseModel):
     server_port: int
     node_name: str
     node_password: str
+    # 서비스 이름 -> 로컬 포트. 하나의 SSH 연결로 함께 노출됨
+    services: Optional[Dict[str, int]] = None
 
 class ConnectResponseModel(BaseModel):
     server_host: Optional[str]
     server_port: Optional[int]
     node_name: Optional[str]
     node_password: Optional[str]
+    services: Dict[str, int]
 
 
 
@@ -46,6 +57,7 @@ async def post_node_info(connect_request_model: ConnectRequestModel, background_
     connection_machine_instance.server_port = connect_request_model.server_port
     connection_machine_instance.node_name = connect_request_model.node_name
     connection_machine_instance.node_password = connect_request_model.node_password
+    connection_machine_instance.services = connect_request_model.services
     connection_machine_instance.background_tasks = background_tasks
 
     return {
@@ -59,6 +71,7 @@ async def get_node_info():
         "server_port": connection_machine_instance.server_port,
         "node_name": connection_machine_instance.node_name,
         "node_password": connection_machine_instance.node_password,
+        "services": connection_machine_instance.services,
     }
 
 @client_node_app.post("/connction/proceed", response_model=MessageModel)
@@ -75,6 +88,55 @@ async def get_connection_status():
         "message": connection_machine_instance.get_state_name()
     }
 
+# 상태 변경 이벤트 스트림 (Server-Sent Events): 연결하면 현재 상태를 보내고 이후 전이마다 한 건씩 전송
+# 이벤트가 없는 동안 프록시가 연결을 끊지 않도록 CONNECTION_EVENTS_KEEPALIVE 초마다 주석 줄 전송
+CONNECTION_EVENTS_KEEPALIVE = float(os.getenv('CONNECTION_EVENTS_KEEPALIVE', '15'))
+
+def format_state_event(connection_machine, state):
+    data = {
+        "node_name": connection_machine.node_name,
+        "state": state.get_state_name(),
+        "level": state.get_level()
+    }
+    return f"event: state\ndata: {json.dumps(data)}\n\n"
+
+@client_node_app.get("/connection/events")
+async def get_connection_events():
+    connection_machine = connection_machine_instance
+    states = asyncio.Queue()
+
+    def on_state_changed(connection_machine, old_state, new_state):
+        states.put_nowait(new_state)
+
+    async def stream_events():
+        connection_machine.subscribe(on_state_changed)
+        stopping = asyncio.ensure_future(client_node_app.state.stopping.wait())
+        next_state = None
+        try:
+            yield format_state_event(connection_machine, connection_machine.state)
+            while True:
+                if next_state is None:
+                    next_state = asyncio.ensure_future(states.get())
+                await asyncio.wait(
+                    [next_state, stopping], timeout=CONNECTION_EVENTS_KEEPALIVE, return_when=asyncio.FIRST_COMPLETED
+                )
+                if stopping.done():
+                    return
+                if not next_state.done():
+                    yield ": keepalive\n\n"
+                    continue
+                state, next_state = next_state.result(), None
+                yield format_state_event(connection_machine, state)
+        finally:
+            stopping.cancel()
+            if next_state is not None:
+                next_state.cancel()
+            connection_machine.unsubscribe(on_state_changed)
+
+    return StreamingResponse(
+        stream_events(), media_type="text/event-stream", headers={"cache-control": "no-cache"}
+    )
+
 # DISconnect 기능 추가
 
 @client_node_app.post("/connection/back", response_model=MessageModel)
@@ -85,6 +147,55 @@ async def disconnect_server_node():
     }
 
 
+class AgentNodesRequestModel(BaseModel):
+    nodes: List[ConnectRequestModel]
+
+@client_node_app.post("/agent/nodes", response_model=MessageModel)
+async def post_agent_nodes(agent_nodes_request_model: AgentNodesRequestModel):
+    global client_agent
+    if client_agent is None:
+        client_agent = ClientAgent()
+    for node in agent_nodes_request_model.nodes:
+        client_agent.add_node(node.server_host, node.server_port, node.node_name, node.node_password, node.services)
+    return {
+        "message": f"Registered {len(agent_nodes_request_model.nodes)} nodes"
+    }
+
+# 등록된 모든 노드를 EstablishedProxyPort 까지 자동으로 진행
+@client_node_app.post("/agent/up", response_model=MessageModel)
+async def post_agent_up(background_tasks: BackgroundTasks):
+    if client_agent is None:
+        raise HTTPException(status_code=400, detail="No agent nodes")
+    background_tasks.add_task(client_agent.bring_up_all)
+    return {
+        "message": "Agent bring-up started"
+    }
+
+@client_node_app.post("/agent/down", response_model=MessageModel)
+async def post_agent_down(background_tasks: BackgroundTasks):
+    if client_agent is None:
+        raise HTTPException(status_code=400, detail="No agent nodes")
+    background_tasks.add_task(client_agent.tear_down_all)
+    return {
+        "message": "Agent tear-down started"
+    }
+
+@client_node_app.get("/agent/status")
+async def get_agent_status():
+    if client_agent is None:
+        return {}
+    return client_agent.get_status()
+
+
+# uvicorn 은 열린 연결이 모두 끝나야 lifespan shutdown 을 실행하므로 그 전에 이벤트 스트림을 끝냄
+class ClientNodeServer(uvicorn.Server):
+    async def shutdown(self, sockets=None):
+        client_node_app.state.stopping.set()
+        await super().shutdown(sockets)
+
 
 if __name__ == '__main__':
-    uvicorn.run(client_node_app, host='0.0.0.0', port=58001)
+    ClientNodeServer(uvicorn.Config(
+        client_node_app, host='0.0.0.0', port=58001,
+        timeout_graceful_shutdown=float(os.getenv('CLIENT_SHUTDOWN_TIMEOUT', '10'))
+    )).run()
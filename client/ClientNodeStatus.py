@@ -1,11 +1,20 @@
 import asyncio
 import os
+import random
 import time
 from abc import ABC, abstractmethod
+from typing import Optional
 
 import asyncssh
 import httpx
 
+# 끊긴 SSH 연결 감지 (interval * count_max 초 안에 감지)
+SSH_KEEPALIVE_INTERVAL = float(os.getenv('SSH_KEEPALIVE_INTERVAL', '2'))
+SSH_KEEPALIVE_COUNT_MAX = int(os.getenv('SSH_KEEPALIVE_COUNT_MAX', '3'))
+# SSH 연결 압축 (느린 회선에서 전송량 감소, 대신 CPU 사용)
+SSH_COMPRESSION_ALGS = ['zlib@openssh.com', 'zlib', 'none'] \
+    if os.getenv('SSH_COMPRESSION', '0').lower() in ('1', 'true', 'yes') else ()
+
 class ProceedException(Exception):
     def __init__(self, message):
         self.message = message
@@ -17,7 +26,43 @@ class TurnBackException(Exception):
         super().__init__(self.message)
 
 
+# 제어 API 요청에 세션 토큰을 붙임. 토큰이 없거나 만료(401)되면 /node/login 으로 다시 받아 한 번만 재시도
+class NodeTokenAuth(httpx.Auth):
+    requires_response_body = True
+
+    def __init__(self, context):
+        self.__context = context
+
+    def auth_flow(self, request):
+        context = self.__context
+        logged_in = False
+        if context.node_token is None:
+            context.accept_login_response((yield context.build_login_request()))
+            logged_in = True
+        if context.node_token is not None:
+            request.headers["Authorization"] = f"Bearer {context.node_token}"
+        response = yield request
+
+        if response.status_code == 401 and not logged_in:
+            if context.accept_login_response((yield context.build_login_request())):
+                request.headers["Authorization"] = f"Bearer {context.node_token}"
+                yield request
+
+
+# 상태는 값을 갖지 않으므로 클래스마다 하나의 인스턴스만 만들어 재사용 (전이할 때 객체를 새로 만들지 않음)
 class ConnectionState(ABC):
+    __instances = {}
+
+    def __new__(cls):
+        instance = ConnectionState.__instances.get(cls)
+        if instance is None:
+            instance = super().__new__(cls)
+            ConnectionState.__instances[cls] = instance
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
     @abstractmethod
     def get_state_name(self):
         pass
@@ -50,41 +95,143 @@ class DisconnectState(ConnectionState):
         context.state = DisconnectState()
 
 
+# 리버스 SSH 터널을 내려야 하는 상태 (연결 해제 요청)
+def is_tunnel_released(state):
+    return state.get_level() <= 1
+
+
+# 재연결 대기 시간: 지수적으로 늘리되 절반은 무작위로 흩어 여러 노드가 동시에 재접속하지 않도록 함
+class ReconnectBackoff:
+    def __init__(self, base_delay=None, max_delay=None):
+        self.__base_delay = base_delay if base_delay is not None \
+            else float(os.getenv('SSH_RECONNECT_BASE_DELAY', '0.5'))
+        self.__max_delay = max_delay if max_delay is not None \
+            else float(os.getenv('SSH_RECONNECT_MAX_DELAY', '30'))
+        self.__attempt = 0
+
+    def next_delay(self):
+        delay = min(self.__max_delay, self.__base_delay * (2 ** self.__attempt))
+        self.__attempt += 1
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def reset(self):
+        self.__attempt = 0
+
+
 # 1
 async def create_reverse_ssh_tunnel(
         context,
         server_host: str,
         server_port: int,
         node_name: str,
-        node_password: str
+        node_password: str,
+        remote_port: Optional[int] = None,
+        remote_services: Optional[dict] = None
 ):
-    async with httpx.AsyncClient() as client:
-        url = f"http://{context.server_host}:{os.getenv('SERVER_CONTROL_API_PORT')}/port/random"
-        response = await client.get(url)
+    # /node/connect 로 미리 받은 포트가 없으면 포트를 따로 요청
+    if remote_port is None:
+        response = await context.control_client.get("/port/random", params={"node_name": context.node_name})
         # error
         if response.status_code != 200:
             raise ProceedException("Failed port random")
         remote_port = response.json()["port"]
-        context.remote_ssh_port = remote_port
+    context.remote_ssh_port = remote_port
 
     local_port = int(os.getenv('LOCAL_SSH_PORT'))
+    backoff = ReconnectBackoff()
+    while context.state.get_level() > 0:
+        try:
+            # 같은 원격 포트와 서비스 포트로 다시 포워딩하므로 게이트웨이 쪽 라우팅은 그대로 유지됨
+            remote_services = await run_reverse_ssh_tunnel(
+                context, server_host, server_port, local_port, remote_port, remote_services, backoff
+            )
+        except (OSError, asyncssh.Error) as e:
+            # 처음 연결에 실패한 경우는 재시도하지 않고, 전이를 기다리는 쪽이 바로 알 수 있도록 Disconnect 로 되돌림
+            if context.state.get_level() <= 1:
+                if context.state is RequestConnectReverseSSHPort():
+                    context.state = DisconnectState()
+                raise
+            print(f"SSH connection lost: {e!r}")
+        if context.state.get_level() <= 1:
+            break
+        # 재연결 대기 중에도 연결 해제 요청은 바로 반영
+        try:
+            await context.wait_until(is_tunnel_released, backoff.next_delay())
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_reverse_ssh_tunnel(context, server_host, server_port, local_port, remote_port, remote_services, backoff):
     async with asyncssh.connect(
             host=server_host,
             port=server_port,
             username=os.getenv('SERVER_SSH_USER'),
             password=os.getenv('SERVER_SSH_USER_PASSWORD'),
-            known_hosts=None
+            known_hosts=None,
+            # 끊긴 연결을 수 초 안에 감지
+            keepalive_interval=SSH_KEEPALIVE_INTERVAL,
+            keepalive_count_max=SSH_KEEPALIVE_COUNT_MAX,
+            compression_algs=SSH_COMPRESSION_ALGS
     ) as conn:
         # 리버스 포트 포워딩 설정
         ssh_listener = await conn.forward_remote_port("127.0.0.1", remote_port, "127.0.0.1", local_port)
-        context.state = EstablishedReverseSSHPort()
+        # 등록된 서비스 포트도 같은 SSH 연결의 채널로 함께 포워딩
+        service_listeners, remote_services = await forward_services(context, conn, remote_services)
+        # 연결 중에 해제 요청이 온 경우에는 전이하지 않음
+        if context.state is RequestConnectReverseSSHPort():
+            context.state = EstablishedReverseSSHPort()
+        backoff.reset()
+
+        # 연결 유지: 상태가 내려가거나 SSH 연결이 끊길 때까지 (주기적으로 확인하지 않고 전이 알림을 기다림)
+        connection_closed = asyncio.create_task(conn.wait_closed())
+        tunnel_released = asyncio.create_task(context.wait_until(is_tunnel_released))
+        await asyncio.wait([connection_closed, tunnel_released], return_when=asyncio.FIRST_COMPLETED)
+        connection_closed.cancel()
+        tunnel_released.cancel()
+
+        if context.state.get_level() <= 1:
+            for service_listener in service_listeners:
+                service_listener.close()
+            if service_listeners:
+                await register_services(context, {})
+            context.remote_services = {}
+            ssh_listener.close()
+    return remote_services
+
+
+async def register_services(context, services):
+    response = await context.control_client.post("/node/services", json={
+        "node_name": context.node_name,
+        "services": services
+    })
+    if response.status_code != 200:
+        raise ProceedException("Failed service registration")
+
+
+async def forward_services(context, conn, remote_services=None):
+    if not context.services:
+        return [], remote_services
+
+    service_listeners = []
+    registered = remote_services is not None
+    if not registered:
+        remote_services = {}
+        for service_name in context.services:
+            response = await context.control_client.get("/port/random", params={"node_name": context.node_name})
+            if response.status_code != 200:
+                raise ProceedException("Failed port random")
+            remote_services[service_name] = response.json()["port"]
 
-        # 연결 유지
-        while True:
-            if context.state.get_level() <= 1:
-                break
-            await asyncio.sleep(1)
-        ssh_listener.close()
+    for service_name, service_port in context.services.items():
+        service_listeners.append(
+            await conn.forward_remote_port("127.0.0.1", remote_services[service_name], "127.0.0.1", service_port)
+        )
+
+    # 게이트웨이는 /route/{node_name}/{service}/... 요청을 이 포트로 바로 전달
+    if not registered:
+        await register_services(context, remote_services)
+    context.remote_services = remote_services
+    return service_listeners, remote_services
 
 
 class RequestConnectReverseSSHPort(ConnectionState):
@@ -95,15 +242,13 @@ class RequestConnectReverseSSHPort(ConnectionState):
         return 1
 
     async def proceed(self, context):
-        # account check
-        async with httpx.AsyncClient() as client:
-            url = f"http://{context.server_host}:{os.getenv('SERVER_CONTROL_API_PORT')}/node/account/check"
-            response = await client.post(url, json={
-                "node_name": context.node_name,
-                "node_password": context.node_password
-            })
-            if response.status_code != 200:
-                return
+        if context.batch_connect:
+            await self.__batch_connect(context)
+            return
+
+        # 계정 확인 겸 로그인 (이후 제어 요청은 토큰으로 인증)
+        if not await context.login():
+            return
 
         context.background_tasks.add_task(
             create_reverse_ssh_tunnel,
@@ -114,7 +259,27 @@ class RequestConnectReverseSSHPort(ConnectionState):
             node_password=context.node_password
         )
 
+    async def __batch_connect(self, context):
+        # 계정 확인, 포트 할당, 프록시 준비를 한 번의 요청으로 처리
+        response = await context.control_client.post("/node/connect", json={
+            "node_name": context.node_name,
+            "services": list(context.services)
+        })
+        if response.status_code != 200:
+            raise ProceedException("Failed connect")
+        connect_info = response.json()
+        context.proxy_port = connect_info["proxy_port"]
 
+        context.background_tasks.add_task(
+            create_reverse_ssh_tunnel,
+            context=context,
+            server_host=context.server_host,
+            server_port=context.server_port,
+            node_name=context.node_name,
+            node_password=context.node_password,
+            remote_port=connect_info["remote_ssh_port"],
+            remote_services=connect_info["services"]
+        )
 
     async def turn_back(self, context):
         context.state = DisconnectState()
@@ -144,25 +309,30 @@ class RequestConnectProxyPort(ConnectionState):
         return 3
 
     async def proceed(self, context):
-        async with httpx.AsyncClient() as client:
-            url = f"http://{context.server_host}:{os.getenv('SERVER_CONTROL_API_PORT')}/port/random"
-            response = await client.get(url)
-            proxy_port = response.json()["port"]
-            if response.status_code != 200:
-                raise ProceedException("Failed port random")
+        # /node/connect 에서 이미 프록시가 준비된 경우
+        if context.proxy_port is not None:
+            context.state = EstablishedProxyPort()
+            return
 
-            url = f"http://{context.server_host}:{os.getenv('SERVER_CONTROL_API_PORT')}/proxy/provide"
-            data = {
-                "node_name": context.node_name,
-                "node_password": context.node_password,
-                "remote_ssh_port": int(context.remote_ssh_port),
-                "proxy_port": int(proxy_port)
-            }
-            response = await client.post(url, json=data)
-            if response.status_code != 200:
-                raise ProceedException("Failed proxy")
+        client = context.control_client
+        response = await client.get("/port/random", params={"node_name": context.node_name})
+        if response.status_code != 200:
+            raise ProceedException("Failed port random")
+        proxy_port = response.json()["port"]
+
+        data = {
+            "node_name": context.node_name,
+            "remote_ssh_port": int(context.remote_ssh_port),
+            "proxy_port": int(proxy_port)
+        }
+        response = await client.post("/proxy/provide", json=data)
+        if response.status_code != 200:
+            raise ProceedException("Failed proxy")
+        # /node/disconnect 는 게이트웨이 쪽 서비스 등록도 해제하므로 포워딩 중인 서비스 포트를 다시 등록
+        if context.remote_services:
+            await register_services(context, context.remote_services)
 
-            context.proxy_port = proxy_port
+        context.proxy_port = proxy_port
         context.state = EstablishedProxyPort()
 
     async def turn_back(self, context):
@@ -181,32 +351,47 @@ class EstablishedProxyPort(ConnectionState):
         context.state = EstablishedProxyPort()
 
     async def turn_back(self, context):
-        async with httpx.AsyncClient() as client:
-            url = f"http://{context.server_host}:{os.getenv('SERVER_CONTROL_API_PORT')}/node/disconnect"
-            response = await client.post(url, json={
-                "node_name": context.node_name,
-            })
-            if response.status_code != 200:
-                raise TurnBackException("Failed disconnect")
+        response = await context.control_client.post("/node/disconnect", json={
+            "node_name": context.node_name,
+        })
+        if response.status_code != 200:
+            raise TurnBackException("Failed disconnect")
 
+        # 게이트웨이 쪽 프록시가 정리되었으므로 다시 진행하면 새로 요청
+        context.proxy_port = None
         context.state = RequestConnectProxyPort()
 
 
 
 # context에 변수 저장
 # 종료시에도 변수 초기화를 역으로 들어가면서 제어
+# 상태가 바뀌면 구독 콜백을 호출하고 wait_for/wait_until 로 기다리는 쪽을 깨움
 class ConnectionMachine:
     def __init__(self):
         self.__state = DisconnectState()
         self.__background_tasks = None
+        # callback(connection_machine, old_state, new_state)
+        self.__subscribers = []
+        # (조건, future)
+        self.__waiters = []
 
         self.__server_host = None
         self.__server_port = None
         self.__node_name = None
         self.__node_password = None
+        # /node/login 으로 받은 세션 토큰
+        self.__node_token = None
 
         self.__remote_ssh_port = None
         self.__proxy_port = None
+        # 서비스 이름 -> 노드의 로컬 포트
+        self.__services = {}
+        # 서비스 이름 -> 포워딩 중인 게이트웨이 쪽 포트
+        self.__remote_services = {}
+
+        # 제어 API 용 keep-alive 클라이언트
+        self.__control_client = None
+        self.__batch_connect = os.getenv('CONTROL_BATCH_CONNECT', '1').lower() in ('1', 'true', 'yes')
 
     @property
     def proxy_port(self):
@@ -216,6 +401,22 @@ class ConnectionMachine:
     def proxy_port(self, value):
         self.__proxy_port = value
 
+    @property
+    def services(self):
+        return self.__services
+
+    @services.setter
+    def services(self, value):
+        self.__services = dict(value or {})
+
+    @property
+    def remote_services(self):
+        return self.__remote_services
+
+    @remote_services.setter
+    def remote_services(self, value):
+        self.__remote_services = dict(value or {})
+
     @property
     def remote_ssh_port(self):
         return self.__remote_ssh_port
@@ -230,8 +431,56 @@ class ConnectionMachine:
 
     @server_host.setter
     def server_host(self, server_host):
+        if server_host != self.__server_host:
+            self.__reset_control_client()
         self.__server_host = server_host
 
+    @property
+    def control_base_url(self):
+        return f"http://{self.__server_host}:{os.getenv('SERVER_CONTROL_API_PORT')}"
+
+    @property
+    def control_client(self):
+        if self.__control_client is None or self.__control_client.is_closed:
+            self.__control_client = httpx.AsyncClient(base_url=self.control_base_url, auth=NodeTokenAuth(self))
+        return self.__control_client
+
+    @property
+    def node_token(self):
+        return self.__node_token
+
+    def build_login_request(self):
+        return httpx.Request("POST", f"{self.control_base_url}/node/login", json={
+            "node_name": self.__node_name,
+            "node_password": self.__node_password
+        })
+
+    def accept_login_response(self, response):
+        self.__node_token = response.json()["token"] if response.status_code == 200 else None
+        return self.__node_token is not None
+
+    async def login(self):
+        response = await self.control_client.send(self.build_login_request(), auth=None)
+        return self.accept_login_response(response)
+
+    def __reset_control_client(self):
+        # 서버가 바뀌면 다음 요청 때 새 base URL 로 다시 생성하고 다시 로그인
+        self.__node_token = None
+        if self.__control_client is not None and not self.__control_client.is_closed:
+            try:
+                asyncio.get_running_loop().create_task(self.__control_client.aclose())
+            except RuntimeError:
+                pass
+        self.__control_client = None
+
+    @property
+    def batch_connect(self):
+        return self.__batch_connect
+
+    @batch_connect.setter
+    def batch_connect(self, value):
+        self.__batch_connect = value
+
     @property
     def server_port(self):
         return self.__server_port
@@ -246,6 +495,8 @@ class ConnectionMachine:
 
     @node_name.setter
     def node_name(self, node_name):
+        if node_name != self.__node_name:
+            self.__node_token = None
         self.__node_name = node_name
 
     @property
@@ -254,6 +505,8 @@ class ConnectionMachine:
 
     @node_password.setter
     def node_password(self, node_password):
+        if node_password != self.__node_password:
+            self.__node_token = None
         self.__node_password = node_password
 
     @property
@@ -262,11 +515,55 @@ class ConnectionMachine:
 
     @state.setter
     def state(self, state):
+        old_state = self.__state
+        if state is old_state:
+            return
         self.__state = state
 
+        waiters = self.__waiters
+        self.__waiters = []
+        for predicate, future in waiters:
+            if future.done():
+                continue
+            if predicate(state):
+                future.set_result(state)
+            else:
+                self.__waiters.append((predicate, future))
+        for callback in list(self.__subscribers):
+            callback(self, old_state, state)
+
     def get_state_name(self):
         return self.__state.get_state_name()
 
+    def subscribe(self, callback):
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        try:
+            self.__subscribers.remove(callback)
+        except ValueError:
+            pass
+
+    async def wait_until(self, predicate, timeout=None):
+        # 조건을 만족하는 상태가 될 때까지 대기 (timeout 초과 시 asyncio.TimeoutError)
+        if predicate(self.__state):
+            return self.__state
+        waiter = (predicate, asyncio.get_running_loop().create_future())
+        self.__waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(waiter[1], timeout)
+        finally:
+            try:
+                self.__waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    async def wait_for(self, state, timeout=None):
+        # 상태 클래스 또는 인스턴스
+        if isinstance(state, type):
+            state = state()
+        return await self.wait_until(lambda current_state: current_state is state, timeout)
+
     @property
     def background_tasks(self):
         return self.__background_tasks
@@ -275,8 +572,16 @@ class ConnectionMachine:
     def background_tasks(self, background_tasks):
         self.__background_tasks = background_tasks
 
+    # 전이 후 상태를 반환 (리버스 SSH 터널처럼 백그라운드에서 끝나는 전이는 wait_for 로 대기)
     async def proceed(self):
         await self.__state.proceed(self)
+        return self.__state
 
     async def turn_back(self):
         await self.__state.turn_back(self)
+        return self.__state
+
+    async def aclose(self):
+        if self.__control_client is not None:
+            await self.__control_client.aclose()
+            self.__control_client = None
@@ -1,30 +1,81 @@
+import asyncio
+import os
 import unittest
-from client.ClientNodeStatus import ConnectionMachine
+from client.ClientNodeStatus import (
+    ConnectionMachine, DisconnectState, EstablishedReverseSSHPort, RequestConnectReverseSSHPort
+)
 
-class TestConnectionMachine(unittest.TestCase):
+class TestConnectionMachine(unittest.IsolatedAsyncioTestCase):
 
-    def test_connection_machine_state_transition(self):
+    async def test_connection_machine_state_transition(self):
         # 상태 머신 인스턴스를 생성합니다.
         connection_machine = ConnectionMachine()
 
         # 초기 상태는 DisconnectState이어야 합니다.
         self.assertEqual(connection_machine.get_state_name(), "Disconnect")
 
-        # 상태 전이 과정을 진행합니다.
-        connection_machine.proceed()  # RequestConnectReverseSSHPort로 전이
+        # 상태 전이 과정을 진행합니다. 전이는 새 상태를 반환합니다.
+        state = await connection_machine.proceed()  # RequestConnectReverseSSHPort로 전이
+        self.assertIs(state, RequestConnectReverseSSHPort())
         self.assertEqual(connection_machine.get_state_name(), "RequestConnectReverseSSHPort")
 
-        connection_machine.proceed()  # EstablishedReverseSSHPort로 전이
-        self.assertEqual(connection_machine.get_state_name(), "EstablishedReverseSSHPort")
+        # 리버스 SSH 터널은 백그라운드 태스크가 연결한 뒤 EstablishedReverseSSHPort로 전이합니다.
+        connection_machine.state = EstablishedReverseSSHPort()
+        connection_machine.proxy_port = 20000
 
-        connection_machine.proceed()  # RequestConnectProxyPort로 전이
+        await connection_machine.proceed()  # RequestConnectProxyPort로 전이
         self.assertEqual(connection_machine.get_state_name(), "RequestConnectProxyPort")
 
-        connection_machine.proceed()  # EstablishedProxyPort로 전이
+        await connection_machine.proceed()  # EstablishedProxyPort로 전이
         self.assertEqual(connection_machine.get_state_name(), "EstablishedProxyPort")
 
-        connection_machine.proceed()  # EstablishedProxyPort로 계속 머무름
+        await connection_machine.proceed()  # EstablishedProxyPort로 계속 머무름
         self.assertEqual(connection_machine.get_state_name(), "EstablishedProxyPort")
 
+    def test_states_are_immutable_singletons(self):
+        self.assertIs(DisconnectState(), DisconnectState())
+        with self.assertRaises(AttributeError):
+            DisconnectState().level = 1
+
+    async def test_wait_for_and_subscribers(self):
+        connection_machine = ConnectionMachine()
+        transitions = []
+        connection_machine.subscribe(
+            lambda machine, old_state, new_state: transitions.append((old_state.get_level(), new_state.get_level()))
+        )
+
+        waiter = asyncio.create_task(connection_machine.wait_for(EstablishedReverseSSHPort, timeout=1))
+        await asyncio.sleep(0)
+        await connection_machine.proceed()
+        self.assertFalse(waiter.done())
+        connection_machine.state = EstablishedReverseSSHPort()
+        self.assertIs(await waiter, EstablishedReverseSSHPort())
+
+        # 같은 상태로의 전이는 알리지 않습니다.
+        connection_machine.state = EstablishedReverseSSHPort()
+        self.assertEqual(transitions, [(0, 1), (1, 2)])
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await connection_machine.wait_for(DisconnectState, timeout=0.01)
+
+
+class TestConnectionMachineControlClient(unittest.IsolatedAsyncioTestCase):
+
+    async def test_control_client_is_reused(self):
+        os.environ['SERVER_CONTROL_API_PORT'] = "58000"
+        connection_machine = ConnectionMachine()
+        connection_machine.server_host = "127.0.0.1"
+
+        # 제어 API 클라이언트는 한 번 만들어 재사용합니다.
+        control_client = connection_machine.control_client
+        self.assertIs(connection_machine.control_client, control_client)
+        self.assertEqual(str(control_client.base_url), "http://127.0.0.1:58000")
+
+        # 서버가 바뀌면 새 base URL 로 다시 만듭니다.
+        connection_machine.server_host = "10.0.0.1"
+        self.assertEqual(str(connection_machine.control_client.base_url), "http://10.0.0.1:58000")
+
+        await connection_machine.aclose()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,244 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+
+class AdmissionRejectedException(Exception):
+    def __init__(self, status_code, message, retry_after):
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+# 초당 rate 개씩 채워지고 최대 burst 개까지 쌓이는 토큰 버킷
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.__rate = rate
+        self.__burst = burst
+        self.__clock = clock
+        self.__tokens = burst
+        self.__updated_at = clock()
+
+    def try_acquire(self):
+        # 토큰이 없으면 다음 토큰까지 기다려야 하는 시간(초)을 반환
+        now = self.__clock()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated_at) * self.__rate)
+        self.__updated_at = now
+        if self.__tokens >= 1:
+            self.__tokens -= 1
+            return 0.0
+        return (1 - self.__tokens) / self.__rate
+
+
+# 동시 처리 수 제한. 넘친 요청은 도착 순서대로 최대 max_queue 개까지 대기
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrency, max_queue):
+        self.__max_concurrency = max_concurrency
+        self.__max_queue = max_queue
+        self.__active = 0
+        self.__waiters = deque()
+
+    @property
+    def active(self):
+        return self.__active
+
+    @property
+    def queued(self):
+        return len(self.__waiters)
+
+    async def acquire(self, timeout):
+        if self.__active < self.__max_concurrency and not self.__waiters:
+            self.__active += 1
+            return True
+        if len(self.__waiters) >= self.__max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.__waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # 슬롯을 넘겨받은 직후에 취소되면 다음 대기자에게 돌려줌
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self.__waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self):
+        # 대기 중인 요청이 있으면 슬롯을 그대로 넘김
+        while self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.__active -= 1
+
+
+# /route 요청 허용 제어
+# 노드별/호출자별 토큰 버킷(초과 시 429)과 노드별 동시 처리 제한 + FIFO 대기열(대기 초과 시 503)
+# 값이 0 이면 해당 제한은 사용하지 않음
+# 드레인 중에는 새 요청을 503 으로 거절하고 처리 중인 요청이 끝나기를 기다릴 수 있음
+class AdmissionController:
+    def __init__(
+            self,
+            node_rate=None,
+            node_burst=None,
+            caller_rate=None,
+            caller_burst=None,
+            max_concurrency=None,
+            max_queue=None,
+            queue_timeout=None,
+            caller_header=None,
+            max_callers=None,
+            clock=time.monotonic
+    ):
+        self.__node_rate = node_rate if node_rate is not None \
+            else float(os.getenv('ROUTE_NODE_RATE', '0'))
+        self.__node_burst = node_burst if node_burst is not None \
+            else float(os.getenv('ROUTE_NODE_BURST', str(max(self.__node_rate, 1))))
+        self.__caller_rate = caller_rate if caller_rate is not None \
+            else float(os.getenv('ROUTE_CALLER_RATE', '0'))
+        self.__caller_burst = caller_burst if caller_burst is not None \
+            else float(os.getenv('ROUTE_CALLER_BURST', str(max(self.__caller_rate, 1))))
+        self.__max_concurrency = max_concurrency if max_concurrency is not None \
+            else int(os.getenv('ROUTE_NODE_MAX_CONCURRENCY', '0'))
+        self.__max_queue = max_queue if max_queue is not None \
+            else int(os.getenv('ROUTE_NODE_MAX_QUEUE', '256'))
+        self.__queue_timeout = queue_timeout if queue_timeout is not None \
+            else float(os.getenv('ROUTE_QUEUE_TIMEOUT', '5'))
+        # 호출자 구분 헤더 (없으면 접속 IP)
+        self.__caller_header = caller_header if caller_header is not None \
+            else os.getenv('ROUTE_CALLER_HEADER', '').lower()
+        self.__max_callers = max_callers if max_callers is not None \
+            else int(os.getenv('ROUTE_MAX_TRACKED_CALLERS', '10000'))
+        self.__clock = clock
+
+        self.__node_buckets = {}
+        # 최근에 본 호출자만 유지 (LRU)
+        self.__caller_buckets = OrderedDict()
+        self.__limiters = {}
+        self.__rate_limited = 0
+        self.__queue_rejected = 0
+        self.__queued_total = 0
+
+        # admit 후 release 전인 요청 수
+        self.__in_flight = 0
+        self.__draining = False
+        self.__drained_event = None
+
+    @property
+    def in_flight(self):
+        return self.__in_flight
+
+    @property
+    def draining(self):
+        return self.__draining
+
+    def start_drain(self):
+        self.__draining = True
+
+    def stop_drain(self):
+        self.__draining = False
+
+    async def wait_drained(self, timeout):
+        # 처리 중인 요청이 모두 끝나면 True
+        if self.__in_flight == 0:
+            return True
+        if self.__drained_event is None:
+            self.__drained_event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self.__drained_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.__in_flight == 0
+
+    def get_caller(self, headers, client):
+        if self.__caller_header:
+            caller = headers.get(self.__caller_header)
+            if caller:
+                return caller
+        return client.host if client is not None else ""
+
+    def __get_caller_bucket(self, caller):
+        bucket = self.__caller_buckets.get(caller)
+        if bucket is None:
+            bucket = TokenBucket(self.__caller_rate, self.__caller_burst, self.__clock)
+            self.__caller_buckets[caller] = bucket
+            if len(self.__caller_buckets) > self.__max_callers:
+                self.__caller_buckets.popitem(last=False)
+        else:
+            self.__caller_buckets.move_to_end(caller)
+        return bucket
+
+    def check_rate(self, route_name, caller):
+        if self.__draining:
+            raise AdmissionRejectedException(503, "Gateway is draining", 1)
+        if self.__caller_rate > 0:
+            wait = self.__get_caller_bucket(caller).try_acquire()
+            if wait > 0:
+                self.__rate_limited += 1
+                raise AdmissionRejectedException(429, "Caller rate limit exceeded", math.ceil(wait))
+        if self.__node_rate > 0:
+            bucket = self.__node_buckets.get(route_name)
+            if bucket is None:
+                bucket = TokenBucket(self.__node_rate, self.__node_burst, self.__clock)
+                self.__node_buckets[route_name] = bucket
+            wait = bucket.try_acquire()
+            if wait > 0:
+                self.__rate_limited += 1
+                raise AdmissionRejectedException(429, "Node rate limit exceeded", math.ceil(wait))
+
+    async def admit(self, route_name, caller):
+        self.check_rate(route_name, caller)
+        if self.__max_concurrency <= 0:
+            self.__in_flight += 1
+            return
+        limiter = self.__limiters.get(route_name)
+        if limiter is None:
+            limiter = ConcurrencyLimiter(self.__max_concurrency, self.__max_queue)
+            self.__limiters[route_name] = limiter
+        if (limiter.queued or limiter.active >= self.__max_concurrency) and limiter.queued < self.__max_queue:
+            self.__queued_total += 1
+        if not await limiter.acquire(self.__queue_timeout):
+            self.__queue_rejected += 1
+            raise AdmissionRejectedException(503, "Node is overloaded", max(math.ceil(self.__queue_timeout), 1))
+        self.__in_flight += 1
+
+    def release(self, route_name):
+        limiter = self.__limiters.get(route_name)
+        if limiter is not None:
+            limiter.release()
+        self.__in_flight -= 1
+        if self.__in_flight == 0 and self.__drained_event is not None:
+            self.__drained_event.set()
+            self.__drained_event = None
+
+    def get_stats(self):
+        return {
+            "node_rate": self.__node_rate,
+            "caller_rate": self.__caller_rate,
+            "max_concurrency": self.__max_concurrency,
+            "max_queue": self.__max_queue,
+            "queue_timeout": self.__queue_timeout,
+            "draining": self.__draining,
+            "in_flight": self.__in_flight,
+            "rate_limited": self.__rate_limited,
+            "queued": self.__queued_total,
+            "queue_rejected": self.__queue_rejected,
+            "tracked_callers": len(self.__caller_buckets),
+            "nodes": {
+                route_name: {"active": limiter.active, "queued": limiter.queued}
+                for route_name, limiter in self.__limiters.items()
+            },
+        }
@@ -0,0 +1,137 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from server.AdmissionControl import AdmissionController, AdmissionRejectedException, ConcurrencyLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdmissionControl(unittest.IsolatedAsyncioTestCase):
+
+    def test_token_bucket_refills(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        # 다음 토큰까지 0.5초
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+
+        clock.now = 0.5
+        self.assertEqual(bucket.try_acquire(), 0)
+
+    def test_caller_and_node_rate_limits(self):
+        clock = FakeClock()
+        admission = AdmissionController(
+            node_rate=1, node_burst=2, caller_rate=1, caller_burst=1, max_concurrency=0, caller_header="", clock=clock
+        )
+
+        admission.check_rate("node-a", "10.0.0.1")
+        with self.assertRaises(AdmissionRejectedException) as cm:
+            admission.check_rate("node-a", "10.0.0.1")
+        self.assertEqual((cm.exception.status_code, cm.exception.retry_after), (429, 1))
+
+        # 다른 호출자는 따로 계산되지만 노드 한도는 함께 사용
+        admission.check_rate("node-a", "10.0.0.2")
+        with self.assertRaises(AdmissionRejectedException):
+            admission.check_rate("node-a", "10.0.0.3")
+        self.assertEqual(admission.get_stats()["rate_limited"], 2)
+
+    def test_caller_from_header(self):
+        admission = AdmissionController(caller_header="x-api-key")
+        client = SimpleNamespace(host="10.0.0.1")
+
+        self.assertEqual(admission.get_caller({"x-api-key": "team-a"}, client), "team-a")
+        self.assertEqual(admission.get_caller({}, client), "10.0.0.1")
+
+    def test_tracked_callers_are_bounded(self):
+        admission = AdmissionController(caller_rate=1, max_callers=2, max_concurrency=0)
+        for caller in ("a", "b", "c"):
+            admission.check_rate("node-a", caller)
+
+        self.assertEqual(admission.get_stats()["tracked_callers"], 2)
+
+    async def test_waiters_are_admitted_in_order(self):
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=2)
+        self.assertTrue(await limiter.acquire(1))
+
+        admitted = []
+
+        async def wait(name):
+            await limiter.acquire(1)
+            admitted.append(name)
+
+        waiters = [asyncio.create_task(wait(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        # 대기열이 가득 차면 바로 거절
+        self.assertFalse(await limiter.acquire(1))
+
+        limiter.release()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*waiters)
+
+        self.assertEqual(admitted, ["first", "second"])
+        self.assertEqual((limiter.active, limiter.queued), (1, 0))
+
+    async def test_queue_deadline(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=4, queue_timeout=0.01)
+        await admission.admit("node-a", "caller")
+
+        with self.assertRaises(AdmissionRejectedException) as cm:
+            await admission.admit("node-a", "caller")
+        self.assertEqual((cm.exception.status_code, cm.exception.retry_after), (503, 1))
+
+        # 시간이 지난 대기자는 대기열에서 빠지고 슬롯은 다음 요청이 사용
+        admission.release("node-a")
+        await admission.admit("node-a", "caller")
+        stats = admission.get_stats()
+        self.assertEqual(stats["nodes"]["node-a"], {"active": 1, "queued": 0})
+        self.assertEqual(stats["queue_rejected"], 1)
+
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=4)
+        await limiter.acquire(1)
+        waiter = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+
+        self.assertEqual((limiter.active, limiter.queued), (0, 0))
+
+    async def test_drain_rejects_new_requests_and_waits_in_flight(self):
+        admission = AdmissionController(max_concurrency=0)
+        await admission.admit("node-a", "caller")
+        await admission.admit("node-b", "caller")
+        admission.start_drain()
+
+        with self.assertRaises(AdmissionRejectedException) as cm:
+            await admission.admit("node-a", "caller")
+        self.assertEqual((cm.exception.status_code, cm.exception.retry_after), (503, 1))
+        self.assertFalse(await admission.wait_drained(0.01))
+
+        drained = asyncio.create_task(admission.wait_drained(1))
+        await asyncio.sleep(0)
+        admission.release("node-a")
+        await asyncio.sleep(0)
+        self.assertFalse(drained.done())
+        admission.release("node-b")
+        self.assertTrue(await drained)
+
+        admission.stop_drain()
+        await admission.admit("node-a", "caller")
+        self.assertEqual(admission.get_stats()["in_flight"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+# 지연시간 히스토그램 구간 (초)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 노드가 처음 보일 때 미리 만들어 두는 메서드별 지표
+ROUTE_METHODS = ("GET", "POST", "PATCH", "DELETE", "PUT", "HEAD", "OPTIONS")
+# /route 요청 구간: 라우팅 조회, SOCKS/커넥션 획득, 백엔드 응답(헤더까지)
+ROUTE_PHASES = ("lookup", "connect", "backend")
+# 노드 연결 단계 (연결 요청 시각부터의 누적 시간)
+# 계정 확인, 포트 임대, 노드 SSH 연결(노드의 리버스 포워딩 대기 포함), SOCKS 포워딩, 라우팅 가능, 첫 /route 요청
+ONBOARDING_STEPS = ("account_check", "port_lease", "ssh_connect", "socks_forward", "routable", "first_request")
+ONBOARDING_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # 마지막 칸은 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # 백엔드(또는 게이트웨이) 응답 상태 코드 -> 개수
+        self.status_counts = {}
+        self.duration = LatencyHistogram()
+        self.phases = {phase: LatencyHistogram() for phase in ROUTE_PHASES}
+
+    def record_status(self, status_code):
+        status_counts = self.status_counts
+        status_counts[status_code] = status_counts.get(status_code, 0) + 1
+
+
+# 요청 하나의 구간별 시각 (RouteMetricsMiddleware 가 만들고 RouteForwarder 가 채움)
+class RouteTimer:
+    __slots__ = ("route_name", "started", "lookup", "send_started", "headers_sent", "connect", "backend")
+
+    def __init__(self, started):
+        self.route_name = None
+        self.started = started
+        self.lookup = None
+        self.send_started = None
+        self.headers_sent = None
+        self.connect = None
+        self.backend = None
+
+    # httpx(httpcore) trace 확장: 요청 헤더를 보내기 시작한 시점까지가 커넥션 획득 구간
+    async def trace(self, event_name, info):
+        if event_name.endswith("send_request_headers.started"):
+            self.headers_sent = time.perf_counter()
+
+    def start_send(self):
+        self.send_started = time.perf_counter()
+        self.headers_sent = None
+
+    def finish_send(self):
+        now = time.perf_counter()
+        headers_sent = self.headers_sent if self.headers_sent is not None else now
+        self.connect = headers_sent - self.send_started
+        self.backend = now - headers_sent
+
+
+# 노드 하나의 연결 단계별 시각
+class OnboardingTrace:
+    def __init__(self, node_name, started):
+        self.node_name = node_name
+        self.started = started
+        # 단계 -> 연결 요청부터 걸린 시간
+        self.steps = {}
+
+    def to_dict(self):
+        return {"node_name": self.node_name, "steps": dict(self.steps)}
+
+
+# 노드 연결 과정 측정
+# 노드별 마지막 연결 기록과 단계별 히스토그램을 유지하고, 첫 /route 요청까지의 시간을 핵심 지표로 봄
+class OnboardingTracker:
+    def __init__(self, max_traces=1000, clock=time.monotonic):
+        self.__max_traces = max_traces
+        self.__clock = clock
+        self.__traces = OrderedDict()
+        # 라우팅 가능해진 뒤 첫 /route 요청을 기다리는 기록
+        self.__pending = {}
+        self.histograms = {step: LatencyHistogram(ONBOARDING_BUCKETS) for step in ONBOARDING_STEPS}
+
+    def begin(self, node_name):
+        trace = OnboardingTrace(node_name, self.__clock())
+        self.__traces.pop(node_name, None)
+        self.__traces[node_name] = trace
+        if len(self.__traces) > self.__max_traces:
+            self.__traces.popitem(last=False)
+        self.__pending.pop(node_name, None)
+        return trace
+
+    def mark(self, trace, step):
+        if trace is None or step in trace.steps:
+            return
+        elapsed = self.__clock() - trace.started
+        trace.steps[step] = elapsed
+        self.histograms[step].observe(elapsed)
+        if step == "routable":
+            self.__pending[trace.node_name] = trace
+
+    def record_first_request(self, node_name):
+        trace = self.__pending.pop(node_name, None)
+        if trace is not None:
+            self.mark(trace, "first_request")
+
+    def get_trace(self, node_name):
+        return self.__traces.get(node_name)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Prometheus text 형식 지표
+# 노드/메서드별 지표 객체는 처음 한 번만 만들고 이후 요청은 필드 값만 갱신
+class GatewayMetrics:
+    def __init__(self):
+        self.__routes = {}
+
+    def get_route_metrics(self, route_name, method):
+        method_metrics = self.__routes.get(route_name)
+        if method_metrics is None:
+            method_metrics = {route_method: RouteMetrics() for route_method in ROUTE_METHODS}
+            self.__routes[route_name] = method_metrics
+        route_metrics = method_metrics.get(method)
+        if route_metrics is None:
+            route_metrics = RouteMetrics()
+            method_metrics[method] = route_metrics
+        return route_metrics
+
+    def record(self, timer, method, status_code, bytes_in, bytes_out, finished):
+        route_metrics = self.get_route_metrics(timer.route_name, method)
+        route_metrics.requests += 1
+        route_metrics.bytes_in += bytes_in
+        route_metrics.bytes_out += bytes_out
+        if status_code is not None:
+            route_metrics.record_status(status_code)
+        route_metrics.duration.observe(finished - timer.started)
+        phases = route_metrics.phases
+        if timer.lookup is not None:
+            phases["lookup"].observe(timer.lookup)
+        if timer.connect is not None:
+            phases["connect"].observe(timer.connect)
+            phases["backend"].observe(timer.backend)
+
+    def render(self, tunnel_handles=(), gauges=(), onboarding=None, counters=()):
+        lines = []
+
+        def add_header(name, metric_type, description):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        def add_histogram(name, labels, histogram):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        route_metrics = [
+            (f'node="{escape_label(route_name)}",method="{method}"', metrics)
+            for route_name, method_metrics in self.__routes.items()
+            for method, metrics in method_metrics.items()
+            if metrics.requests
+        ]
+
+        add_header("gateway_route_requests_total", "counter", "Requests forwarded through /route.")
+        for labels, metrics in route_metrics:
+            lines.append(f"gateway_route_requests_total{{{labels}}} {metrics.requests}")
+        add_header("gateway_route_responses_total", "counter", "Responses by status code.")
+        for labels, metrics in route_metrics:
+            for status_code, count in sorted(metrics.status_counts.items()):
+                lines.append(f'gateway_route_responses_total{{{labels},status="{status_code}"}} {count}')
+        add_header("gateway_route_request_bytes_total", "counter", "Request body bytes received from callers.")
+        for labels, metrics in route_metrics:
+            lines.append(f"gateway_route_request_bytes_total{{{labels}}} {metrics.bytes_in}")
+        add_header("gateway_route_response_bytes_total", "counter", "Response body bytes sent to callers.")
+        for labels, metrics in route_metrics:
+            lines.append(f"gateway_route_response_bytes_total{{{labels}}} {metrics.bytes_out}")
+        add_header("gateway_route_duration_seconds", "histogram", "Total /route request time.")
+        for labels, metrics in route_metrics:
+            add_histogram("gateway_route_duration_seconds", labels, metrics.duration)
+        add_header("gateway_route_phase_seconds", "histogram", "/route request time by phase.")
+        for labels, metrics in route_metrics:
+            for phase in ROUTE_PHASES:
+                add_histogram("gateway_route_phase_seconds", f'{labels},phase="{phase}"', metrics.phases[phase])
+
+        add_header("gateway_tunnels_active", "gauge", "Node tunnels currently supervised.")
+        lines.append(f"gateway_tunnels_active {len(tunnel_handles)}")
+        add_header("gateway_tunnel_uptime_seconds", "gauge", "Uptime of the current SSH connection per node.")
+        for handle in tunnel_handles:
+            lines.append(f'gateway_tunnel_uptime_seconds{{node="{escape_label(handle.node_name)}"}} {handle.get_uptime()}')
+        add_header("gateway_tunnel_reconnects_total", "counter", "Tunnel reconnects per node.")
+        for handle in tunnel_handles:
+            lines.append(f'gateway_tunnel_reconnects_total{{node="{escape_label(handle.node_name)}"}} {handle.reconnects}')
+
+        if onboarding is not None:
+            add_header("gateway_onboarding_seconds", "histogram", "Time from a node connect request to each onboarding step.")
+            for step in ONBOARDING_STEPS:
+                add_histogram("gateway_onboarding_seconds", f'step="{step}"', onboarding.histograms[step])
+
+        # 그 밖의 상태 값 (풀/캐시/포트 통계). 현재 값은 gauge, 계속 늘어나는 누적 값(_total)은 counter
+        for name, description, value in gauges:
+            add_header(name, "gauge", description)
+            lines.append(f"{name} {value}")
+        for name, description, value in counters:
+            add_header(name, "counter", description)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# /route 요청마다 RouteTimer 를 붙이고, 응답이 끝나면 상태 코드와 본문 크기를 기록
+class RouteMetricsMiddleware:
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/route/"):
+            await self.app(scope, receive, send)
+            return
+
+        timer = RouteTimer(time.perf_counter())
+        scope.setdefault("state", {})["route_timer"] = timer
+        bytes_in = 0
+        bytes_out = 0
+        status_code = None
+
+        async def receive_counted():
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal bytes_out, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            # 라우팅 테이블에 없는 이름은 기록하지 않음 (임의 경로로 지표가 늘어나지 않도록)
+            if timer.route_name is not None:
+                self.metrics.record(
+                    timer, scope["method"], status_code, bytes_in, bytes_out, time.perf_counter()
+                )
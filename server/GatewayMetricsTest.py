@@ -0,0 +1,106 @@
+import unittest
+
+from server.GatewayMetrics import (
+    GatewayMetrics, LatencyHistogram, OnboardingTracker, RouteMetricsMiddleware, RouteTimer
+)
+from server.TunnelSupervisor import TunnelHandle
+
+
+class TestGatewayMetrics(unittest.IsolatedAsyncioTestCase):
+
+    def test_histogram_buckets(self):
+        histogram = LatencyHistogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+
+    def test_label_sets_are_reused(self):
+        metrics = GatewayMetrics()
+        route_metrics = metrics.get_route_metrics("node-a", "GET")
+
+        # 같은 노드의 다른 메서드도 처음 조회할 때 함께 만들어집니다.
+        self.assertIs(metrics.get_route_metrics("node-a", "GET"), route_metrics)
+        self.assertIsNot(metrics.get_route_metrics("node-a", "POST"), route_metrics)
+
+    def test_render_route_and_tunnel_metrics(self):
+        metrics = GatewayMetrics()
+        timer = RouteTimer(started=1.0)
+        timer.route_name = "node-a"
+        timer.lookup = 0.0001
+        timer.connect = 0.002
+        timer.backend = 0.03
+        metrics.record(timer, "GET", 200, 0, 128, finished=1.05)
+
+        handle = TunnelHandle("node-a")
+        handle.reconnects = 2
+        text = metrics.render(
+            [handle], [("gateway_nodes", "Registered nodes.", 1)],
+            counters=[("gateway_cache_hits_total", "Response cache hits.", 3)]
+        )
+
+        self.assertIn('gateway_route_requests_total{node="node-a",method="GET"} 1', text)
+        self.assertIn('gateway_route_responses_total{node="node-a",method="GET",status="200"} 1', text)
+        self.assertIn('gateway_route_response_bytes_total{node="node-a",method="GET"} 128', text)
+        self.assertIn('gateway_route_phase_seconds_bucket{node="node-a",method="GET",phase="connect",le="0.0025"} 1', text)
+        self.assertIn('gateway_route_phase_seconds_count{node="node-a",method="GET",phase="backend"} 1', text)
+        self.assertIn('gateway_tunnel_reconnects_total{node="node-a"} 2', text)
+        self.assertIn("gateway_tunnels_active 1", text)
+        self.assertIn("gateway_nodes 1", text)
+        self.assertIn("# TYPE gateway_nodes gauge", text)
+        self.assertIn("# TYPE gateway_cache_hits_total counter\ngateway_cache_hits_total 3", text)
+        # 요청이 없던 메서드는 출력하지 않습니다.
+        self.assertNotIn('method="POST"', text)
+
+    def test_onboarding_steps(self):
+        now = [0.0]
+        tracker = OnboardingTracker(clock=lambda: now[0])
+        trace = tracker.begin("node-a")
+        for step, elapsed in (("account_check", 0.001), ("ssh_connect", 0.08), ("routable", 0.1)):
+            now[0] = elapsed
+            tracker.mark(trace, step)
+
+        # 라우팅 가능해진 뒤 첫 요청만 기록
+        now[0] = 0.12
+        tracker.record_first_request("node-a")
+        now[0] = 0.5
+        tracker.record_first_request("node-a")
+
+        self.assertEqual(tracker.get_trace("node-a").to_dict()["steps"], {
+            "account_check": 0.001, "ssh_connect": 0.08, "routable": 0.1, "first_request": 0.12
+        })
+        text = GatewayMetrics().render(onboarding=tracker)
+        self.assertIn('gateway_onboarding_seconds_bucket{step="first_request",le="0.25"} 1', text)
+        self.assertIn('gateway_onboarding_seconds_count{step="port_lease"} 0', text)
+
+    async def test_middleware_counts_bytes(self):
+        metrics = GatewayMetrics()
+
+        async def app(scope, receive, send):
+            scope["state"]["route_timer"].route_name = "node-a"
+            message = await receive()
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": message["body"] * 2})
+
+        async def receive():
+            return {"type": "http.request", "body": b"abc", "more_body": False}
+
+        async def send(message):
+            pass
+
+        middleware = RouteMetricsMiddleware(app, metrics)
+        await middleware({"type": "http", "path": "/route/node-a/x", "method": "POST"}, receive, send)
+        # 라우팅 테이블에 없는 이름(route_name 미설정)은 기록하지 않습니다.
+        await RouteMetricsMiddleware(lambda scope, receive, send: send({"type": "http.response.start", "status": 404}), metrics)(
+            {"type": "http", "path": "/route/unknown/x", "method": "GET"}, receive, send
+        )
+
+        route_metrics = metrics.get_route_metrics("node-a", "POST")
+        self.assertEqual((route_metrics.requests, route_metrics.bytes_in, route_metrics.bytes_out), (1, 3, 6))
+        self.assertEqual(route_metrics.status_counts, {201: 1})
+        self.assertNotIn('node="unknown"', metrics.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+import uvicorn
+
+# HTTP/2 는 hypercorn 이 설치되어 있을 때만 사용 (uvicorn 은 HTTP/1.1 만 지원)
+try:
+    import hypercorn.asyncio
+    import hypercorn.config
+    import hypercorn.run
+except ImportError:
+    hypercorn = None
+
+# 외부 클라이언트 -> 게이트웨이 구간 HTTP/2
+# 평문은 h2c(prior knowledge, Upgrade), 인증서를 설정하면 TLS + ALPN 으로 h2 협상
+GATEWAY_HTTP2 = os.getenv('GATEWAY_HTTP2', '0').lower() in ('1', 'true', 'yes')
+GATEWAY_TLS_CERTFILE = os.getenv('GATEWAY_TLS_CERTFILE')
+GATEWAY_TLS_KEYFILE = os.getenv('GATEWAY_TLS_KEYFILE')
+
+
+def create_hypercorn_config(host, port, workers=1, shutdown_timeout=None):
+    config = hypercorn.config.Config()
+    config.bind = [f"{host}:{port}"]
+    config.workers = workers
+    config.alpn_protocols = ["h2", "http/1.1"]
+    if shutdown_timeout is not None:
+        config.graceful_timeout = shutdown_timeout
+    if GATEWAY_TLS_CERTFILE and GATEWAY_TLS_KEYFILE:
+        config.certfile = GATEWAY_TLS_CERTFILE
+        config.keyfile = GATEWAY_TLS_KEYFILE
+    return config
+
+
+# uvicorn 은 리스너를 닫고 열린 연결이 모두 끝나기를 기다린 뒤에야 lifespan shutdown 을 실행함
+# SSE 처럼 스스로 끝나지 않는 응답이 종료를 막지 않도록 연결을 기다리기 전에 on_shutdown 호출
+class GatewayUvicornServer(uvicorn.Server):
+    def __init__(self, config, on_shutdown=None):
+        super().__init__(config)
+        self.__on_shutdown = on_shutdown
+
+    async def shutdown(self, sockets=None):
+        if self.__on_shutdown is not None:
+            self.__on_shutdown()
+        await super().shutdown(sockets)
+
+
+# app 은 앱 객체 또는 "모듈:변수" 문자열 (여러 워커로 실행할 때)
+# 종료 신호를 받으면 열린 연결을 최대 shutdown_timeout 초 기다린 뒤 끊음
+# on_shutdown 은 앱 객체를 uvicorn 으로 실행할 때만 호출 (워커 프로세스는 uvicorn 이 직접 만듦)
+def run_server(app, host, port, workers=1, shutdown_timeout=None, on_shutdown=None):
+    if not GATEWAY_HTTP2:
+        if isinstance(app, str):
+            uvicorn.run(
+                app, host=host, port=port, workers=workers, timeout_graceful_shutdown=shutdown_timeout,
+                ssl_certfile=GATEWAY_TLS_CERTFILE, ssl_keyfile=GATEWAY_TLS_KEYFILE
+            )
+            return
+        config = uvicorn.Config(
+            app, host=host, port=port, timeout_graceful_shutdown=shutdown_timeout,
+            ssl_certfile=GATEWAY_TLS_CERTFILE, ssl_keyfile=GATEWAY_TLS_KEYFILE
+        )
+        GatewayUvicornServer(config, on_shutdown).run()
+        return
+    if hypercorn is None:
+        raise RuntimeError("GATEWAY_HTTP2 requires hypercorn (pip install hypercorn)")
+
+    config = create_hypercorn_config(host, port, workers, shutdown_timeout)
+    if isinstance(app, str):
+        config.application_path = app
+        hypercorn.run.run(config)
+    else:
+        asyncio.run(hypercorn.asyncio.serve(app, config))
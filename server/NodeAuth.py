@@ -0,0 +1,83 @@
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+# 노드 계정 비밀번호 해시 (PBKDF2-SHA256). 로그인할 때만 계산
+PASSWORD_HASH_ALGORITHM = "pbkdf2_sha256"
+
+
+def hash_password(password, iterations=None, salt=None):
+    iterations = iterations if iterations is not None else int(os.getenv('NODE_PASSWORD_HASH_ITERATIONS', '600000'))
+    salt = salt if salt is not None else secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{PASSWORD_HASH_ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password, password_hash):
+    try:
+        algorithm, iterations, salt, digest = password_hash.split("$")
+        iterations, salt = int(iterations), bytes.fromhex(salt)
+    except ValueError:
+        return False
+    if algorithm != PASSWORD_HASH_ALGORITHM:
+        return False
+    return hmac.compare_digest(hash_password(password, iterations, salt), password_hash)
+
+
+# 로그인한 노드에 발급한 세션 토큰 (메모리에만 보관, 게이트웨이가 다시 시작되면 노드가 다시 로그인)
+# 제어 API 인증은 DB 조회나 해시 계산 없이 dict 조회 한 번
+class NodeTokenStore:
+    def __init__(self, ttl=None, clock=time.monotonic):
+        self.__ttl = ttl if ttl is not None else float(os.getenv('NODE_TOKEN_TTL', '900'))
+        self.__clock = clock
+        # 토큰 -> (노드 이름, 만료 시각). 만료 시각 순서(발급 순서)로 유지
+        self.__tokens = OrderedDict()
+        self.__issued = 0
+        self.__rejected = 0
+
+    @property
+    def ttl(self):
+        return self.__ttl
+
+    def issue(self, node_name):
+        self.__evict_expired()
+        token = secrets.token_urlsafe(32)
+        self.__tokens[token] = (node_name, self.__clock() + self.__ttl)
+        self.__issued += 1
+        return token
+
+    # 유효하면 토큰의 노드 이름, 아니면 None
+    def verify(self, token):
+        entry = self.__tokens.get(token) if token else None
+        if entry is None or entry[1] <= self.__clock():
+            self.__rejected += 1
+            return None
+        return entry[0]
+
+    def revoke(self, node_name):
+        for token in [token for token, entry in self.__tokens.items() if entry[0] == node_name]:
+            del self.__tokens[token]
+
+    def __evict_expired(self):
+        # TTL 이 모두 같으므로 앞쪽(먼저 발급한) 토큰부터 만료됨
+        now = self.__clock()
+        while self.__tokens:
+            token, (node_name, expires_at) = next(iter(self.__tokens.items()))
+            if expires_at > now:
+                break
+            del self.__tokens[token]
+
+    def __len__(self):
+        self.__evict_expired()
+        return len(self.__tokens)
+
+    def get_stats(self):
+        return {
+            "tokens": len(self),
+            "ttl": self.__ttl,
+            "issued": self.__issued,
+            "rejected": self.__rejected,
+        }
@@ -0,0 +1,51 @@
+import unittest
+
+from server.NodeAuth import NodeTokenStore, hash_password, verify_password
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNodeAuth(unittest.TestCase):
+
+    def test_password_hash(self):
+        password_hash = hash_password("pw", iterations=1000)
+
+        self.assertNotIn("pw", password_hash.split("$"))
+        self.assertTrue(verify_password("pw", password_hash))
+        self.assertFalse(verify_password("wrong", password_hash))
+        self.assertFalse(verify_password("pw", "pw"))
+        # 같은 비밀번호도 솔트가 달라 해시가 다릅니다.
+        self.assertNotEqual(hash_password("pw", iterations=1000), password_hash)
+
+    def test_token_expires(self):
+        clock = FakeClock()
+        token_store = NodeTokenStore(ttl=10, clock=clock)
+        token = token_store.issue("node-a")
+
+        self.assertEqual(token_store.verify(token), "node-a")
+        self.assertIsNone(token_store.verify("unknown"))
+        self.assertIsNone(token_store.verify(None))
+
+        clock.now = 10
+        self.assertIsNone(token_store.verify(token))
+        self.assertEqual(len(token_store), 0)
+        self.assertEqual(token_store.get_stats()["rejected"], 3)
+
+    def test_revoke(self):
+        token_store = NodeTokenStore(ttl=10)
+        token_a = token_store.issue("node-a")
+        token_b = token_store.issue("node-b")
+
+        token_store.revoke("node-a")
+        self.assertIsNone(token_store.verify(token_a))
+        self.assertEqual(token_store.verify(token_b), "node-b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+# HTTP/2 는 h2 모듈이 설치되어 있을 때만 사용
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+# 0 이하이면 제한 없음
+def get_timeout_setting(name, default):
+    value = float(os.getenv(name, default))
+    return value if value > 0 else None
+
+
+class NodeClientEntry:
+    def __init__(self, proxy_port, client, connection=None, http2=False):
+        self.proxy_port = proxy_port
+        self.client = client
+        self.connection = connection
+        self.http2 = http2
+        # 백엔드가 HTTP/2 로 응답한 적이 있는지
+        self.http2_verified = False
+        # HTTP/1.1 클라이언트 (HTTP/2 노드만, 처음 쓸 때 생성)
+        self.http1_client = None
+        self.last_used = time.monotonic()
+        # 응답 본문 전송이나 WebSocket 중계가 끝나지 않은 요청 수 (0 보다 크면 유휴 정리하지 않음)
+        self.in_use = 0
+
+
+# 노드별로 SOCKS 프록시를 통과하는 keep-alive 클라이언트를 유지
+# 터널이 만들어질 때 등록하고, 연결 해제 시 정리
+# 같은 프로세스에 노드의 SSH 연결이 있으면 channel_transport_factory 로 SSH 채널에 바로 연결하는 클라이언트를 만든다
+# http2 를 켜면 백엔드와 h2c(prior knowledge) 연결 하나로 여러 요청을 동시에 보내고, h2c 를 받지 않는 노드는 HTTP/1.1 로 되돌린다
+# get/get_http1_client 로 받은 클라이언트는 요청이 끝나면 release 로 돌려준다 (사용 중인 풀은 유휴 정리하지 않음)
+class NodeClientRegistry:
+    def __init__(
+            self,
+            max_connections=None,
+            max_keepalive_connections=None,
+            keepalive_expiry=None,
+            idle_timeout=None,
+            channel_transport_factory=None,
+            http2=None,
+            timeout=None
+    ):
+        self.__limits = httpx.Limits(
+            max_connections=max_connections if max_connections is not None
+            else int(os.getenv('PROXY_POOL_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=max_keepalive_connections if max_keepalive_connections is not None
+            else int(os.getenv('PROXY_POOL_MAX_KEEPALIVE', '20')),
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None
+            else float(os.getenv('PROXY_POOL_KEEPALIVE_EXPIRY', '30')),
+        )
+        self.__idle_timeout = idle_timeout if idle_timeout is not None \
+            else float(os.getenv('PROXY_POOL_IDLE_TIMEOUT', '300'))
+        # 멈춘 백엔드나 끊긴 터널에서 /route 요청이 끝없이 기다리지 않도록 연결/풀 대기는 항상 제한
+        # 읽기 제한은 청크 사이 간격에 적용되므로 오래 조용한 스트리밍 응답이 있으면 PROXY_TIMEOUT_READ=0 으로 끔
+        self.__timeout = timeout if timeout is not None else httpx.Timeout(
+            connect=float(os.getenv('PROXY_TIMEOUT_CONNECT', '10')),
+            read=get_timeout_setting('PROXY_TIMEOUT_READ', '60'),
+            write=get_timeout_setting('PROXY_TIMEOUT_WRITE', '60'),
+            pool=float(os.getenv('PROXY_TIMEOUT_POOL', '10')),
+        )
+
+        # TLS 설정은 한 번만 만들어 모든 클라이언트가 공유 (클라이언트마다 만들면 생성에 수십 ms)
+        self.__ssl_context = httpx.create_ssl_context()
+
+        self.__channel_transport_factory = channel_transport_factory
+        if http2 is None:
+            http2 = os.getenv('PROXY_POOL_HTTP2', '0').lower() in ('1', 'true', 'yes')
+        self.__http2 = http2 and h2 is not None
+        # h2c 를 받지 않는 백엔드의 노드 (연결 해제 시 다시 시도)
+        self.__http1_nodes = set()
+
+        self.__entries = {}
+        # 노드 이름 -> 터널의 SSH 연결 (유휴 정리와 관계없이 연결 해제 시까지 유지)
+        self.__connections = {}
+        self.__direct_client = None
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    @property
+    def limits(self):
+        return self.__limits
+
+    @property
+    def idle_timeout(self):
+        return self.__idle_timeout
+
+    @property
+    def timeout(self):
+        return self.__timeout
+
+    @property
+    def http2(self):
+        return self.__http2
+
+    def create_client(self, proxy_port, connection=None, http2=False):
+        if connection is not None and self.__channel_transport_factory is not None:
+            transport = self.__channel_transport_factory(
+                connection, self.__limits, verify=self.__ssl_context, http2=http2
+            )
+        else:
+            transport = httpx.AsyncHTTPTransport(
+                proxy=f"socks5://localhost:{proxy_port}",
+                limits=self.__limits,
+                verify=self.__ssl_context,
+                http1=not http2,
+                http2=http2
+            )
+        return httpx.AsyncClient(transport=transport, timeout=self.__timeout, verify=self.__ssl_context)
+
+    # 노드의 SSH 연결로 리버스 포워딩된 로컬 포트에 바로 붙는 공용 클라이언트
+    def get_direct_client(self):
+        if self.__direct_client is None or self.__direct_client.is_closed:
+            # 여러 노드가 함께 쓰므로 전체 연결 수는 제한하지 않고 keep-alive 설정만 따른다
+            limits = httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=self.__limits.max_keepalive_connections,
+                keepalive_expiry=self.__limits.keepalive_expiry
+            )
+            transport = httpx.AsyncHTTPTransport(limits=limits, verify=self.__ssl_context)
+            self.__direct_client = httpx.AsyncClient(
+                transport=transport, timeout=self.__timeout, verify=self.__ssl_context
+            )
+        return self.__direct_client
+
+    async def open(self, node_name, proxy_port, connection=None):
+        if connection is not None and self.__channel_transport_factory is not None:
+            self.__connections[node_name] = connection
+        connection = self.__connections.get(node_name)
+        entry = self.__entries.get(node_name)
+        if entry is not None and entry.proxy_port == proxy_port and entry.connection is connection:
+            entry.last_used = time.monotonic()
+            return entry.client
+
+        await self.__close_client(node_name)
+        http2 = self.__http2 and node_name not in self.__http1_nodes
+        entry = NodeClientEntry(proxy_port, self.create_client(proxy_port, connection, http2), connection, http2)
+        self.__entries[node_name] = entry
+        return entry.client
+
+    async def get(self, node_name, proxy_port):
+        entry = self.__entries.get(node_name)
+        if entry is not None and entry.proxy_port == proxy_port and entry.connection is self.__connections.get(node_name):
+            self.__hits += 1
+            entry.last_used = time.monotonic()
+            entry.in_use += 1
+            return entry.client
+
+        # 터널 정보가 바뀌었거나 유휴 정리로 제거된 경우 새 풀을 만든다
+        self.__misses += 1
+        client = await self.open(node_name, proxy_port)
+        self.__entries[node_name].in_use += 1
+        return client
+
+    # get 으로 받은 클라이언트의 요청이 끝남. 그새 교체된 풀이면 무시
+    def release(self, node_name, client):
+        entry = self.__entries.get(node_name)
+        if entry is not None and client in (entry.client, entry.http1_client) and entry.in_use > 0:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    # WebSocket Upgrade 와, h2c 지원이 확인되기 전의 다시 보낼 수 없는(본문이 있는) 요청은 HTTP/1.1 로 전달
+    async def get_http1_client(self, node_name, proxy_port):
+        client = await self.get(node_name, proxy_port)
+        entry = self.__entries[node_name]
+        if not entry.http2:
+            return client
+        if entry.http1_client is None:
+            entry.http1_client = self.create_client(proxy_port, entry.connection)
+        return entry.http1_client
+
+    def is_http2_verified(self, node_name):
+        entry = self.__entries.get(node_name)
+        return entry is not None and entry.http2_verified
+
+    def verify_http2(self, node_name):
+        entry = self.__entries.get(node_name)
+        if entry is not None and entry.http2:
+            entry.http2_verified = True
+
+    async def disable_http2(self, node_name):
+        # h2c 로 응답한 적 없는 HTTP/2 노드였으면 HTTP/1.1 로 바꾸고 True
+        entry = self.__entries.get(node_name)
+        if entry is None or not entry.http2 or entry.http2_verified:
+            return False
+        self.__http1_nodes.add(node_name)
+        await self.__close_client(node_name)
+        return True
+
+    async def __close_client(self, node_name):
+        entry = self.__entries.pop(node_name, None)
+        if entry is not None:
+            await entry.client.aclose()
+            if entry.http1_client is not None:
+                await entry.http1_client.aclose()
+
+    async def close(self, node_name):
+        self.__connections.pop(node_name, None)
+        self.__http1_nodes.discard(node_name)
+        await self.__close_client(node_name)
+
+    async def close_all(self):
+        self.__connections.clear()
+        for node_name in list(self.__entries):
+            await self.close(node_name)
+        if self.__direct_client is not None:
+            await self.__direct_client.aclose()
+
+    async def evict_idle(self):
+        now = time.monotonic()
+        idle_nodes = [
+            node_name for node_name, entry in self.__entries.items()
+            if entry.in_use == 0 and now - entry.last_used > self.__idle_timeout
+        ]
+        for node_name in idle_nodes:
+            await self.__close_client(node_name)
+            self.__evictions += 1
+        return len(idle_nodes)
+
+    async def run_idle_eviction(self, interval=None):
+        if interval is None:
+            interval = max(self.__idle_timeout / 2, 1)
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle()
+
+    def __contains__(self, node_name):
+        return node_name in self.__entries
+
+    def get_stats(self):
+        return {
+            "nodes": len(self.__entries),
+            "in_use": sum(entry.in_use for entry in self.__entries.values()),
+            "channel_nodes": sum(1 for entry in self.__entries.values() if entry.connection is not None),
+            "http2": self.__http2,
+            "http2_nodes": sum(1 for entry in self.__entries.values() if entry.http2),
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "evictions": self.__evictions,
+            "max_connections": self.__limits.max_connections,
+            "max_keepalive_connections": self.__limits.max_keepalive_connections,
+            "keepalive_expiry": self.__limits.keepalive_expiry,
+            "idle_timeout": self.__idle_timeout,
+        }
@@ -0,0 +1,134 @@
+import unittest
+
+import httpx
+from server.NodeClientRegistry import NodeClientRegistry, h2
+
+
+class TestNodeClientRegistry(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.registry = NodeClientRegistry(max_connections=4, max_keepalive_connections=2, idle_timeout=60)
+
+    async def asyncTearDown(self):
+        await self.registry.close_all()
+
+    async def test_reuse_client_per_node(self):
+        opened = await self.registry.open("node-a", 20000)
+
+        # 같은 터널이면 같은 클라이언트를 재사용합니다.
+        self.assertIs(await self.registry.get("node-a", 20000), opened)
+        self.assertIs(await self.registry.get("node-a", 20000), opened)
+
+        stats = self.registry.get_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 0)
+        self.assertEqual(stats["max_connections"], 4)
+
+    async def test_proxy_port_change_creates_new_client(self):
+        opened = await self.registry.open("node-a", 20000)
+        replaced = await self.registry.get("node-a", 20001)
+
+        self.assertIsNot(replaced, opened)
+        self.assertTrue(opened.is_closed)
+        self.assertEqual(self.registry.get_stats()["misses"], 1)
+
+    async def test_close_on_disconnect(self):
+        opened = await self.registry.open("node-a", 20000)
+        await self.registry.close("node-a")
+
+        self.assertNotIn("node-a", self.registry)
+        self.assertTrue(opened.is_closed)
+
+    async def test_client_timeouts(self):
+        opened = await self.registry.open("node-a", 20000)
+
+        # 연결과 풀 대기는 기본으로 제한됩니다.
+        self.assertIsNotNone(opened.timeout.connect)
+        self.assertIsNotNone(opened.timeout.pool)
+        self.assertEqual(self.registry.get_direct_client().timeout, opened.timeout)
+
+        registry = NodeClientRegistry(timeout=httpx.Timeout(5, read=None))
+        self.assertIsNone((await registry.open("node-a", 20000)).timeout.read)
+        await registry.close_all()
+
+    async def test_evict_idle(self):
+        registry = NodeClientRegistry(idle_timeout=0)
+        opened = await registry.open("node-a", 20000)
+
+        self.assertEqual(await registry.evict_idle(), 1)
+        self.assertTrue(opened.is_closed)
+        self.assertEqual(registry.get_stats()["evictions"], 1)
+
+        # 유휴 정리 이후 요청은 miss로 집계되고 새 풀을 만듭니다.
+        await registry.get("node-a", 20000)
+        self.assertEqual(registry.get_stats()["misses"], 1)
+        await registry.close_all()
+
+    async def test_client_in_use_is_not_evicted(self):
+        registry = NodeClientRegistry(idle_timeout=0)
+        client = await registry.get("node-a", 20000)
+
+        # 응답 본문을 보내는 중인 풀은 유휴 시간이 지나도 닫지 않습니다.
+        self.assertEqual(await registry.evict_idle(), 0)
+        self.assertFalse(client.is_closed)
+        self.assertEqual(registry.get_stats()["in_use"], 1)
+
+        registry.release("node-a", client)
+        self.assertEqual(await registry.evict_idle(), 1)
+        self.assertTrue(client.is_closed)
+        # 이미 정리된 풀을 다시 반환해도 무시합니다.
+        registry.release("node-a", client)
+        await registry.close_all()
+
+    async def test_channel_transport_follows_ssh_connection(self):
+        created = []
+
+        def channel_transport_factory(connection, limits, verify, http2):
+            created.append(connection)
+            return httpx.AsyncHTTPTransport(limits=limits, verify=verify)
+
+        registry = NodeClientRegistry(idle_timeout=0, channel_transport_factory=channel_transport_factory)
+        connection = object()
+        opened = await registry.open("node-a", 20000, connection)
+        self.assertEqual(registry.get_stats()["channel_nodes"], 1)
+
+        # 유휴 정리 후에도 SSH 연결이 남아 있으면 같은 연결로 다시 만듭니다.
+        await registry.evict_idle()
+        self.assertIsNot(await registry.get("node-a", 20000), opened)
+        self.assertEqual(created, [connection, connection])
+
+        # 연결 해제 후에는 SOCKS 클라이언트를 사용합니다.
+        await registry.close("node-a")
+        await registry.get("node-a", 20000)
+        self.assertEqual(len(created), 2)
+        self.assertEqual(registry.get_stats()["channel_nodes"], 0)
+        await registry.close_all()
+
+    @unittest.skipIf(h2 is None, "h2 is not installed")
+    async def test_http2_falls_back_to_http1(self):
+        created = []
+
+        def channel_transport_factory(connection, limits, verify, http2):
+            created.append(http2)
+            return httpx.AsyncHTTPTransport(limits=limits, verify=verify)
+
+        registry = NodeClientRegistry(channel_transport_factory=channel_transport_factory, http2=True)
+        h2_client = await registry.open("node-a", 20000, object())
+        await registry.open("node-b", 20001, object())
+
+        # Upgrade 요청용 HTTP/1.1 클라이언트는 따로 만듭니다.
+        self.assertIsNot(await registry.get_http1_client("node-a", 20000), h2_client)
+        self.assertEqual(created, [True, True, False])
+
+        # h2c 로 응답한 노드는 되돌리지 않고, 응답한 적 없는 노드만 HTTP/1.1 로 바꿉니다.
+        registry.verify_http2("node-a")
+        self.assertFalse(await registry.disable_http2("node-a"))
+        self.assertTrue(await registry.disable_http2("node-b"))
+        await registry.get("node-b", 20001)
+        self.assertEqual(created[-1], False)
+        self.assertEqual(registry.get_stats()["http2_nodes"], 1)
+        await registry.close_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from peewee import fn
+from playhouse.migrate import SqliteMigrator, migrate
+
+# nodes.db 용 SQLite 설정
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -16 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+
+# peewee 호출을 전용 스레드 풀에서 실행해 이벤트 루프를 막지 않도록 함
+class NodeRepository:
+    def __init__(self, database, node_model, max_workers=None, flush_interval=None):
+        self.__database = database
+        self.__node_model = node_model
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers if max_workers is not None else int(os.getenv('NODE_DB_WORKERS', '2')),
+            thread_name_prefix='node-db'
+        )
+        self.__flush_interval = flush_interval if flush_interval is not None \
+            else float(os.getenv('NODE_DB_FLUSH_INTERVAL', '0.05'))
+
+        self.__pending_status = {}
+        self.__flush_task = None
+        self.__flushed_batches = 0
+
+    @property
+    def node_model(self):
+        return self.__node_model
+
+    @property
+    def flushed_batches(self):
+        return self.__flushed_batches
+
+    # 테이블 생성 (이벤트 루프 시작 전에 호출). 정리한 중복 행 (id, node_name, route_port) 목록을 반환
+    def prepare(self):
+        node_model = self.__node_model
+        self.__database.connect(reuse_if_open=True)
+        if self.__database.table_exists(node_model._meta.table_name):
+            # node_name 유니크 인덱스를 만들기 전에 중복 행 정리
+            # 기존 조회(.get())는 항상 첫 번째 행만 사용했으므로 나머지는 버린다 (지운 행은 모두 로그로 남김)
+            first_ids = node_model.select(fn.MIN(node_model.id)).group_by(node_model.node_name)
+            duplicate_query = node_model.select(node_model.id, node_model.node_name, node_model.route_port) \
+                .where(node_model.id.not_in(first_ids)).order_by(node_model.id)
+            removed_duplicates = [(node.id, node.node_name, node.route_port) for node in duplicate_query]
+            for node_id, node_name, route_port in removed_duplicates:
+                print(f"Removed duplicate node row: id={node_id} node_name={node_name} route_port={route_port}")
+            if removed_duplicates:
+                node_model.delete().where(node_model.id.in_([row[0] for row in removed_duplicates])).execute()
+            self.__add_missing_columns()
+        else:
+            removed_duplicates = []
+        self.__database.create_tables([node_model])
+        self.__database.close()
+        return removed_duplicates
+
+    # 이전 버전의 nodes.db 에 없는 컬럼(nullable)을 추가
+    def __add_missing_columns(self):
+        node_model = self.__node_model
+        columns = {column.name for column in self.__database.get_columns(node_model._meta.table_name)}
+        migrator = SqliteMigrator(self.__database)
+        operations = [
+            migrator.add_column(node_model._meta.table_name, field.column_name, field)
+            for field in node_model._meta.sorted_fields
+            if field.column_name not in columns
+        ]
+        if operations:
+            migrate(*operations)
+
+    async def run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(function, *args, **kwargs))
+
+    def __create_node(self, node_name, node_password_hash, route_port, service_group=None, node_ssh_password=None):
+        return self.__node_model.create(
+            node_name=node_name,
+            node_password_hash=node_password_hash,
+            node_ssh_password=node_ssh_password,
+            route_port=route_port,
+            service_group=service_group,
+        )
+
+    # 로그인 비밀번호는 해시로만 받음
+    async def create_node(self, node_name, node_password_hash, route_port, service_group=None, node_ssh_password=None):
+        return await self.run(
+            self.__create_node, node_name, node_password_hash, route_port, service_group, node_ssh_password
+        )
+
+    def __get_credential(self, node_name):
+        node_model = self.__node_model
+        return node_model.select(
+            node_model.node_name, node_model.node_password, node_model.node_password_hash, node_model.node_ssh_password
+        ).where(node_model.node_name == node_name).first()
+
+    # 로그인 확인과 터널 접속용 계정 정보 (없으면 None)
+    async def get_credential(self, node_name):
+        return await self.run(self.__get_credential, node_name)
+
+    def __update_credential(self, node_name, fields):
+        node_model = self.__node_model
+        return node_model.update(**fields).where(node_model.node_name == node_name).execute()
+
+    # 계정 정보는 모아서 기록하지 않고 바로 기록 (변경 직후 이전 비밀번호로 로그인되지 않도록)
+    async def update_credential(self, node_name, **fields):
+        return await self.run(self.__update_credential, node_name, fields)
+
+    def __get_node(self, node_name):
+        return self.__node_model.select().where(self.__node_model.node_name == node_name).get()
+
+    async def get_node(self, node_name):
+        return await self.run(self.__get_node, node_name)
+
+    def __list_nodes(self):
+        return list(self.__node_model.select().order_by(self.__node_model.id))
+
+    async def list_nodes(self):
+        return await self.run(self.__list_nodes)
+
+    def __reset_connections(self):
+        node_model = self.__node_model
+        return node_model.update(connection_valid=False).where(node_model.connection_valid == True).execute()
+
+    # 프로세스 시작 시 남아 있는 터널은 없으므로 연결 상태를 모두 해제 (바뀐 행 수 반환)
+    async def reset_connections(self):
+        return await self.run(self.__reset_connections)
+
+    def __list_tunnel_leases(self):
+        node_model = self.__node_model
+        return list(node_model.select().where(
+            node_model.remote_ssh_port.is_null(False) & node_model.proxy_port.is_null(False)
+        ).order_by(node_model.id))
+
+    # 종료 전에 쓰던 터널 포트가 남아 있는 노드 (다시 연결 대상)
+    async def list_tunnel_leases(self):
+        return await self.run(self.__list_tunnel_leases)
+
+    # 상태 변경(connection_valid, proxy_port, service_group, 터널 임대)은 모아서 한 트랜잭션으로 기록
+    def queue_status(self, node_name, **fields):
+        self.__pending_status.setdefault(node_name, {}).update(fields)
+        if self.__flush_task is None or self.__flush_task.done():
+            self.__flush_task = asyncio.get_running_loop().create_task(self.__delayed_flush())
+
+    async def __delayed_flush(self):
+        # 기록 중에 들어온 변경도 다음 배치로 이어서 기록
+        while self.__pending_status:
+            await asyncio.sleep(self.__flush_interval)
+            await self.flush_status()
+
+    def __write_status(self, pending_status):
+        node_model = self.__node_model
+        with self.__database.atomic():
+            for node_name, fields in pending_status.items():
+                node_model.update(**fields).where(node_model.node_name == node_name).execute()
+
+    async def flush_status(self):
+        if not self.__pending_status:
+            return 0
+        pending_status, self.__pending_status = self.__pending_status, {}
+        await self.run(self.__write_status, pending_status)
+        self.__flushed_batches += 1
+        return len(pending_status)
+
+    async def close(self):
+        if self.__flush_task is not None and not self.__flush_task.done():
+            self.__flush_task.cancel()
+        await self.flush_status()
+        self.__executor.shutdown(wait=True)
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from peewee import SqliteDatabase, Model, CharField, IntegerField, BooleanField, TextField, IntegrityError
+
+from server.NodeRepository import NodeRepository, SQLITE_PRAGMAS
+
+db = SqliteDatabase(None)
+
+class Node(Model):
+    node_name = CharField(max_length=255, unique=True)
+    node_password = CharField(max_length=255, default="")
+    node_password_hash = CharField(max_length=255, null=True)
+    node_ssh_password = CharField(max_length=255, null=True)
+    route_port = IntegerField()
+    connection_valid = BooleanField(default=False)
+    proxy_port = IntegerField(null=True)
+    service_group = CharField(max_length=255, null=True)
+    remote_ssh_port = IntegerField(null=True)
+    services = TextField(null=True)
+
+    class Meta:
+        database = db
+
+
+class LegacyNode(Model):
+    node_name = CharField(max_length=255)
+    node_password = CharField(max_length=255)
+    route_port = IntegerField()
+    connection_valid = BooleanField(default=False)
+    proxy_port = IntegerField(null=True)
+
+    class Meta:
+        database = db
+        table_name = 'node'
+
+
+class TestNodeRepository(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        db.init(os.path.join(self.work_dir.name, 'nodes.db'), pragmas=SQLITE_PRAGMAS)
+        self.repository = NodeRepository(db, Node, flush_interval=0.01)
+
+    async def asyncTearDown(self):
+        await self.repository.close()
+        db.close()
+        self.work_dir.cleanup()
+
+    async def test_prepare_enables_wal_and_unique_index(self):
+        self.repository.prepare()
+
+        journal_mode = await self.repository.run(lambda: db.execute_sql('PRAGMA journal_mode').fetchone()[0])
+        self.assertEqual(journal_mode, 'wal')
+
+        await self.repository.create_node("node-a", "pw", 8000)
+        with self.assertRaises(IntegrityError):
+            await self.repository.create_node("node-a", "pw", 9000)
+
+    async def test_prepare_removes_legacy_duplicates(self):
+        db.connect()
+        db.create_tables([LegacyNode])
+        LegacyNode.create(node_name="node-a", node_password="pw", route_port=8000)
+        LegacyNode.create(node_name="node-a", node_password="pw", route_port=9000)
+        db.close()
+
+        removed_duplicates = self.repository.prepare()
+
+        # 기존 조회와 같이 첫 번째 행만 남고, 지운 행을 알려 줍니다.
+        self.assertEqual([row[1:] for row in removed_duplicates], [("node-a", 9000)])
+        nodes = await self.repository.list_nodes()
+        self.assertEqual([(node.node_name, node.route_port) for node in nodes], [("node-a", 8000)])
+
+    async def test_prepare_adds_missing_columns(self):
+        db.connect()
+        db.create_tables([LegacyNode])
+        LegacyNode.create(node_name="node-a", node_password="pw", route_port=8000)
+        db.close()
+
+        self.repository.prepare()
+
+        # 이전 버전 DB 에도 새 컬럼이 추가되어 기존 행을 그대로 읽을 수 있습니다.
+        node_instance = await self.repository.get_node("node-a")
+        self.assertIsNone(node_instance.service_group)
+        await self.repository.create_node("node-b", "pw", 8001, service_group="api")
+        self.assertEqual((await self.repository.get_node("node-b")).service_group, "api")
+
+    async def test_status_updates_are_batched(self):
+        self.repository.prepare()
+        await self.repository.create_node("node-a", "pw", 8000)
+        await self.repository.create_node("node-b", "pw", 8001)
+
+        self.repository.queue_status("node-a", proxy_port=20000)
+        self.repository.queue_status("node-a", connection_valid=True)
+        self.repository.queue_status("node-b", connection_valid=True)
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(self.repository.flushed_batches, 1)
+        node_a = await self.repository.get_node("node-a")
+        node_b = await self.repository.get_node("node-b")
+        self.assertEqual((node_a.proxy_port, node_a.connection_valid), (20000, True))
+        self.assertTrue(node_b.connection_valid)
+
+    async def test_reset_connections_and_tunnel_leases(self):
+        self.repository.prepare()
+        for node_name, route_port in (("node-a", 8000), ("node-b", 8001), ("node-c", 8002)):
+            await self.repository.create_node(node_name, "pw", route_port)
+        self.repository.queue_status("node-a", connection_valid=True, proxy_port=20000, remote_ssh_port=20001)
+        self.repository.queue_status("node-b", connection_valid=True, proxy_port=20002)
+        await self.repository.flush_status()
+
+        # 이전 프로세스가 남긴 연결 상태는 해제하고, 터널 포트가 남은 노드만 다시 연결 대상
+        self.assertEqual(await self.repository.reset_connections(), 2)
+        self.assertFalse((await self.repository.get_node("node-a")).connection_valid)
+        leases = await self.repository.list_tunnel_leases()
+        self.assertEqual([(node.node_name, node.remote_ssh_port) for node in leases], [("node-a", 20001)])
+
+    async def test_credential(self):
+        self.repository.prepare()
+        await self.repository.create_node("node-a", "hash", 8000, node_ssh_password="ssh-pw")
+
+        # 로그인 비밀번호는 평문으로 저장하지 않습니다.
+        credential = await self.repository.get_credential("node-a")
+        self.assertEqual(
+            (credential.node_password, credential.node_password_hash, credential.node_ssh_password),
+            ("", "hash", "ssh-pw")
+        )
+        self.assertIsNone(await self.repository.get_credential("node-b"))
+
+        self.assertEqual(await self.repository.update_credential("node-a", node_password_hash="new-hash"), 1)
+        self.assertEqual((await self.repository.get_credential("node-a")).node_password_hash, "new-hash")
+
+
+if __name__ == "__main__":
+    unittest.main()
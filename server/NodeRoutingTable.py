@@ -0,0 +1,303 @@
+import asyncio
+import uuid
+from bisect import bisect_right
+from collections import OrderedDict
+
+# 노드 상태 변경 피드(/node/status/changes)에서 추적하는 필드
+STATUS_FIELDS = ("connection_valid", "proxy_port")
+
+
+class NodeRoute:
+    def __init__(self, node_name, route_port, proxy_port=None, connection_valid=False, service_group=None):
+        self.node_name = node_name
+        self.route_port = route_port
+        self.proxy_port = proxy_port
+        self.connection_valid = connection_valid
+        # 같은 서비스를 제공하는 노드 묶음 (/route/{service_group}/... 로 분산)
+        self.service_group = service_group
+        # 노드의 단일 SSH 연결로 리버스 포워딩된 서비스: 서비스 이름 -> 게이트웨이 쪽 포트
+        self.services = {}
+        # 터널이 끊겨 재연결 중인지 (메모리에만 보관)
+        self.reconnecting = False
+        # 다음 연결을 기다리는 요청용 이벤트
+        self.connected_event = None
+
+    def to_dict(self):
+        return {
+            "node_name": self.node_name,
+            "route_port": self.route_port,
+            "proxy_port": self.proxy_port,
+            "connection_valid": self.connection_valid,
+            "services": self.services,
+            "service_group": self.service_group,
+            "reconnecting": self.reconnecting,
+        }
+
+    def to_status(self):
+        return {
+            "node_name": self.node_name,
+            "connection_valid": self.connection_valid,
+            "proxy_port": self.proxy_port,
+        }
+
+    def notify_connected(self):
+        if self.connected_event is not None:
+            self.connected_event.set()
+            self.connected_event = None
+
+
+# /route 조회용 메모리 라우팅 테이블
+# 읽기는 dict 에서만 하고, 쓰기는 메모리에 반영한 뒤 NodeRepository 를 통해 DB 에 기록
+# 변경마다 버전을 올려 /route 워커가 바뀐 노드만 받아갈 수 있도록 함 (get_changes / apply_changes)
+class NodeRoutingTable:
+    def __init__(self, node_repository=None):
+        # node_repository 가 없으면 다른 프로세스의 테이블을 받아 쓰는 복제본
+        self.__node_repository = node_repository
+        self.__routes = {}
+        # 서비스 그룹 이름 -> 노드 이름 목록
+        self.__groups = {}
+
+        # 프로세스가 다시 시작되면 버전이 처음부터 시작하므로 epoch 로 구분
+        self.__epoch = uuid.uuid4().hex
+        self.__version = 0
+        # 노드 이름 -> 마지막으로 바뀐 버전
+        self.__changed_versions = {}
+        self.__changed_event = asyncio.Event()
+
+        # 상태(connection_valid/proxy_port) 변경은 따로 버전을 매겨 대시보드가 바뀐 상태만 받아갈 수 있도록 함
+        self.__status_version = 0
+        # 노드 이름 -> 상태가 마지막으로 바뀐 버전 (바뀐 순서대로 유지해 최근 변경만 훑음)
+        self.__status_versions = OrderedDict()
+        self.__status_event = asyncio.Event()
+        # 이름순 노드 목록 (페이지 조회용, 노드 목록이 바뀌면 다시 만듦)
+        self.__sorted_names = None
+
+    @property
+    def epoch(self):
+        return self.__epoch
+
+    @property
+    def version(self):
+        return self.__version
+
+    @property
+    def status_version(self):
+        return self.__status_version
+
+    def __mark_changed(self, node_name):
+        self.__version += 1
+        self.__changed_versions[node_name] = self.__version
+        self.__notify_changed()
+
+    def __notify_changed(self):
+        # 기다리던 워커를 깨우고 다음 변경을 위한 이벤트로 교체
+        self.__changed_event.set()
+        self.__changed_event = asyncio.Event()
+
+    def __mark_status_changed(self, node_name):
+        self.__status_version += 1
+        self.__status_versions[node_name] = self.__status_version
+        self.__status_versions.move_to_end(node_name)
+        self.__notify_status_changed()
+
+    def __notify_status_changed(self):
+        self.__status_event.set()
+        self.__status_event = asyncio.Event()
+
+    # since 이후에 바뀐 노드 목록. epoch 가 다르면 전체 목록
+    def get_changes(self, epoch=None, since=0):
+        full = epoch != self.__epoch or since > self.__version
+        return {
+            "epoch": self.__epoch,
+            "version": self.__version,
+            "full": full,
+            "routes": [
+                route.to_dict() for node_name, route in self.__routes.items()
+                if full or self.__changed_versions.get(node_name, 0) > since
+            ],
+        }
+
+    async def wait_changes(self, epoch=None, since=0, timeout=30):
+        if epoch == self.__epoch and since == self.__version:
+            try:
+                await asyncio.wait_for(self.__changed_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get_changes(epoch, since)
+
+    # 복제본 쪽: get_changes 결과를 반영 (DB 에는 기록하지 않음)
+    def apply_changes(self, changes):
+        if changes["full"]:
+            self.__routes = {}
+            self.__groups = {}
+            self.__changed_versions = {}
+        for fields in changes["routes"]:
+            route = self.__routes.get(fields["node_name"])
+            if route is None:
+                route = NodeRoute(fields["node_name"], fields["route_port"])
+                self.__routes[route.node_name] = route
+            else:
+                self.__remove_group_member(route)
+            for field, value in fields.items():
+                setattr(route, field, value)
+            self.__add_group_member(route)
+            if route.connection_valid or not route.reconnecting:
+                route.notify_connected()
+        self.__epoch = changes["epoch"]
+        self.__version = changes["version"]
+        self.__sorted_names = None
+        return len(changes["routes"])
+
+    async def load(self):
+        routes = {}
+        for node_instance in await self.__node_repository.list_nodes():
+            routes[node_instance.node_name] = NodeRoute(
+                node_instance.node_name,
+                node_instance.route_port,
+                node_instance.proxy_port,
+                node_instance.connection_valid,
+                node_instance.service_group
+            )
+        self.__routes = routes
+        self.__groups = {}
+        for route in routes.values():
+            self.__add_group_member(route)
+        # 테이블 전체가 바뀌었으므로 복제본은 전체 목록을 다시 받음
+        self.__epoch = uuid.uuid4().hex
+        self.__changed_versions = {}
+        self.__status_versions = OrderedDict()
+        self.__sorted_names = None
+        self.__notify_changed()
+        self.__notify_status_changed()
+        return len(routes)
+
+    def __add_group_member(self, route):
+        if route.service_group is not None:
+            self.__groups.setdefault(route.service_group, []).append(route.node_name)
+
+    def __remove_group_member(self, route):
+        members = self.__groups.get(route.service_group)
+        if members is not None and route.node_name in members:
+            members.remove(route.node_name)
+            if not members:
+                del self.__groups[route.service_group]
+
+    def get(self, node_name):
+        return self.__routes.get(node_name)
+
+    async def add(self, node_name, node_password_hash, route_port, service_group=None, node_ssh_password=None):
+        # 계정 생성은 DB 기록(유니크 검사)이 끝난 뒤에 메모리에 반영
+        await self.__node_repository.create_node(
+            node_name, node_password_hash, route_port, service_group, node_ssh_password
+        )
+        route = NodeRoute(node_name, route_port, service_group=service_group)
+        self.__routes[node_name] = route
+        self.__add_group_member(route)
+        self.__sorted_names = None
+        self.__mark_changed(node_name)
+        self.__mark_status_changed(node_name)
+        return route
+
+    def update(self, node_name, **fields):
+        route = self.__routes.get(node_name)
+        if route is not None:
+            status_changed = any(
+                field in STATUS_FIELDS and getattr(route, field) != value for field, value in fields.items()
+            )
+            if "service_group" in fields:
+                self.__remove_group_member(route)
+            for field, value in fields.items():
+                setattr(route, field, value)
+            if "service_group" in fields:
+                self.__add_group_member(route)
+            if fields.get("connection_valid"):
+                route.notify_connected()
+            self.__mark_changed(node_name)
+            if status_changed:
+                self.__mark_status_changed(node_name)
+        # 상태 변경은 모아서 기록
+        self.__node_repository.queue_status(node_name, **fields)
+        return route
+
+    def set_reconnecting(self, node_name, reconnecting):
+        route = self.__routes.get(node_name)
+        if route is not None:
+            if route.reconnecting != reconnecting:
+                route.reconnecting = reconnecting
+                self.__mark_changed(node_name)
+            if not reconnecting:
+                # 재연결을 포기한 경우에도 기다리던 요청을 깨움
+                route.notify_connected()
+        return route
+
+    # 다음 연결(재연결 포함)이 맺어질 때까지 최대 timeout 초 대기
+    async def wait_connected(self, node_name, timeout, require_new=False):
+        route = self.__routes.get(node_name)
+        if route is None:
+            return None
+        if route.connection_valid and not require_new:
+            return route
+        if route.connected_event is None:
+            route.connected_event = asyncio.Event()
+        try:
+            await asyncio.wait_for(route.connected_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return route if route.connection_valid else None
+
+    # 서비스 포트는 노드의 SSH 연결이 살아있는 동안만 유효하므로 메모리에만 보관
+    def set_services(self, node_name, services):
+        route = self.__routes.get(node_name)
+        if route is not None:
+            route.services = dict(services)
+            self.__mark_changed(node_name)
+        return route
+
+    # 이름순으로 after 다음부터 최대 limit 개. 다음 페이지가 있으면 마지막 노드 이름을 커서로 반환
+    def get_page(self, after=None, limit=None):
+        if self.__sorted_names is None:
+            self.__sorted_names = sorted(self.__routes)
+        names = self.__sorted_names
+        start = bisect_right(names, after) if after is not None else 0
+        end = len(names) if limit is None else min(start + limit, len(names))
+        next_cursor = names[end - 1] if end < len(names) and end > start else None
+        return [self.__routes[node_name] for node_name in names[start:end]], next_cursor
+
+    # since 이후에 상태가 바뀐 노드 (같은 노드가 여러 번 바뀌었으면 마지막 상태만). epoch 가 다르면 전체 목록
+    def get_status_changes(self, epoch=None, since=0):
+        full = epoch != self.__epoch or since > self.__status_version
+        if full:
+            nodes = [route.to_status() for route in self.__routes.values()]
+        else:
+            changed_names = []
+            for node_name, version in reversed(self.__status_versions.items()):
+                if version <= since:
+                    break
+                changed_names.append(node_name)
+            nodes = [self.__routes[node_name].to_status() for node_name in reversed(changed_names)]
+        return {
+            "epoch": self.__epoch,
+            "version": self.__status_version,
+            "full": full,
+            "nodes": nodes,
+        }
+
+    async def wait_status_changes(self, epoch=None, since=0, timeout=30):
+        if epoch == self.__epoch and since == self.__status_version:
+            try:
+                await asyncio.wait_for(self.__status_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get_status_changes(epoch, since)
+
+    def get_group(self, service_group):
+        return [self.__routes[node_name] for node_name in self.__groups.get(service_group, ())]
+
+    def get_groups(self):
+        return {service_group: list(members) for service_group, members in self.__groups.items()}
+
+    def __contains__(self, node_name):
+        return node_name in self.__routes
+
+    def __len__(self):
+        return len(self.__routes)
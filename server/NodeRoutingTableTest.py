@@ -0,0 +1,189 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from peewee import SqliteDatabase, Model, CharField, IntegerField, BooleanField
+
+from server.NodeRepository import NodeRepository, SQLITE_PRAGMAS
+from server.NodeRoutingTable import NodeRoutingTable
+
+db = SqliteDatabase(None)
+
+class Node(Model):
+    node_name = CharField(max_length=255, unique=True)
+    node_password = CharField(max_length=255, default="")
+    node_password_hash = CharField(max_length=255, null=True)
+    node_ssh_password = CharField(max_length=255, null=True)
+    route_port = IntegerField()
+    connection_valid = BooleanField(default=False)
+    proxy_port = IntegerField(null=True)
+    service_group = CharField(max_length=255, null=True)
+
+    class Meta:
+        database = db
+
+
+class TestNodeRoutingTable(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        db.init(os.path.join(self.work_dir.name, 'nodes.db'), pragmas=SQLITE_PRAGMAS)
+        self.repository = NodeRepository(db, Node, flush_interval=0)
+        self.repository.prepare()
+        self.table = NodeRoutingTable(self.repository)
+
+    async def asyncTearDown(self):
+        await self.repository.close()
+        db.close()
+        self.work_dir.cleanup()
+
+    async def test_load_from_database(self):
+        Node.create(node_name="node-a", node_password="pw", route_port=8000, proxy_port=20000, connection_valid=True)
+
+        self.assertEqual(await self.table.load(), 1)
+        route = self.table.get("node-a")
+        self.assertEqual(route.route_port, 8000)
+        self.assertEqual(route.proxy_port, 20000)
+        self.assertTrue(route.connection_valid)
+        self.assertIsNone(self.table.get("node-b"))
+
+    async def test_write_through(self):
+        await self.table.add("node-a", "pw", 8000)
+        self.table.update("node-a", proxy_port=20000, connection_valid=True)
+
+        # 메모리에는 즉시 반영됩니다.
+        route = self.table.get("node-a")
+        self.assertEqual((route.proxy_port, route.connection_valid), (20000, True))
+
+        await self.repository.flush_status()
+        node_instance = await self.repository.get_node("node-a")
+        self.assertEqual((node_instance.proxy_port, node_instance.connection_valid), (20000, True))
+
+        self.table.update("node-a", connection_valid=False)
+        await self.repository.flush_status()
+        self.assertFalse((await self.repository.get_node("node-a")).connection_valid)
+
+    async def test_reload_keeps_table_consistent(self):
+        await self.table.add("node-a", "pw", 8000)
+        self.table.update("node-a", proxy_port=20000, connection_valid=True)
+        await self.repository.flush_status()
+
+        reloaded = NodeRoutingTable(self.repository)
+        await reloaded.load()
+        self.assertEqual(reloaded.get("node-a").proxy_port, 20000)
+
+
+    async def test_service_group_membership(self):
+        await self.table.add("node-a", "pw", 8000, service_group="api")
+        await self.table.add("node-b", "pw", 8001, service_group="api")
+        await self.table.add("node-c", "pw", 8002)
+
+        self.assertEqual([route.node_name for route in self.table.get_group("api")], ["node-a", "node-b"])
+
+        # 그룹 이동은 메모리와 DB 에 함께 반영됩니다.
+        self.table.update("node-b", service_group="batch")
+        self.table.update("node-c", service_group="api")
+        self.assertEqual(self.table.get_groups(), {"api": ["node-a", "node-c"], "batch": ["node-b"]})
+
+        await self.repository.flush_status()
+        reloaded = NodeRoutingTable(self.repository)
+        await reloaded.load()
+        self.assertEqual([route.node_name for route in reloaded.get_group("api")], ["node-a", "node-c"])
+        self.assertEqual(reloaded.get_group("unknown"), [])
+
+
+    async def test_replica_follows_changes(self):
+        await self.table.add("node-a", "pw", 8000)
+        await self.table.add("node-b", "pw", 8001, service_group="api")
+
+        replica = NodeRoutingTable()
+        changes = self.table.get_changes()
+        self.assertTrue(changes["full"])
+        self.assertEqual(replica.apply_changes(changes), 2)
+        self.assertEqual([route.node_name for route in replica.get_group("api")], ["node-b"])
+
+        # 이후에는 바뀐 노드만 전달됩니다.
+        self.table.update("node-a", proxy_port=20000, connection_valid=True)
+        self.table.set_services("node-a", {"api": 21000})
+        changes = self.table.get_changes(replica.epoch, replica.version)
+        self.assertFalse(changes["full"])
+        self.assertEqual([fields["node_name"] for fields in changes["routes"]], ["node-a"])
+
+        replica.apply_changes(changes)
+        route = replica.get("node-a")
+        self.assertEqual((route.proxy_port, route.connection_valid, route.services), (20000, True, {"api": 21000}))
+        self.assertEqual(self.table.get_changes(replica.epoch, replica.version)["routes"], [])
+
+        # 다시 읽어들이면 전체 목록을 받습니다.
+        await self.repository.flush_status()
+        await self.table.load()
+        self.assertTrue(self.table.get_changes(replica.epoch, replica.version)["full"])
+
+    async def test_wait_changes_wakes_on_update(self):
+        await self.table.add("node-a", "pw", 8000)
+        epoch, version = self.table.epoch, self.table.version
+
+        waiter = asyncio.create_task(self.table.wait_changes(epoch, version, timeout=1))
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        self.table.set_reconnecting("node-a", True)
+        changes = await asyncio.wait_for(waiter, timeout=0.1)
+        self.assertEqual(changes["routes"][0]["reconnecting"], True)
+
+    async def test_get_page_by_cursor(self):
+        for node_name in ("node-c", "node-a", "node-b"):
+            await self.table.add(node_name, "pw", 8000)
+
+        routes, cursor = self.table.get_page(limit=2)
+        self.assertEqual([route.node_name for route in routes], ["node-a", "node-b"])
+        self.assertEqual(cursor, "node-b")
+
+        # 커서 다음부터 이어서 조회하고, 마지막 페이지면 커서가 없습니다.
+        routes, cursor = self.table.get_page(after=cursor, limit=2)
+        self.assertEqual([route.node_name for route in routes], ["node-c"])
+        self.assertIsNone(cursor)
+
+    async def test_status_changes_only_status_fields(self):
+        await self.table.add("node-a", "pw", 8000)
+        await self.table.add("node-b", "pw", 8001)
+        epoch, since = self.table.epoch, self.table.status_version
+
+        # 상태 필드가 아닌 변경이나 같은 값으로의 변경은 상태 버전을 올리지 않습니다.
+        self.table.update("node-a", service_group="group-a")
+        self.table.update("node-b", connection_valid=False)
+        self.table.set_reconnecting("node-a", True)
+        self.assertEqual(self.table.status_version, since)
+
+        self.table.update("node-b", proxy_port=20001, connection_valid=True)
+        self.table.update("node-a", proxy_port=20000)
+        self.table.update("node-b", connection_valid=False)
+        changes = self.table.get_status_changes(epoch, since)
+        self.assertFalse(changes["full"])
+        self.assertEqual(changes["nodes"], [
+            {"node_name": "node-a", "connection_valid": False, "proxy_port": 20000},
+            {"node_name": "node-b", "connection_valid": False, "proxy_port": 20001},
+        ])
+        self.assertEqual(self.table.get_status_changes(epoch, changes["version"])["nodes"], [])
+
+        # epoch 가 다르면 전체 목록을 받습니다.
+        self.assertTrue(self.table.get_status_changes("other", changes["version"])["full"])
+
+    async def test_wait_status_changes_wakes_on_status_update(self):
+        await self.table.add("node-a", "pw", 8000)
+        epoch, since = self.table.epoch, self.table.status_version
+
+        waiter = asyncio.create_task(self.table.wait_status_changes(epoch, since, timeout=1))
+        await asyncio.sleep(0)
+        self.table.set_reconnecting("node-a", True)
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        self.table.update("node-a", connection_valid=True)
+        changes = await asyncio.wait_for(waiter, timeout=0.1)
+        self.assertEqual(changes["nodes"][0]["connection_valid"], True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import random
+import socket
+import time
+from collections import OrderedDict
+
+
+class PortExhaustedException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class PortLeasedException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class PortLease:
+    def __init__(self, port, owner=None):
+        self.port = port
+        self.owner = owner
+        self.leased_at = time.monotonic()
+
+
+# 포트 풀 할당기
+# 빈 포트를 삽입 순서가 유지되는 OrderedDict 로 관리해 할당/반환/지정 포트 제거가 상수 시간이고, 임대 중인 포트는 다시 나가지 않는다
+# 바인드 가능 여부를 미리 확인한 포트를 reserve_size 개 준비해 두어 노드 연결 요청 중에는 확인하지 않음
+class PortAllocator:
+    def __init__(self, port_min=None, port_max=None, lease_timeout=None, bind_host="0.0.0.0", reserve_size=None):
+        self.__port_min = port_min if port_min is not None else int(os.getenv('PORT_RANGE_MIN', '10000'))
+        # 리눅스 기본 임시 포트 범위(32768~)와 겹치면 임대 후 사용 전에 나가는 연결이 포트를 가져갈 수 있음
+        self.__port_max = port_max if port_max is not None else int(os.getenv('PORT_RANGE_MAX', '32767'))
+        self.__lease_timeout = lease_timeout if lease_timeout is not None \
+            else float(os.getenv('PORT_LEASE_TIMEOUT', '300'))
+        self.__bind_host = bind_host
+        self.__reserve_size = reserve_size if reserve_size is not None \
+            else int(os.getenv('PORT_RESERVE_SIZE', '8'))
+
+        ports = list(range(self.__port_min, self.__port_max + 1))
+        random.shuffle(ports)
+        self.__free = OrderedDict.fromkeys(ports)
+        # 미리 확인해 둔 빈 포트
+        self.__reserve = OrderedDict()
+        self.__leases = {}
+        # 아직 /proxy/provide 로 확정되지 않은 임대 (임대 순서 유지)
+        self.__unclaimed = OrderedDict()
+        self.__expired = 0
+
+    @property
+    def capacity(self):
+        return self.__port_max - self.__port_min + 1
+
+    def is_bindable(self, port):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind((self.__bind_host, port))
+                return True
+            except OSError:
+                return False
+
+    def __take_bindable(self):
+        # 다른 프로세스가 쓰고 있는 포트는 뒤로 돌리고 다음 포트를 시도
+        for _ in range(len(self.__free)):
+            port, _ = self.__free.popitem(last=False)
+            if self.is_bindable(port):
+                return port
+            self.__free[port] = None
+        return None
+
+    def fill_reserve(self):
+        # 준비해 둔 포트 중 그새 다른 프로세스가 가져간 포트는 풀 뒤로 돌림
+        for _ in range(len(self.__reserve)):
+            port, _ = self.__reserve.popitem(last=False)
+            if self.is_bindable(port):
+                self.__reserve[port] = None
+            else:
+                self.__free[port] = None
+        while len(self.__reserve) < self.__reserve_size:
+            port = self.__take_bindable()
+            if port is None:
+                break
+            self.__reserve[port] = None
+        return len(self.__reserve)
+
+    def lease(self, owner=None, claimed=False):
+        self.expire_unclaimed()
+
+        port = self.__reserve.popitem(last=False)[0] if self.__reserve else self.__take_bindable()
+        if port is None:
+            raise PortExhaustedException("No free port")
+        lease = PortLease(port, owner)
+        self.__leases[port] = lease
+        # 바로 사용할 포트가 아니면 확정 전까지 만료 대상으로 관리
+        if not claimed:
+            self.__unclaimed[port] = lease
+        return lease
+
+    # 임대하지 않고 지금 비어 있는 포트만 알려줌 (다음 호출은 다른 포트부터 확인)
+    def peek(self):
+        self.expire_unclaimed()
+        port = self.__take_bindable()
+        if port is None:
+            raise PortExhaustedException("No free port")
+        self.__free[port] = None
+        return port
+
+    def claim(self, port, owner):
+        # 노드가 실제로 사용하는 포트로 확정. 소유자가 없거나 같은 소유자의 기존 임대만 새 임대로 교체
+        lease = self.__leases.get(port)
+        if lease is not None and lease.owner is not None and lease.owner != owner:
+            raise PortLeasedException(f"Port {port} is leased to another node")
+        self.__unclaimed.pop(port, None)
+        if lease is None:
+            self.__free.pop(port, None)
+            self.__reserve.pop(port, None)
+        lease = PortLease(port, owner)
+        self.__leases[port] = lease
+        return lease
+
+    # 모든 포트를 확정할 수 있을 때만 확정 (하나라도 다른 소유자의 임대면 아무것도 바꾸지 않음)
+    def claim_all(self, ports, owner):
+        for port in ports:
+            lease = self.__leases.get(port)
+            if lease is not None and lease.owner is not None and lease.owner != owner:
+                raise PortLeasedException(f"Port {port} is leased to another node")
+        return [self.claim(port, owner) for port in ports]
+
+    def release(self, lease):
+        # 이미 다른 임대로 교체된 경우에는 반환하지 않음
+        if self.__leases.get(lease.port) is not lease:
+            return False
+        del self.__leases[lease.port]
+        self.__unclaimed.pop(lease.port, None)
+        if self.__port_min <= lease.port <= self.__port_max:
+            self.__free[lease.port] = None
+        return True
+
+    # 확정된 임대를 미확정으로 되돌림. lease_timeout 안에 같은 소유자가 다시 확정하지 않으면 풀로 반환
+    def unclaim(self, lease):
+        if self.__leases.get(lease.port) is not lease:
+            return False
+        lease.leased_at = time.monotonic()
+        self.__unclaimed[lease.port] = lease
+        self.__unclaimed.move_to_end(lease.port)
+        return True
+
+    def expire_unclaimed(self):
+        deadline = time.monotonic() - self.__lease_timeout
+        while self.__unclaimed:
+            port, lease = next(iter(self.__unclaimed.items()))
+            if lease.leased_at > deadline:
+                break
+            self.release(lease)
+            self.__expired += 1
+
+    def get_lease(self, port):
+        return self.__leases.get(port)
+
+    def get_stats(self):
+        leased = len(self.__leases)
+        return {
+            "port_min": self.__port_min,
+            "port_max": self.__port_max,
+            "capacity": self.capacity,
+            "leased": leased,
+            "unclaimed": len(self.__unclaimed),
+            "free": len(self.__free),
+            "reserved": len(self.__reserve),
+            "expired": self.__expired,
+            "utilization": leased / self.capacity if self.capacity else 0.0,
+        }
@@ -0,0 +1,136 @@
+import socket
+import unittest
+from server.PortAllocator import PortAllocator, PortExhaustedException, PortLeasedException
+
+
+class TestPortAllocator(unittest.TestCase):
+
+    def test_leased_port_is_not_handed_out_twice(self):
+        allocator = PortAllocator(port_min=41000, port_max=41009)
+
+        ports = {allocator.lease().port for _ in range(10)}
+        self.assertEqual(len(ports), 10)
+        with self.assertRaises(PortExhaustedException):
+            allocator.lease()
+
+        stats = allocator.get_stats()
+        self.assertEqual(stats["leased"], 10)
+        self.assertEqual(stats["utilization"], 1.0)
+
+    def test_release_returns_port_to_pool(self):
+        allocator = PortAllocator(port_min=41000, port_max=41000)
+        lease = allocator.lease()
+
+        self.assertTrue(allocator.release(lease))
+        self.assertFalse(allocator.release(lease))
+        self.assertEqual(allocator.lease().port, lease.port)
+
+    def test_claim_replaces_previous_lease(self):
+        allocator = PortAllocator(port_min=41000, port_max=41000)
+        lease = allocator.lease()
+        claimed = allocator.claim(lease.port, "node-a")
+
+        # 이전 임대로는 반환되지 않고 확정된 임대만 반환할 수 있습니다.
+        self.assertFalse(allocator.release(lease))
+        self.assertEqual(allocator.get_lease(lease.port).owner, "node-a")
+        self.assertTrue(allocator.release(claimed))
+        self.assertEqual(allocator.get_stats()["leased"], 0)
+
+    def test_unclaimed_lease_expires(self):
+        allocator = PortAllocator(port_min=41000, port_max=41000, lease_timeout=0)
+        first = allocator.lease()
+
+        # 확정되지 않은 임대는 만료 후 다시 할당됩니다.
+        second = allocator.lease()
+        self.assertEqual(first.port, second.port)
+        self.assertEqual(allocator.get_stats()["expired"], 1)
+
+    def test_claim_rejects_port_leased_to_another_node(self):
+        allocator = PortAllocator(port_min=41000, port_max=41001)
+        lease = allocator.lease("node-a")
+
+        with self.assertRaises(PortLeasedException):
+            allocator.claim(lease.port, "node-b")
+        self.assertIs(allocator.get_lease(lease.port), lease)
+        self.assertEqual(allocator.claim(lease.port, "node-a").owner, "node-a")
+
+    def test_claim_all_changes_nothing_on_conflict(self):
+        allocator = PortAllocator(port_min=41000, port_max=41001)
+        free_port = allocator.peek()
+        taken = allocator.lease("node-a")
+        self.assertNotEqual(free_port, taken.port)
+
+        with self.assertRaises(PortLeasedException):
+            allocator.claim_all([free_port, taken.port], "node-b")
+        self.assertIsNone(allocator.get_lease(free_port))
+        self.assertEqual(allocator.get_stats()["free"], 1)
+
+    def test_claim_takes_port_out_of_pool(self):
+        allocator = PortAllocator(port_min=41000, port_max=41009, reserve_size=2)
+        allocator.fill_reserve()
+        claimed = {allocator.claim(port, "node-a").port for port in range(41000, 41005)}
+
+        # 확정한 포트는 빈 포트나 미리 확인해 둔 포트로 다시 나가지 않음
+        leased = {allocator.lease().port for _ in range(5)}
+        self.assertFalse(claimed & leased)
+        with self.assertRaises(PortExhaustedException):
+            allocator.lease()
+
+    def test_peek_does_not_lease(self):
+        allocator = PortAllocator(port_min=41000, port_max=41000)
+
+        self.assertEqual(allocator.peek(), 41000)
+        self.assertEqual(allocator.get_stats()["leased"], 0)
+        self.assertEqual(allocator.lease().port, 41000)
+
+    def test_claimed_lease_does_not_expire(self):
+        allocator = PortAllocator(port_min=41000, port_max=41001, lease_timeout=0)
+        claimed = allocator.claim(allocator.lease().port, "node-a")
+
+        self.assertNotEqual(allocator.lease().port, claimed.port)
+
+    def test_unclaim_keeps_owner_until_timeout(self):
+        allocator = PortAllocator(port_min=41000, port_max=41000)
+        claimed = allocator.claim(allocator.lease("node-a").port, "node-a")
+
+        self.assertTrue(allocator.unclaim(claimed))
+        self.assertEqual(allocator.get_lease(claimed.port).owner, "node-a")
+        self.assertEqual(allocator.get_stats()["unclaimed"], 1)
+        with self.assertRaises(PortExhaustedException):
+            allocator.lease()
+
+        # 시간이 지나면 풀로 돌아갑니다.
+        allocator = PortAllocator(port_min=41000, port_max=41000, lease_timeout=0)
+        allocator.unclaim(allocator.claim(allocator.lease("node-a").port, "node-a"))
+        self.assertIsNotNone(allocator.lease("node-b"))
+
+    def test_skip_port_in_use(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(("0.0.0.0", 41000))
+            s.listen()
+            allocator = PortAllocator(port_min=41000, port_max=41001)
+            self.assertEqual(allocator.lease().port, 41001)
+
+    def test_reserved_ports_are_leased_first(self):
+        allocator = PortAllocator(port_min=41000, port_max=41009, reserve_size=3)
+        self.assertEqual(allocator.fill_reserve(), 3)
+        self.assertEqual(allocator.get_stats()["reserved"], 3)
+
+        leases = [allocator.lease() for _ in range(10)]
+        self.assertEqual(len({lease.port for lease in leases}), 10)
+        self.assertEqual(allocator.get_stats()["reserved"], 0)
+
+    def test_reserve_drops_port_taken_by_other_process(self):
+        allocator = PortAllocator(port_min=41000, port_max=41001, reserve_size=2)
+        allocator.fill_reserve()
+
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(("0.0.0.0", 41000))
+            s.listen()
+            # 이미 확인해 둔 포트도 다시 채울 때 한 번 더 확인
+            self.assertEqual(allocator.fill_reserve(), 1)
+            self.assertEqual(allocator.lease().port, 41001)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+from fastapi import Request
+
+# 연결 단위 헤더는 다음 구간으로 넘기지 않음 (RFC 9110 7.6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-connection", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+
+def get_hop_by_hop_headers(connection_values):
+    # Connection 헤더에 나열된 이름도 연결 단위 헤더
+    names = set(HOP_BY_HOP_HEADERS)
+    for value in connection_values:
+        names.update(name.strip().lower() for name in value.split(",") if name.strip())
+    return names
+
+
+def get_request_headers(request: Request):
+    # 같은 이름의 헤더가 여러 개여도 그대로 전달
+    # Host 는 백엔드 주소로 다시 채워지고, 원래 값은 X-Forwarded-Host 로 전달
+    skipped = get_hop_by_hop_headers(request.headers.getlist("connection"))
+    skipped.add("host")
+    headers = [(name, value) for name, value in request.headers.items() if name not in skipped]
+
+    client_host = request.client.host if request.client is not None else None
+    if client_host:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        headers = [(name, value) for name, value in headers if name != "x-forwarded-for"]
+        headers.append(("x-forwarded-for", f"{forwarded_for}, {client_host}" if forwarded_for else client_host))
+    if "host" in request.headers and "x-forwarded-host" not in request.headers:
+        headers.append(("x-forwarded-host", request.headers["host"]))
+    if "x-forwarded-proto" not in request.headers:
+        headers.append(("x-forwarded-proto", request.url.scheme))
+    return headers
+
+
+def get_response_headers(headers):
+    # httpx.Headers -> (이름, 값) 목록. Set-Cookie 처럼 여러 번 오는 헤더를 합치지 않음
+    skipped = get_hop_by_hop_headers(headers.get_list("connection"))
+    return [(name, value) for name, value in headers.multi_items() if name not in skipped]
+
+
+# Content-Length 값이 숫자가 아니거나 음수이면 길이를 모르는 응답(None)으로 취급
+def get_content_length(headers):
+    try:
+        content_length = int(headers.get("content-length"))
+    except (TypeError, ValueError):
+        return None
+    return content_length if content_length >= 0 else None
+
+
+def encode_headers(headers):
+    return [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
@@ -0,0 +1,65 @@
+import unittest
+
+import httpx
+from starlette.requests import Request
+
+from server.ProxyHeaders import get_content_length, get_request_headers, get_response_headers
+
+
+def build_request(headers, client=("10.0.0.2", 50000)):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/route/node-a/items",
+        "query_string": b"",
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+        "client": client,
+        "server": ("gateway", 58000),
+    })
+
+
+class TestProxyHeaders(unittest.TestCase):
+
+    def test_request_headers(self):
+        request = build_request([
+            ("host", "gateway:58000"),
+            ("connection", "keep-alive, x-hop"),
+            ("x-hop", "1"),
+            ("accept", "application/json"),
+            ("cookie", "a=1"),
+            ("cookie", "b=2"),
+            ("x-forwarded-for", "10.0.0.1"),
+        ])
+
+        self.assertEqual(get_request_headers(request), [
+            ("accept", "application/json"),
+            ("cookie", "a=1"),
+            ("cookie", "b=2"),
+            ("x-forwarded-for", "10.0.0.1, 10.0.0.2"),
+            ("x-forwarded-host", "gateway:58000"),
+            ("x-forwarded-proto", "http"),
+        ])
+
+    def test_response_headers_keep_multiple_values(self):
+        headers = httpx.Headers([
+            ("content-type", "text/plain"),
+            ("transfer-encoding", "chunked"),
+            ("set-cookie", "a=1"),
+            ("set-cookie", "b=2"),
+        ])
+
+        self.assertEqual(get_response_headers(headers), [
+            ("content-type", "text/plain"), ("set-cookie", "a=1"), ("set-cookie", "b=2"),
+        ])
+
+    def test_content_length(self):
+        self.assertEqual(get_content_length(httpx.Headers({"content-length": "12"})), 12)
+        # 없거나 잘못된 값은 길이를 모르는 응답으로 취급합니다.
+        self.assertIsNone(get_content_length(httpx.Headers()))
+        self.assertIsNone(get_content_length(httpx.Headers({"content-length": "12, 12"})))
+        self.assertIsNone(get_content_length(httpx.Headers({"content-length": "-1"})))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import os
+import time
+from collections import OrderedDict
+
+
+def parse_cache_control(value):
+    directives = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def get_max_age(directives):
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name) is not None:
+            try:
+                return max(int(directives[name]), 0)
+            except ValueError:
+                return 0
+    return None
+
+
+# Authorization 이 있는 요청의 응답도 공유 캐시에 저장/재사용해도 된다고 밝힌 경우 (RFC 9111 3.5)
+def is_shared_with_authorization(directives):
+    return "public" in directives or "s-maxage" in directives or "must-revalidate" in directives
+
+
+class CachedResponse:
+    def __init__(self, status_code, headers, content, etag, vary, expires_at, shared=False):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.etag = etag
+        self.vary = vary
+        self.expires_at = expires_at
+        # Authorization 이 있는 요청에도 내줄 수 있는지
+        self.shared = shared
+        self.size = len(content) + sum(len(name) + len(value) for name, value in headers)
+
+    def is_fresh(self, now):
+        return now < self.expires_at
+
+
+# GET /route 응답 캐시
+# 키: (노드, 경로, 쿼리, Vary 헤더 값), 전체 바이트 수를 기준으로 LRU 제거
+class ResponseCache:
+    def __init__(self, enabled=None, max_bytes=None, max_entry_bytes=None, default_ttl=None, clock=time.monotonic):
+        self.__enabled = enabled if enabled is not None \
+            else os.getenv('ROUTE_CACHE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+        self.__max_bytes = max_bytes if max_bytes is not None \
+            else int(os.getenv('ROUTE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.__max_entry_bytes = max_entry_bytes if max_entry_bytes is not None \
+            else int(os.getenv('ROUTE_CACHE_MAX_ENTRY_BYTES', str(1024 * 1024)))
+        # Cache-Control/ETag 이 없는 응답의 기본 TTL (0 이면 저장하지 않음)
+        self.__default_ttl = default_ttl if default_ttl is not None \
+            else float(os.getenv('ROUTE_CACHE_DEFAULT_TTL', '0'))
+        self.__clock = clock
+
+        self.__entries = OrderedDict()
+        # (노드, 경로, 쿼리) -> 응답이 알려준 Vary 헤더 이름
+        self.__vary = {}
+        # (노드, 경로) -> 캐시 키 목록 (쓰기 요청 시 무효화)
+        self.__path_keys = {}
+        self.__size = 0
+
+        self.__hits = 0
+        self.__misses = 0
+        self.__revalidations = 0
+        self.__stores = 0
+        self.__evictions = 0
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    @property
+    def max_entry_bytes(self):
+        return self.__max_entry_bytes
+
+    def get_key(self, node_name, path, query, request_headers):
+        primary_key = (node_name, path, query)
+        vary = self.__vary.get(primary_key, ())
+        return primary_key + tuple(request_headers.get(name, "") for name in vary)
+
+    # 모든 호출자가 함께 쓰는 캐시이므로 Authorization 이 있는 요청에는 공유 가능한 응답만 내줌
+    def lookup(self, key, authorized=False):
+        entry = self.__entries.get(key)
+        if entry is None or (authorized and not entry.shared):
+            return None
+        self.__entries.move_to_end(key)
+        return entry
+
+    def record_hit(self):
+        self.__hits += 1
+
+    def record_miss(self):
+        self.__misses += 1
+
+    def record_revalidation(self):
+        self.__revalidations += 1
+
+    def get_ttl(self, status_code, headers, authorized=False):
+        if status_code != 200:
+            return None
+        directives = parse_cache_control(headers.get("cache-control"))
+        if "no-store" in directives or "private" in directives:
+            return None
+        # 다른 호출자에게 쿠키가 전달되지 않도록 Set-Cookie 응답은 저장하지 않음
+        if "set-cookie" in headers:
+            return None
+        if authorized and not is_shared_with_authorization(directives):
+            return None
+        if headers.get("vary", "").strip() == "*":
+            return None
+        if "no-cache" in directives:
+            # 저장은 하되 매번 ETag 로 재검증
+            return 0 if headers.get("etag") else None
+
+        max_age = get_max_age(directives)
+        if max_age is not None:
+            return max_age if max_age > 0 or headers.get("etag") else None
+        if headers.get("etag"):
+            return 0
+        return self.__default_ttl if self.__default_ttl > 0 else None
+
+    def store(self, node_name, path, query, request_headers, status_code, headers, content, ttl):
+        vary = tuple(
+            name.strip().lower() for value in headers.get_list("vary") for name in value.split(",") if name.strip()
+        )
+        primary_key = (node_name, path, query)
+        self.__vary[primary_key] = vary
+        key = self.get_key(node_name, path, query, request_headers)
+
+        entry = CachedResponse(
+            status_code,
+            headers.multi_items(),
+            content,
+            headers.get("etag"),
+            vary,
+            self.__clock() + ttl,
+            is_shared_with_authorization(parse_cache_control(headers.get("cache-control")))
+        )
+        if entry.size > self.__max_entry_bytes:
+            return None
+
+        self.__remove(key)
+        self.__entries[key] = entry
+        self.__path_keys.setdefault((node_name, path), set()).add(key)
+        self.__size += entry.size
+        self.__stores += 1
+
+        while self.__size > self.__max_bytes and self.__entries:
+            evicted_key = next(iter(self.__entries))
+            self.__remove(evicted_key)
+            self.__evictions += 1
+        return entry
+
+    def refresh(self, entry, headers):
+        # 304 응답의 Cache-Control 로 유효기간 갱신
+        ttl = self.get_ttl(200, headers)
+        entry.expires_at = self.__clock() + (ttl or 0)
+
+    def is_fresh(self, entry):
+        return entry.is_fresh(self.__clock())
+
+    def __remove(self, key):
+        entry = self.__entries.pop(key, None)
+        if entry is None:
+            return
+        self.__size -= entry.size
+        path_keys = self.__path_keys.get(key[:2])
+        if path_keys is not None:
+            path_keys.discard(key)
+            if not path_keys:
+                del self.__path_keys[key[:2]]
+
+    def invalidate(self, node_name, path):
+        for key in list(self.__path_keys.get((node_name, path), ())):
+            self.__remove(key)
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get_stats(self):
+        return {
+            "enabled": self.__enabled,
+            "entries": len(self.__entries),
+            "bytes": self.__size,
+            "max_bytes": self.__max_bytes,
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "revalidations": self.__revalidations,
+            "stores": self.__stores,
+            "evictions": self.__evictions,
+        }
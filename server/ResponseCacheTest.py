@@ -0,0 +1,115 @@
+import unittest
+
+import httpx
+
+from server.ResponseCache import ResponseCache, parse_cache_control
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(enabled=True, max_bytes=1024, max_entry_bytes=512, default_ttl=0, clock=self.clock)
+
+    def store(self, path, headers, content=b"body", request_headers=None):
+        headers = httpx.Headers(headers)
+        ttl = self.cache.get_ttl(200, headers)
+        if ttl is None:
+            return None
+        return self.cache.store("node-a", path, "", request_headers or {}, 200, headers, content, ttl)
+
+    def test_parse_cache_control(self):
+        self.assertEqual(
+            parse_cache_control('public, max-age=60, no-cache="set-cookie"'),
+            {"public": None, "max-age": "60", "no-cache": "set-cookie"}
+        )
+
+    def test_ttl_rules(self):
+        get_ttl = lambda headers: self.cache.get_ttl(200, httpx.Headers(headers))
+        self.assertEqual(get_ttl({"cache-control": "max-age=60"}), 60)
+        self.assertEqual(get_ttl({"cache-control": "max-age=60, s-maxage=10"}), 10)
+        self.assertEqual(get_ttl({"etag": '"v1"'}), 0)
+        self.assertIsNone(get_ttl({"cache-control": "no-store", "etag": '"v1"'}))
+        self.assertIsNone(get_ttl({"cache-control": "private, max-age=60"}))
+        self.assertIsNone(get_ttl({"cache-control": "max-age=60", "vary": "*"}))
+        self.assertIsNone(get_ttl({}))
+        self.assertIsNone(self.cache.get_ttl(404, httpx.Headers({"cache-control": "max-age=60"})))
+
+    def test_set_cookie_is_not_stored(self):
+        self.assertIsNone(self.store("/me", {"cache-control": "public, max-age=60", "set-cookie": "session=a"}))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_authorized_requests(self):
+        get_ttl = lambda headers: self.cache.get_ttl(200, httpx.Headers(headers), authorized=True)
+        # Authorization 이 있는 요청의 응답은 공유해도 된다고 밝힌 경우만 저장합니다.
+        self.assertIsNone(get_ttl({"cache-control": "max-age=60"}))
+        self.assertEqual(get_ttl({"cache-control": "public, max-age=60"}), 60)
+        self.assertEqual(get_ttl({"cache-control": "s-maxage=30"}), 30)
+        self.assertEqual(get_ttl({"cache-control": "must-revalidate, max-age=60"}), 60)
+
+        # 인증 없이 저장한 응답은 Authorization 이 있는 요청에 내주지 않습니다.
+        self.store("/items", {"cache-control": "max-age=60"})
+        key = self.cache.get_key("node-a", "/items", "", {})
+        self.assertIsNotNone(self.cache.lookup(key))
+        self.assertIsNone(self.cache.lookup(key, authorized=True))
+
+        self.store("/public", {"cache-control": "public, max-age=60"})
+        self.assertIsNotNone(self.cache.lookup(self.cache.get_key("node-a", "/public", "", {}), authorized=True))
+
+    def test_fresh_then_stale(self):
+        self.store("/items", {"cache-control": "max-age=10", "etag": '"v1"'})
+        entry = self.cache.lookup(self.cache.get_key("node-a", "/items", "", {}))
+
+        self.assertTrue(self.cache.is_fresh(entry))
+        self.clock.now = 11
+        self.assertFalse(self.cache.is_fresh(entry))
+
+        # 304 재검증으로 유효기간이 갱신됩니다.
+        self.cache.refresh(entry, httpx.Headers({"cache-control": "max-age=10"}))
+        self.assertTrue(self.cache.is_fresh(entry))
+
+    def test_vary_headers_are_part_of_key(self):
+        self.store("/items", {"cache-control": "max-age=10", "vary": "Accept-Language"}, b"ko",
+                   request_headers={"accept-language": "ko"})
+        self.store("/items", {"cache-control": "max-age=10", "vary": "Accept-Language"}, b"en",
+                   request_headers={"accept-language": "en"})
+
+        ko_key = self.cache.get_key("node-a", "/items", "", {"accept-language": "ko"})
+        en_key = self.cache.get_key("node-a", "/items", "", {"accept-language": "en"})
+        self.assertEqual(self.cache.lookup(ko_key).content, b"ko")
+        self.assertEqual(self.cache.lookup(en_key).content, b"en")
+
+    def test_lru_eviction_by_bytes(self):
+        self.store("/a", {"cache-control": "max-age=10"}, b"a" * 400)
+        self.store("/b", {"cache-control": "max-age=10"}, b"b" * 400)
+        # /a 를 최근 사용으로 만든 뒤 새 항목을 넣으면 /b 가 제거됩니다.
+        self.cache.lookup(self.cache.get_key("node-a", "/a", "", {}))
+        self.store("/c", {"cache-control": "max-age=10"}, b"c" * 400)
+
+        self.assertIsNotNone(self.cache.lookup(self.cache.get_key("node-a", "/a", "", {})))
+        self.assertIsNone(self.cache.lookup(self.cache.get_key("node-a", "/b", "", {})))
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], 1024)
+
+    def test_oversized_entry_is_not_stored(self):
+        self.assertIsNone(self.store("/big", {"cache-control": "max-age=10"}, b"x" * 600))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalidate_path(self):
+        self.store("/items", {"cache-control": "max-age=10"})
+        self.cache.invalidate("node-a", "/items")
+        self.assertIsNone(self.cache.lookup(self.cache.get_key("node-a", "/items", "", {})))
+        self.assertEqual(self.cache.get_stats()["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
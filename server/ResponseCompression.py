@@ -0,0 +1,163 @@
+import os
+import zlib
+
+from ProxyHeaders import get_content_length
+
+# brotli/zstd 는 모듈이 설치되어 있을 때만 사용
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# JSON/텍스트 위주의 응답만 압축 (이미지/동영상 등은 이미 압축되어 있음)
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml", "application/x-ndjson",
+    "application/graphql-response+json", "image/svg+xml",
+)
+COMPRESSIBLE_CONTENT_TYPE_SUFFIXES = ("+json", "+xml")
+
+
+# 본문 조각마다 flush 해서 스트리밍(SSE, 긴 응답)도 바로바로 전달
+class GzipEncoder:
+    def __init__(self):
+        self.__compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data):
+        return self.__compressor.compress(data) + self.__compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.__compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self):
+        self.__compressor = brotli.Compressor(quality=4)
+
+    def compress(self, data):
+        return self.__compressor.process(data) + self.__compressor.flush()
+
+    def finish(self):
+        return self.__compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self):
+        self.__compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self.__compressor.compress(data) + self.__compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.__compressor.flush()
+
+
+ENCODERS = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+
+
+def parse_accept_encoding(value):
+    # "gzip;q=0.8, br" -> {"gzip": 0.8, "br": 1.0}
+    qualities = {}
+    for item in (value or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, param_value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def is_compressible(content_type):
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return media_type.startswith(COMPRESSIBLE_CONTENT_TYPES) or media_type.endswith(COMPRESSIBLE_CONTENT_TYPE_SUFFIXES)
+
+
+# 게이트웨이 -> 외부 클라이언트 구간 응답 압축
+# 백엔드가 압축하지 않은 응답을 클라이언트의 Accept-Encoding 에 맞춰 압축
+class ResponseCompressor:
+    def __init__(self, enabled=None, encodings=None, min_bytes=None):
+        self.__enabled = enabled if enabled is not None \
+            else os.getenv('ROUTE_COMPRESSION_ENABLED', '0').lower() in ('1', 'true', 'yes')
+        if encodings is None:
+            encodings = os.getenv('ROUTE_COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(",")
+        # 설정 순서가 서버 쪽 선호 순서, 설치되지 않은 방식은 제외
+        self.__encodings = [encoding.strip() for encoding in encodings if encoding.strip() in ENCODERS]
+        self.__min_bytes = min_bytes if min_bytes is not None \
+            else int(os.getenv('ROUTE_COMPRESSION_MIN_BYTES', '1024'))
+
+    @property
+    def enabled(self):
+        return self.__enabled and bool(self.__encodings)
+
+    @property
+    def encodings(self):
+        return list(self.__encodings)
+
+    def select_encoding(self, accept_encoding):
+        qualities = parse_accept_encoding(accept_encoding)
+        wildcard = qualities.get("*", 0.0)
+        best_encoding = None
+        best_quality = 0.0
+        for encoding in self.__encodings:
+            quality = qualities.get(encoding, wildcard)
+            if quality > best_quality:
+                best_encoding, best_quality = encoding, quality
+        return best_encoding
+
+    def negotiate(self, method, request_headers, status_code, response_headers):
+        if not self.enabled or method == "HEAD":
+            return None
+        if status_code < 200 or status_code in (204, 206, 304):
+            return None
+        if "content-encoding" in response_headers or "content-range" in response_headers:
+            return None
+        if "no-transform" in response_headers.get("cache-control", "").lower():
+            return None
+        if not is_compressible(response_headers.get("content-type")):
+            return None
+        # 길이를 알 수 없는(잘못되었거나 음수인) Content-Length 는 스트리밍 응답처럼 압축
+        content_length = get_content_length(response_headers)
+        if content_length is not None and content_length < self.__min_bytes:
+            return None
+        return self.select_encoding(request_headers.get("accept-encoding"))
+
+    def rewrite_headers(self, headers, encoding):
+        # 본문 길이가 바뀌고, 인코딩별로 다른 표현이므로 ETag 는 약한 ETag 로 바꿈
+        rewritten = []
+        vary = []
+        for name, value in headers:
+            if name == "content-length":
+                continue
+            if name == "etag" and not value.startswith("W/"):
+                value = f"W/{value}"
+            if name == "vary":
+                vary += [field.strip().lower() for field in value.split(",")]
+            rewritten.append((name, value))
+        if "accept-encoding" not in vary and "*" not in vary:
+            rewritten.append(("vary", "Accept-Encoding"))
+        rewritten.append(("content-encoding", encoding))
+        return rewritten
+
+    async def compress(self, encoding, chunks):
+        encoder = ENCODERS[encoding]()
+        async for chunk in chunks:
+            data = encoder.compress(chunk)
+            if data:
+                yield data
+        yield encoder.finish()
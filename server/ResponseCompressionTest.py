@@ -0,0 +1,89 @@
+import gzip
+import os
+import sys
+import unittest
+
+import httpx
+
+# ResponseCompression 은 같은 폴더의 모듈을 바로 import 하므로 server 폴더를 경로에 추가
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from ResponseCompression import ResponseCompressor, parse_accept_encoding
+
+
+async def iterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestResponseCompression(unittest.IsolatedAsyncioTestCase):
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding("gzip;q=0.5, br, identity;q=0"), {"gzip": 0.5, "br": 1.0, "identity": 0.0})
+        self.assertEqual(parse_accept_encoding(None), {})
+
+    def test_select_encoding(self):
+        compressor = ResponseCompressor(enabled=True, encodings=["gzip"])
+
+        self.assertEqual(compressor.select_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(compressor.select_encoding("*"), "gzip")
+        self.assertIsNone(compressor.select_encoding("gzip;q=0"))
+        self.assertIsNone(compressor.select_encoding("deflate"))
+        # 설치되지 않은 방식은 설정에 있어도 사용하지 않음
+        self.assertEqual(ResponseCompressor(enabled=True, encodings=["unknown", "gzip"]).encodings, ["gzip"])
+
+    def test_negotiate(self):
+        compressor = ResponseCompressor(enabled=True, encodings=["gzip"], min_bytes=100)
+        request_headers = {"accept-encoding": "gzip"}
+        json_headers = httpx.Headers({"content-type": "application/json", "content-length": "1000"})
+
+        self.assertEqual(compressor.negotiate("GET", request_headers, 200, json_headers), "gzip")
+        self.assertIsNone(compressor.negotiate("HEAD", request_headers, 200, json_headers))
+        self.assertIsNone(compressor.negotiate("GET", {}, 200, json_headers))
+        self.assertIsNone(compressor.negotiate("GET", request_headers, 304, json_headers))
+        # 작은 응답, 이미 압축된 응답, 압축해도 이득이 없는 형식은 그대로 전달
+        self.assertIsNone(compressor.negotiate(
+            "GET", request_headers, 200, httpx.Headers({"content-type": "application/json", "content-length": "10"})
+        ))
+        self.assertIsNone(compressor.negotiate(
+            "GET", request_headers, 200, httpx.Headers({"content-type": "text/plain", "content-encoding": "br"})
+        ))
+        self.assertIsNone(compressor.negotiate(
+            "GET", request_headers, 200, httpx.Headers({"content-type": "image/png"})
+        ))
+        # Content-Length 가 잘못되었으면 길이를 모르는 응답으로 보고 압축
+        self.assertEqual(compressor.negotiate(
+            "GET", request_headers, 200, httpx.Headers({"content-type": "application/json", "content-length": "x"})
+        ), "gzip")
+        self.assertEqual(compressor.negotiate(
+            "GET", request_headers, 200, httpx.Headers({"content-type": "application/json", "content-length": "-1"})
+        ), "gzip")
+        self.assertIsNone(ResponseCompressor(enabled=False).negotiate("GET", request_headers, 200, json_headers))
+
+    def test_rewrite_headers(self):
+        compressor = ResponseCompressor(enabled=True, encodings=["gzip"])
+        headers = compressor.rewrite_headers(
+            [("content-type", "application/json"), ("content-length", "1000"), ("etag", '"v1"'), ("vary", "Origin")],
+            "gzip"
+        )
+
+        self.assertEqual(headers, [
+            ("content-type", "application/json"), ("etag", 'W/"v1"'), ("vary", "Origin"),
+            ("vary", "Accept-Encoding"), ("content-encoding", "gzip"),
+        ])
+
+    async def test_compress_stream(self):
+        compressor = ResponseCompressor(enabled=True, encodings=["gzip"])
+        chunks = [b'{"items": [', b'"a", ' * 100, b'"b"]}']
+
+        compressed = [chunk async for chunk in compressor.compress("gzip", iterate(chunks))]
+
+        # 조각마다 바로 전달되고, 합치면 원래 본문
+        self.assertEqual(len(compressed), len(chunks) + 1)
+        self.assertEqual(gzip.decompress(b"".join(compressed)), b"".join(chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,353 @@
+import time
+
+import httpx
+from fastapi import HTTPException, Request, Response, WebSocket, WebSocketException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from AdmissionControl import AdmissionRejectedException
+from ProxyHeaders import encode_headers, get_content_length, get_request_headers, get_response_headers
+from ResponseCache import parse_cache_control
+from WebSocketRelay import WebSocketRelay, WebSocketRelayException
+
+
+def build_cached_response(cached_response, request: Request, cache_status: str):
+    # 클라이언트가 가진 버전과 같으면 본문 없이 304
+    if cached_response.etag and request.headers.get("if-none-match") == cached_response.etag:
+        response = Response(status_code=304, headers={"etag": cached_response.etag})
+    else:
+        response = Response(content=cached_response.content, status_code=cached_response.status_code)
+        response.raw_headers = [
+            (name.encode("latin-1"), value.encode("latin-1")) for name, value in cached_response.headers
+        ]
+    response.raw_headers.append((b"x-gateway-cache", cache_status.encode("latin-1")))
+    return response
+
+
+def add_response_finalizer(response, finalize):
+    # 스트리밍 응답은 본문 전송이 끝난 뒤에, 아니면 바로 finalize 호출
+    if not isinstance(response, StreamingResponse):
+        finalize()
+        return response
+    background = response.background
+
+    async def finish_response():
+        try:
+            if background is not None:
+                await background()
+        finally:
+            finalize()
+    response.background = BackgroundTask(finish_response)
+    return response
+
+
+# /route 요청 전달
+# 라우팅 테이블만 있으면 되므로 터널을 가진 ServerNode 와 /route 전용 워커(RouteWorker)가 함께 사용
+# 요청/응답 본문을 메모리에 모으지 않고 그대로 흘려보냄
+class RouteForwarder:
+    def __init__(
+            self, routing_table, client_registry, response_cache, balancer, hold_timeout, admission=None,
+            compressor=None, onboarding_tracker=None
+    ):
+        self.__routing_table = routing_table
+        self.__client_registry = client_registry
+        self.__response_cache = response_cache
+        self.__balancer = balancer
+        self.__hold_timeout = hold_timeout
+        self.__admission = admission
+        self.__compressor = compressor
+        self.__onboarding_tracker = onboarding_tracker
+
+    @property
+    def routing_table(self):
+        return self.__routing_table
+
+    @routing_table.setter
+    def routing_table(self, routing_table):
+        self.__routing_table = routing_table
+
+    async def forward(self, method: str, node_name: str, path: str, request: Request, with_body: bool):
+        # RouteMetricsMiddleware 가 붙인 구간 측정용 타이머 (없으면 측정하지 않음)
+        timer = getattr(request.state, "route_timer", None)
+        lookup_started = time.perf_counter()
+        route = self.__routing_table.get(node_name)
+        is_group = route is None and bool(self.__routing_table.get_group(node_name))
+        if timer is not None:
+            timer.lookup = time.perf_counter() - lookup_started
+            if route is not None or is_group:
+                timer.route_name = node_name
+
+        if route is None and not is_group:
+            raise HTTPException(status_code=404, detail="Unknown node")
+
+        if self.__admission is None:
+            return await self.__forward_route(method, node_name, route, path, request, with_body, timer)
+
+        # 요청 허용 제어: 속도 제한은 429, 동시 처리 대기열이 넘치거나 대기 시간이 지나면(또는 드레인 중이면) 503
+        try:
+            await self.__admission.admit(node_name, self.__admission.get_caller(request.headers, request.client))
+        except AdmissionRejectedException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+        try:
+            response = await self.__forward_route(method, node_name, route, path, request, with_body, timer)
+        except BaseException:
+            self.__admission.release(node_name)
+            raise
+        return add_response_finalizer(response, lambda: self.__admission.release(node_name))
+
+    async def __forward_route(self, method, node_name, route, path, request, with_body, timer):
+        if route is None:
+            # /route/{service_group}/{path}: 같은 그룹의 노드들로 분산
+            return await self.forward_group(method, node_name, path, request, with_body, timer)
+        return await self.send(method, node_name, route, path, request, with_body, timer=timer)
+
+    async def forward_group(
+            self, method: str, service_group: str, path: str, request: Request, with_body: bool, timer=None
+    ):
+        failed_nodes = set()
+        while True:
+            node_names = [
+                route.node_name for route in self.__routing_table.get_group(service_group)
+                if route.connection_valid and route.proxy_port is not None and route.node_name not in failed_nodes
+            ]
+            if not node_names:
+                raise HTTPException(status_code=503, detail="No connected node in service group")
+            node_name = self.__balancer.select(node_names)
+            if node_name is None:
+                raise HTTPException(status_code=503, detail="Service group is at capacity")
+
+            self.__balancer.begin(node_name)
+            started = time.monotonic()
+            try:
+                response = await self.send(
+                    method, service_group, self.__routing_table.get(node_name), path, request, with_body,
+                    hold_reconnect=False, timer=timer
+                )
+            except HTTPException as e:
+                self.__balancer.end(node_name, failed=e.status_code >= 500)
+                # 본문이 없는 요청은 그룹의 다른 노드로 한 번 더 시도
+                if e.status_code == 502 and not with_body and not failed_nodes:
+                    failed_nodes.add(node_name)
+                    continue
+                raise
+            except BaseException:
+                self.__balancer.end(node_name, failed=True)
+                raise
+            break
+
+        self.__balancer.record_latency(node_name, time.monotonic() - started)
+        failed = response.status_code >= 500
+        response.headers["x-gateway-node"] = node_name
+        # 처리 중 요청 수는 응답 본문 전송이 끝난 뒤에 줄임
+        return add_response_finalizer(response, lambda: self.__balancer.end(node_name, failed=failed))
+
+    async def get_backend(self, route, path: str, hold_reconnect=True, http1=False):
+        # /route/{node_name}/{service}/{path}: 등록된 서비스는 노드의 SSH 연결 채널로 바로 전달
+        service_name, _, service_path = path.partition("/")
+        service_port = route.services.get(service_name)
+        if service_port is not None:
+            client = self.__client_registry.get_direct_client()
+            return client, f"http://127.0.0.1:{service_port}/{service_path}", service_port
+
+        if not route.connection_valid or route.proxy_port is None:
+            # 터널 재연결 중이면 새 연결이 맺어질 때까지 잠시 붙잡아 둠
+            if not hold_reconnect or not route.reconnecting \
+                    or await self.__routing_table.wait_connected(route.node_name, self.__hold_timeout) is None:
+                raise HTTPException(status_code=503, detail="Node is not connected")
+        # 백엔드 API로 요청을 프록시 서버를 통해 전달
+        if http1:
+            client = await self.__client_registry.get_http1_client(route.node_name, route.proxy_port)
+        else:
+            client = await self.__client_registry.get(route.node_name, route.proxy_port)
+        return client, f"http://localhost:{route.route_port}/{path}", None
+
+    async def forward_websocket(self, node_name: str, path: str, websocket: WebSocket):
+        route = self.__routing_table.get(node_name)
+        group_node_name = None
+        if route is None and not self.__routing_table.get_group(node_name):
+            raise WebSocketException(code=1008, reason="Unknown node")
+        # 오래 유지되는 연결이므로 동시 처리 제한 없이 속도 제한만 적용
+        if self.__admission is not None:
+            try:
+                self.__admission.check_rate(node_name, self.__admission.get_caller(websocket.headers, websocket.client))
+            except AdmissionRejectedException as e:
+                raise WebSocketException(code=1013, reason=e.message)
+        if route is None:
+            node_names = [
+                route.node_name for route in self.__routing_table.get_group(node_name)
+                if route.connection_valid and route.proxy_port is not None
+            ]
+            if not node_names:
+                raise WebSocketException(code=1013, reason="No connected node in service group")
+            group_node_name = self.__balancer.select(node_names)
+            if group_node_name is None:
+                raise WebSocketException(code=1013, reason="Service group is at capacity")
+            route = self.__routing_table.get(group_node_name)
+
+        try:
+            client, backend_url, _ = await self.get_backend(
+                route, path, hold_reconnect=group_node_name is None, http1=True
+            )
+        except HTTPException as e:
+            raise WebSocketException(code=1013, reason=e.detail)
+
+        # 서비스 그룹은 연결이 유지되는 동안 처리 중 요청으로 계산
+        failed = False
+        if group_node_name is not None:
+            self.__balancer.begin(group_node_name)
+        try:
+            await WebSocketRelay(websocket, client, backend_url).run()
+        except (httpx.TransportError, WebSocketRelayException) as e:
+            failed = True
+            raise WebSocketException(code=1011, reason=getattr(e, "message", None) or "Node connection failed")
+        finally:
+            self.__client_registry.release(route.node_name, client)
+            if group_node_name is not None:
+                self.__balancer.end(group_node_name, failed=failed)
+
+    async def send(
+            self, method: str, node_name: str, route, path: str, request: Request, with_body: bool, hold_reconnect=True,
+            timer=None
+    ):
+        # 노드 풀은 응답 본문 전송이 끝날 때까지 사용 중으로 두어 유휴 정리되지 않도록 함
+        clients = []
+        try:
+            response = await self.__send(
+                method, node_name, route, path, request, with_body, hold_reconnect, timer, clients
+            )
+        except BaseException:
+            self.__release_clients(route.node_name, clients)
+            raise
+        return add_response_finalizer(response, lambda: self.__release_clients(route.node_name, clients))
+
+    def __release_clients(self, node_name, clients):
+        for client in clients:
+            self.__client_registry.release(node_name, client)
+        clients.clear()
+
+    async def __send(self, method, node_name, route, path, request, with_body, hold_reconnect, timer, clients):
+        # 본문이 있는 요청은 실패해도 다시 보낼 수 없으므로 h2c 지원이 확인된 노드에만 HTTP/2 로 전달
+        http1 = with_body and not self.__client_registry.is_http2_verified(route.node_name)
+        client, backend_url, service_port = await self.get_backend(route, path, hold_reconnect, http1)
+        clients.append(client)
+
+        # 원래 요청의 쿼리 파라미터 및 헤더를 백엔드로 전달 (연결 단위 헤더 제외)
+        headers = httpx.Headers(get_request_headers(request))
+
+        # GET 응답 캐시 (ROUTE_CACHE_ENABLED)
+        cache_key = None
+        cached_response = None
+        authorized = "authorization" in request.headers
+        if self.__response_cache.enabled:
+            if method == "GET":
+                request_directives = parse_cache_control(request.headers.get("cache-control"))
+                if "no-store" not in request_directives:
+                    cache_key = self.__response_cache.get_key(node_name, path, request.url.query, request.headers)
+                    cached_response = self.__response_cache.lookup(cache_key, authorized)
+                if cached_response is not None:
+                    if "no-cache" not in request_directives and self.__response_cache.is_fresh(cached_response):
+                        self.__response_cache.record_hit()
+                        return build_cached_response(cached_response, request, "HIT")
+                    if cached_response.etag:
+                        # 만료된 응답은 백엔드에 조건부 요청으로 재검증
+                        headers["if-none-match"] = cached_response.etag
+            elif method not in ("HEAD", "OPTIONS"):
+                self.__response_cache.invalidate(node_name, path)
+
+        # 커넥션 획득/백엔드 구간은 httpx trace 이벤트로 나눔
+        extensions = {"trace": timer.trace} if timer is not None else None
+        backend_request = client.build_request(
+            method,
+            url=backend_url,
+            params=request.query_params,
+            headers=headers,
+            content=request.stream() if with_body else None,
+            extensions=extensions
+        )
+        try:
+            if timer is not None:
+                timer.start_send()
+            backend_response = await client.send(backend_request, stream=True)
+        except httpx.ReadTimeout:
+            # 백엔드가 응답하지 않음 (이미 받았을 수 있으므로 다시 보내지 않음)
+            raise HTTPException(status_code=504, detail="Node response timed out")
+        except httpx.TransportError as e:
+            # h2c 를 받지 않는 백엔드는 이후 HTTP/1.1 로 전달하고, 본문이 없는 이 요청도 바로 다시 시도
+            http2_refused = not with_body and service_port is None and isinstance(e, httpx.RemoteProtocolError) \
+                and await self.__client_registry.disable_http2(route.node_name)
+            if not http2_refused:
+                # 터널이 끊긴 경우 본문이 없는 요청은 재연결된 터널로 한 번 더 시도
+                if with_body or service_port is not None or not hold_reconnect \
+                        or (route.connection_valid and not route.reconnecting):
+                    raise HTTPException(status_code=502, detail="Node connection failed")
+                if await self.__routing_table.wait_connected(
+                        route.node_name, self.__hold_timeout, require_new=True
+                ) is None:
+                    raise HTTPException(status_code=502, detail="Node connection failed")
+            client = await self.__client_registry.get(route.node_name, route.proxy_port)
+            clients.append(client)
+            backend_request = client.build_request(
+                method,
+                url=backend_url,
+                params=request.query_params,
+                headers=headers,
+                extensions=extensions
+            )
+            try:
+                if timer is not None:
+                    timer.start_send()
+                backend_response = await client.send(backend_request, stream=True)
+            except httpx.ReadTimeout:
+                raise HTTPException(status_code=504, detail="Node response timed out")
+            except httpx.TransportError:
+                raise HTTPException(status_code=502, detail="Node connection failed")
+        if timer is not None:
+            timer.finish_send()
+        if backend_response.http_version == "HTTP/2":
+            self.__client_registry.verify_http2(route.node_name)
+        if self.__onboarding_tracker is not None:
+            self.__onboarding_tracker.record_first_request(route.node_name)
+
+        if cache_key is not None:
+            if cached_response is not None and backend_response.status_code == 304:
+                await backend_response.aclose()
+                self.__response_cache.refresh(cached_response, backend_response.headers)
+                self.__response_cache.record_revalidation()
+                return build_cached_response(cached_response, request, "REVALIDATED")
+
+            self.__response_cache.record_miss()
+            ttl = self.__response_cache.get_ttl(backend_response.status_code, backend_response.headers, authorized)
+            content_length = get_content_length(backend_response.headers)
+            if ttl is not None and content_length is not None and content_length <= self.__response_cache.max_entry_bytes:
+                content = b"".join([chunk async for chunk in backend_response.aiter_raw()])
+                await backend_response.aclose()
+                response_headers = httpx.Headers(get_response_headers(backend_response.headers))
+                cached_response = self.__response_cache.store(
+                    node_name, path, request.url.query, request.headers,
+                    backend_response.status_code, response_headers, content, ttl
+                )
+                if cached_response is not None:
+                    return build_cached_response(cached_response, request, "MISS")
+                response = Response(content=content, status_code=backend_response.status_code)
+                response.raw_headers = encode_headers(response_headers.multi_items())
+                return response
+
+        # 인코딩된 원본 바이트를 그대로 전달하므로 Content-Length/Content-Encoding이 유지됨
+        response_headers = get_response_headers(backend_response.headers)
+        content = backend_response.aiter_raw()
+        # 백엔드가 압축하지 않은 응답은 클라이언트가 받을 수 있는 방식으로 압축
+        encoding = None
+        if self.__compressor is not None:
+            encoding = self.__compressor.negotiate(
+                method, request.headers, backend_response.status_code, backend_response.headers
+            )
+        if encoding is not None:
+            content = self.__compressor.compress(encoding, content)
+            response_headers = self.__compressor.rewrite_headers(response_headers, encoding)
+        response = StreamingResponse(
+            content,
+            status_code=backend_response.status_code,
+            background=BackgroundTask(backend_response.aclose)
+        )
+        response.raw_headers = encode_headers(response_headers)
+        return response
@@ -0,0 +1,324 @@
+import os
+import sys
+import unittest
+
+import httpx
+from fastapi import FastAPI, Request
+
+# RouteForwarder 는 같은 폴더의 모듈을 바로 import 하므로 server 폴더를 경로에 추가
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from AdmissionControl import AdmissionController
+from ResponseCache import ResponseCache
+from RouteForwarder import RouteForwarder
+
+
+class FakeRoute:
+    def __init__(self, node_name, connection_valid=True, reconnecting=False):
+        self.node_name = node_name
+        self.services = {}
+        self.connection_valid = connection_valid
+        self.proxy_port = 1080 if connection_valid else None
+        self.route_port = 8000
+        self.reconnecting = reconnecting
+
+
+class FakeRoutingTable:
+    def __init__(self, routes, groups=None):
+        self.routes = {route.node_name: route for route in routes}
+        self.groups = groups or {}
+        self.waits = []
+        # wait_connected 중에 터널이 다시 연결되는 것을 흉내
+        self.on_wait = None
+
+    def get(self, node_name):
+        return self.routes.get(node_name)
+
+    def get_group(self, service_group):
+        return [self.routes[node_name] for node_name in self.groups.get(service_group, [])]
+
+    async def wait_connected(self, node_name, timeout, require_new=False):
+        self.waits.append((node_name, require_new))
+        route = self.routes[node_name]
+        if self.on_wait is not None:
+            self.on_wait(route)
+        return route if route.connection_valid else None
+
+
+# 노드별 클라이언트를 돌려주고 사용 중인 수를 셈 (h2c 를 받지 않으면 http1_clients 로 교체)
+class FakeClientRegistry:
+    def __init__(self, clients, http1_clients=None):
+        self.clients = clients
+        self.http1_clients = http1_clients or {}
+        self.verified = set()
+        self.disabled = set()
+        self.in_use = 0
+
+    async def get(self, node_name, proxy_port):
+        self.in_use += 1
+        return self.clients[node_name]
+
+    async def get_http1_client(self, node_name, proxy_port):
+        self.in_use += 1
+        return self.http1_clients.get(node_name, self.clients[node_name])
+
+    def release(self, node_name, client):
+        self.in_use -= 1
+
+    def get_direct_client(self):
+        raise AssertionError("No service port is registered")
+
+    def is_http2_verified(self, node_name):
+        return node_name in self.verified
+
+    def verify_http2(self, node_name):
+        self.verified.add(node_name)
+
+    async def disable_http2(self, node_name):
+        if node_name not in self.http1_clients or node_name in self.verified:
+            return False
+        self.disabled.add(node_name)
+        self.clients[node_name] = self.http1_clients[node_name]
+        return True
+
+
+# 목록 순서대로 고르는 분산기
+class FakeBalancer:
+    def __init__(self):
+        self.ended = []
+
+    def select(self, node_names):
+        return node_names[0]
+
+    def begin(self, node_name):
+        pass
+
+    def end(self, node_name, failed=False):
+        self.ended.append((node_name, failed))
+
+    def record_latency(self, node_name, latency):
+        pass
+
+
+# 게이트웨이가 aiter_raw 로 흘려보낼 수 있도록 아직 읽지 않은 본문으로 응답
+def backend_response(status_code, content=b"", headers=None, extensions=None):
+    headers = dict(headers or {}, **{"content-length": str(len(content))})
+    return httpx.Response(status_code, headers=headers, stream=httpx.ByteStream(content), extensions=extensions)
+
+
+def create_backend(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def fail_connect(request):
+    raise httpx.ConnectError("Tunnel closed", request=request)
+
+
+def reply(text):
+    return lambda request: backend_response(200, text.encode())
+
+
+class TestRouteForwarder(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.now = 0.0
+        self.balancer = FakeBalancer()
+        self.response_cache = ResponseCache(enabled=False)
+        self.admission = None
+
+    def create_gateway(self, routing_table, client_registry):
+        self.routing_table = routing_table
+        self.client_registry = client_registry
+        forwarder = RouteForwarder(
+            routing_table, client_registry, self.response_cache, self.balancer, hold_timeout=1,
+            admission=self.admission
+        )
+        app = FastAPI()
+
+        @app.get("/route/{node_name}/{path:path}")
+        async def proxy_get(node_name: str, path: str, request: Request):
+            return await forwarder.forward("GET", node_name, path, request, with_body=False)
+
+        @app.post("/route/{node_name}/{path:path}")
+        async def proxy_post(node_name: str, path: str, request: Request):
+            return await forwarder.forward("POST", node_name, path, request, with_body=True)
+
+        gateway = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway")
+        self.addAsyncCleanup(gateway.aclose)
+        return gateway
+
+    async def test_group_retries_other_node(self):
+        gateway = self.create_gateway(
+            FakeRoutingTable([FakeRoute("node-a"), FakeRoute("node-b")], {"api": ["node-a", "node-b"]}),
+            FakeClientRegistry({"node-a": create_backend(fail_connect), "node-b": create_backend(reply("b"))})
+        )
+
+        response = await gateway.get("/route/api/items")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "b")
+        self.assertEqual(response.headers["x-gateway-node"], "node-b")
+        self.assertEqual(self.balancer.ended, [("node-a", True), ("node-b", False)])
+        self.assertEqual(self.client_registry.in_use, 0)
+
+    async def test_group_does_not_retry_request_with_body(self):
+        gateway = self.create_gateway(
+            FakeRoutingTable([FakeRoute("node-a"), FakeRoute("node-b")], {"api": ["node-a", "node-b"]}),
+            FakeClientRegistry({"node-a": create_backend(fail_connect), "node-b": create_backend(reply("b"))})
+        )
+
+        response = await gateway.post("/route/api/items", content=b"body")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.balancer.ended, [("node-a", True)])
+        self.assertEqual(self.client_registry.in_use, 0)
+
+    async def test_hold_until_reconnected(self):
+        routing_table = FakeRoutingTable([FakeRoute("node-a", connection_valid=False, reconnecting=True)])
+
+        def reconnect(route):
+            route.connection_valid = True
+            route.proxy_port = 1080
+        routing_table.on_wait = reconnect
+        gateway = self.create_gateway(routing_table, FakeClientRegistry({"node-a": create_backend(reply("a"))}))
+
+        response = await gateway.get("/route/node-a/items")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(routing_table.waits, [("node-a", False)])
+
+    async def test_not_reconnecting_node_is_not_held(self):
+        routing_table = FakeRoutingTable([FakeRoute("node-a", connection_valid=False)])
+        gateway = self.create_gateway(routing_table, FakeClientRegistry({"node-a": create_backend(reply("a"))}))
+
+        response = await gateway.get("/route/node-a/items")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(routing_table.waits, [])
+
+    async def test_retry_on_reconnected_tunnel(self):
+        route = FakeRoute("node-a")
+        routing_table = FakeRoutingTable([route])
+
+        def drop_tunnel(request):
+            route.connection_valid = False
+            route.reconnecting = True
+            raise httpx.ReadError("Tunnel closed", request=request)
+        client_registry = FakeClientRegistry({"node-a": create_backend(drop_tunnel)})
+
+        def reconnect(route):
+            route.connection_valid = True
+            route.reconnecting = False
+            client_registry.clients["node-a"] = create_backend(reply("again"))
+        routing_table.on_wait = reconnect
+        gateway = self.create_gateway(routing_table, client_registry)
+
+        response = await gateway.get("/route/node-a/items")
+        self.assertEqual(response.text, "again")
+        self.assertEqual(routing_table.waits, [("node-a", True)])
+        self.assertEqual(client_registry.in_use, 0)
+
+    async def test_cache_revalidation(self):
+        self.response_cache = ResponseCache(enabled=True, clock=lambda: self.now)
+        backend_requests = []
+
+        def handler(request):
+            backend_requests.append(request.headers.get("if-none-match"))
+            headers = {"etag": '"v1"', "cache-control": "max-age=60"}
+            if request.headers.get("if-none-match") == '"v1"':
+                return backend_response(304, headers=headers)
+            return backend_response(200, b"cached", headers)
+        gateway = self.create_gateway(
+            FakeRoutingTable([FakeRoute("node-a")]), FakeClientRegistry({"node-a": create_backend(handler)})
+        )
+
+        first = await gateway.get("/route/node-a/items")
+        second = await gateway.get("/route/node-a/items")
+        self.now = 120
+        third = await gateway.get("/route/node-a/items")
+
+        self.assertEqual(
+            [response.headers["x-gateway-cache"] for response in (first, second, third)],
+            ["MISS", "HIT", "REVALIDATED"]
+        )
+        self.assertEqual(third.text, "cached")
+        self.assertEqual(backend_requests, [None, '"v1"'])
+        self.assertEqual(self.response_cache.get_stats()["revalidations"], 1)
+        # 재검증으로 유효기간이 갱신됨
+        fourth = await gateway.get("/route/node-a/items")
+        self.assertEqual(fourth.headers["x-gateway-cache"], "HIT")
+        self.assertEqual(self.client_registry.in_use, 0)
+
+    async def test_admission_released_on_error(self):
+        self.admission = AdmissionController(
+            node_rate=0, caller_rate=0, max_concurrency=1, max_queue=0, queue_timeout=0
+        )
+        client_registry = FakeClientRegistry({"node-a": create_backend(fail_connect)})
+        gateway = self.create_gateway(FakeRoutingTable([FakeRoute("node-a")]), client_registry)
+
+        response = await gateway.get("/route/node-a/items")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.admission.in_flight, 0)
+
+        # 자리가 반환되지 않았으면 동시 처리 제한(1)에 걸려 503
+        client_registry.clients["node-a"] = create_backend(reply("a"))
+        response = await gateway.get("/route/node-a/items")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.admission.in_flight, 0)
+
+    async def test_admission_released_for_unknown_node(self):
+        self.admission = AdmissionController(
+            node_rate=0, caller_rate=0, max_concurrency=1, max_queue=0, queue_timeout=0
+        )
+        gateway = self.create_gateway(FakeRoutingTable([FakeRoute("node-a")]), FakeClientRegistry({}))
+
+        response = await gateway.get("/route/node-b/items")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.admission.in_flight, 0)
+
+    async def test_h2c_fallback(self):
+        http1_requests = []
+
+        def refuse_h2c(request):
+            raise httpx.RemoteProtocolError("Server disconnected", request=request)
+
+        def http1_handler(request):
+            http1_requests.append(request.method)
+            return backend_response(200, b"http1")
+        client_registry = FakeClientRegistry(
+            {"node-a": create_backend(refuse_h2c)}, {"node-a": create_backend(http1_handler)}
+        )
+        gateway = self.create_gateway(FakeRoutingTable([FakeRoute("node-a")]), client_registry)
+
+        # 본문이 없는 요청은 HTTP/1.1 로 바꿔 바로 다시 보냄
+        response = await gateway.get("/route/node-a/items")
+        self.assertEqual(response.text, "http1")
+        self.assertEqual(client_registry.disabled, {"node-a"})
+        self.assertEqual(client_registry.in_use, 0)
+
+        # h2c 가 확인되지 않은 노드로 가는 본문이 있는 요청은 처음부터 HTTP/1.1
+        response = await gateway.post("/route/node-a/items", content=b"body")
+        self.assertEqual(response.text, "http1")
+        self.assertEqual(http1_requests, ["GET", "POST"])
+
+    async def test_request_with_body_is_not_resent_over_h2c(self):
+        def refuse_h2c(request):
+            raise httpx.RemoteProtocolError("Server disconnected", request=request)
+        client_registry = FakeClientRegistry({"node-a": create_backend(refuse_h2c)})
+        client_registry.verified.add("node-a")
+        gateway = self.create_gateway(FakeRoutingTable([FakeRoute("node-a")]), client_registry)
+
+        response = await gateway.post("/route/node-a/items", content=b"body")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(client_registry.disabled, set())
+
+    async def test_http2_response_verifies_node(self):
+        def http2_handler(request):
+            return backend_response(200, b"h2", extensions={"http_version": b"HTTP/2"})
+        client_registry = FakeClientRegistry({"node-a": create_backend(http2_handler)})
+        gateway = self.create_gateway(FakeRoutingTable([FakeRoute("node-a")]), client_registry)
+
+        await gateway.get("/route/node-a/items")
+        self.assertTrue(client_registry.is_http2_verified("node-a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import asyncio
+import os
+
+import httpx
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import PlainTextResponse
+
+from NodeClientRegistry import NodeClientRegistry
+from NodeRoutingTable import NodeRoutingTable
+from ResponseCache import ResponseCache
+from RouteForwarder import RouteForwarder
+from ServiceGroupBalancer import ServiceGroupBalancer
+from GatewayMetrics import GatewayMetrics, RouteMetricsMiddleware
+from TunnelSupervisor import ReconnectBackoff
+from AdmissionControl import AdmissionController
+from ResponseCompression import ResponseCompressor
+from GatewayServer import run_server
+
+# /route 전용 워커
+# 터널과 nodes.db 는 ServerNode 프로세스 하나가 가지고, 워커 프로세스 여러 개가 /route 요청을 나눠 처리
+# 워커는 ServerNode 의 /routing/changes 로 라우팅 테이블을 복제해 두고
+# 같은 호스트에 열린 SOCKS 포트(또는 서비스 포트)로 바로 전달
+
+# 터널을 가진 ServerNode 주소
+GATEWAY_CONTROL_URL = os.getenv('GATEWAY_CONTROL_URL', 'http://127.0.0.1:58000')
+ROUTE_WORKER_HOST = os.getenv('ROUTE_WORKER_HOST', '0.0.0.0')
+ROUTE_WORKER_PORT = int(os.getenv('ROUTE_WORKER_PORT', '58080'))
+ROUTE_WORKERS = int(os.getenv('ROUTE_WORKERS', str(os.cpu_count() or 1)))
+ROUTE_HOLD_TIMEOUT = float(os.getenv('ROUTE_HOLD_TIMEOUT', '10'))
+# 변경이 없을 때 /routing/changes 에서 기다리는 시간
+ROUTE_SYNC_WAIT = float(os.getenv('ROUTE_SYNC_WAIT', '30'))
+# 시작 시 첫 동기화를 기다리는 시간
+ROUTE_SYNC_STARTUP_TIMEOUT = float(os.getenv('ROUTE_SYNC_STARTUP_TIMEOUT', '10'))
+# 종료 시 처리 중인 /route 요청을 기다리는 최대 시간
+GATEWAY_DRAIN_TIMEOUT = float(os.getenv('GATEWAY_DRAIN_TIMEOUT', '30'))
+
+route_worker_app = FastAPI()
+
+# 워커별 /route 요청 지표 (/metrics)
+gateway_metrics = GatewayMetrics()
+route_worker_app.add_middleware(RouteMetricsMiddleware, metrics=gateway_metrics)
+
+# ServerNode 라우팅 테이블의 복제본
+node_routing_table = NodeRoutingTable()
+node_client_registry = NodeClientRegistry()
+response_cache = ResponseCache()
+service_group_balancer = ServiceGroupBalancer()
+# 제한 값은 워커 프로세스마다 따로 적용됨
+admission_controller = AdmissionController()
+response_compressor = ResponseCompressor()
+route_forwarder = RouteForwarder(
+    node_routing_table, node_client_registry, response_cache, service_group_balancer, ROUTE_HOLD_TIMEOUT,
+    admission_controller, response_compressor
+)
+
+
+async def sync_routing_table(synced_event):
+    backoff = ReconnectBackoff()
+    async with httpx.AsyncClient(base_url=GATEWAY_CONTROL_URL, timeout=ROUTE_SYNC_WAIT + 10) as client:
+        while True:
+            params = {"since": node_routing_table.version, "timeout": ROUTE_SYNC_WAIT}
+            if synced_event.is_set():
+                params["epoch"] = node_routing_table.epoch
+            try:
+                response = await client.get("/routing/changes", params=params)
+                response.raise_for_status()
+                changes = response.json()
+            except httpx.HTTPError as e:
+                print(f"Routing sync failed: {e!r}")
+                await asyncio.sleep(backoff.next_delay())
+                continue
+            backoff.reset()
+
+            # 그룹이 바뀐 노드의 부하 통계는 새 그룹에서 다시 쌓음
+            for fields in changes["routes"]:
+                route = node_routing_table.get(fields["node_name"])
+                if route is not None and route.service_group != fields["service_group"]:
+                    service_group_balancer.forget(fields["node_name"])
+            node_routing_table.apply_changes(changes)
+            synced_event.set()
+            # 끊긴 노드의 SOCKS 클라이언트는 바로 정리
+            for fields in changes["routes"]:
+                if not fields["connection_valid"]:
+                    await node_client_registry.close(fields["node_name"])
+
+
+@route_worker_app.on_event("startup")
+async def start_routing_sync():
+    synced_event = asyncio.Event()
+    route_worker_app.state.sync_task = asyncio.create_task(sync_routing_table(synced_event))
+    route_worker_app.state.pool_eviction_task = asyncio.create_task(node_client_registry.run_idle_eviction())
+    try:
+        await asyncio.wait_for(synced_event.wait(), ROUTE_SYNC_STARTUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("Routing table is not synced yet")
+
+
+@route_worker_app.on_event("shutdown")
+async def stop_routing_sync():
+    # 처리 중인 /route 요청이 끝난 뒤 커넥션 정리
+    admission_controller.start_drain()
+    await admission_controller.wait_drained(GATEWAY_DRAIN_TIMEOUT)
+    route_worker_app.state.sync_task.cancel()
+    route_worker_app.state.pool_eviction_task.cancel()
+    await node_client_registry.close_all()
+
+
+@route_worker_app.get("/routing/status")
+async def get_routing_status():
+    return {
+        "pid": os.getpid(),
+        "epoch": node_routing_table.epoch,
+        "version": node_routing_table.version,
+        "nodes": len(node_routing_table),
+    }
+
+
+@route_worker_app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    pool_stats = node_client_registry.get_stats()
+    admission_stats = admission_controller.get_stats()
+    return gateway_metrics.render(gauges=[
+        ("gateway_nodes", "Nodes in the replicated routing table.", len(node_routing_table)),
+        ("gateway_proxy_pools", "Open per-node SOCKS client pools.", pool_stats["nodes"]),
+    ], counters=[
+        ("gateway_route_rate_limited_total", "Requests rejected by rate limits.", admission_stats["rate_limited"]),
+        ("gateway_route_queued_total", "Requests that waited for a concurrency slot.", admission_stats["queued"]),
+        ("gateway_route_queue_rejected_total", "Requests rejected by a full or timed out queue.", admission_stats["queue_rejected"]),
+    ])
+
+
+@route_worker_app.get("/admission/status")
+async def get_admission_status():
+    return admission_controller.get_stats()
+
+
+@route_worker_app.get("/route/{node_name}/{path:path}")
+async def proxy_get(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("GET", node_name, path, request, with_body=False)
+
+
+@route_worker_app.post("/route/{node_name}/{path:path}")
+async def proxy_post(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("POST", node_name, path, request, with_body=True)
+
+
+@route_worker_app.patch("/route/{node_name}/{path:path}")
+async def proxy_patch(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("PATCH", node_name, path, request, with_body=True)
+
+
+@route_worker_app.delete("/route/{node_name}/{path:path}")
+async def proxy_delete(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("DELETE", node_name, path, request, with_body=False)
+
+
+@route_worker_app.put("/route/{node_name}/{path:path}")
+async def proxy_put(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("PUT", node_name, path, request, with_body=True)
+
+
+@route_worker_app.head("/route/{node_name}/{path:path}")
+async def proxy_head(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("HEAD", node_name, path, request, with_body=False)
+
+
+@route_worker_app.options("/route/{node_name}/{path:path}")
+async def proxy_options(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("OPTIONS", node_name, path, request, with_body=False)
+
+
+@route_worker_app.websocket("/route/{node_name}/{path:path}")
+async def proxy_websocket(node_name: str, path: str, websocket: WebSocket):
+    await route_forwarder.forward_websocket(node_name, path, websocket)
+
+
+if __name__ == '__main__':
+    # 워커 프로세스들이 같은 포트를 함께 사용
+    run_server(
+        "RouteWorker:route_worker_app", host=ROUTE_WORKER_HOST, port=ROUTE_WORKER_PORT, workers=ROUTE_WORKERS,
+        shutdown_timeout=GATEWAY_DRAIN_TIMEOUT
+    )
@@ -0,0 +1,159 @@
+import asyncio
+import contextlib
+
+import asyncssh
+import httpcore
+import httpx
+
+
+async def wait_with_timeout(awaitable, timeout, timeout_exception):
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise timeout_exception("Timed out")
+
+
+# SSH direct-tcpip 채널 하나를 httpcore 네트워크 스트림으로 사용
+class SSHChannelStream(httpcore.AsyncNetworkStream):
+    def __init__(self, reader, writer):
+        self.__reader = reader
+        self.__writer = writer
+
+    async def read(self, max_bytes, timeout=None):
+        try:
+            return await wait_with_timeout(self.__reader.read(max_bytes), timeout, httpcore.ReadTimeout)
+        except (OSError, asyncssh.Error) as e:
+            raise httpcore.ReadError(str(e))
+
+    async def write(self, buffer, timeout=None):
+        if not buffer:
+            return
+        try:
+            self.__writer.write(buffer)
+            await wait_with_timeout(self.__writer.drain(), timeout, httpcore.WriteTimeout)
+        except (OSError, asyncssh.Error) as e:
+            raise httpcore.WriteError(str(e))
+
+    async def aclose(self):
+        self.__writer.close()
+
+    async def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+        # 노드 백엔드는 SSH 채널 안의 평문 HTTP 만 사용
+        raise httpcore.ConnectError("TLS over SSH channel is not supported")
+
+    def get_extra_info(self, info):
+        # keep-alive 연결을 다시 쓰기 전에 백엔드가 연결을 닫았는지 확인
+        if info == "is_readable":
+            return self.__reader.at_eof()
+        if info == "server_addr":
+            return self.__writer.get_extra_info("peername")
+        return None
+
+
+# 노드 SSH 연결에서 direct-tcpip 채널을 열어 백엔드에 바로 연결
+# 로컬 SOCKS 리스너를 거치지 않으므로 루프백 TCP 연결과 SOCKS 협상이 없음
+class SSHChannelBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self, connection):
+        self.__connection = connection
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            reader, writer = await wait_with_timeout(
+                self.__connection.open_connection(host, port), timeout, httpcore.ConnectTimeout
+            )
+        except (OSError, asyncssh.Error) as e:
+            raise httpcore.ConnectError(str(e))
+        return SSHChannelStream(reader, writer)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError("Unix sockets are not supported over SSH channel")
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+# httpcore 예외 -> httpx 예외 (하위 클래스를 먼저 두어 가장 구체적인 예외로 변환)
+HTTPCORE_EXCEPTIONS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def map_httpcore_exceptions():
+    try:
+        yield
+    except Exception as e:
+        for httpcore_exception, httpx_exception in HTTPCORE_EXCEPTIONS:
+            if isinstance(e, httpcore_exception):
+                raise httpx_exception(str(e)) from e
+        raise
+
+
+# httpcore 응답 스트림을 httpx 응답 본문으로 전달
+class SSHChannelResponseStream(httpx.AsyncByteStream):
+    def __init__(self, httpcore_stream):
+        self.__httpcore_stream = httpcore_stream
+
+    async def __aiter__(self):
+        with map_httpcore_exceptions():
+            async for chunk in self.__httpcore_stream:
+                yield chunk
+
+    async def aclose(self):
+        if hasattr(self.__httpcore_stream, "aclose"):
+            await self.__httpcore_stream.aclose()
+
+
+# 채널을 keep-alive 풀로 재사용하는 httpx 트랜스포트
+# 풀은 직접 소유하고, 요청/응답은 httpx <-> httpcore 공개 API 로만 변환
+class SSHChannelTransport(httpx.AsyncBaseTransport):
+    def __init__(self, connection, limits, verify=True, http2=False):
+        # verify 는 다른 트랜스포트와 같은 생성자를 맞추기 위한 값 (SSH 채널 안에서는 TLS 를 쓰지 않음)
+        # http2 이면 채널 하나(h2c prior knowledge)로 여러 요청을 동시에 전달
+        self.__pool = httpcore.AsyncConnectionPool(
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=not http2,
+            http2=http2,
+            network_backend=SSHChannelBackend(connection),
+        )
+
+    async def handle_async_request(self, request):
+        httpcore_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with map_httpcore_exceptions():
+            httpcore_response = await self.__pool.handle_async_request(httpcore_request)
+        return httpx.Response(
+            status_code=httpcore_response.status,
+            headers=httpcore_response.headers,
+            stream=SSHChannelResponseStream(httpcore_response.stream),
+            extensions=httpcore_response.extensions,
+        )
+
+    async def aclose(self):
+        await self.__pool.aclose()
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+import httpx
+from server.SSHChannelTransport import SSHChannelTransport
+
+
+# asyncssh 연결 대신 로컬 TCP 로 direct-tcpip 채널을 흉내
+class FakeSSHConnection:
+    def __init__(self):
+        self.opened = 0
+
+    async def open_connection(self, host, port):
+        self.opened += 1
+        return await asyncio.open_connection(host, port)
+
+
+async def handle_backend(reader, writer):
+    while True:
+        request_line = await reader.readline()
+        if not request_line:
+            break
+        content_length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                content_length = int(value)
+        body = await reader.readexactly(content_length)
+        response_body = request_line.split(b" ")[1] + b" " + body
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(response_body), response_body))
+        await writer.drain()
+    writer.close()
+
+
+class TestSSHChannelTransport(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = await asyncio.start_server(handle_backend, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.connection = FakeSSHConnection()
+        self.client = httpx.AsyncClient(
+            transport=SSHChannelTransport(self.connection, httpx.Limits(max_connections=4, max_keepalive_connections=2))
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_keepalive_channel_is_reused(self):
+        for body in (b"a", b"bb"):
+            response = await self.client.post(f"http://127.0.0.1:{self.port}/echo", content=body)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, b"/echo " + body)
+
+        # keep-alive 로 채널 하나만 엽니다.
+        self.assertEqual(self.connection.opened, 1)
+
+    async def test_connect_error_is_httpx_error(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+        with self.assertRaises(httpx.ConnectError):
+            await self.client.get(f"http://127.0.0.1:{self.port}/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,63 +1,370 @@
 import asyncio
-from typing import Optional
+import functools
+import hmac
+import ipaddress
+import json
+import time
+from typing import Dict, List, Optional
 
 import asyncssh
-import httpx
-import uvicorn
-from fastapi import FastAPI, BackgroundTasks
-from peewee import SqliteDatabase, Model, CharField, IntegerField, BooleanField
+from fastapi import FastAPI, HTTPException
+from peewee import SqliteDatabase, Model, CharField, IntegerField, BooleanField, TextField, IntegrityError
 from pydantic import BaseModel
-from fastapi import Request, Response
+from fastapi import Query, Request, WebSocket
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import os
 
+from NodeClientRegistry import NodeClientRegistry
+from SSHChannelTransport import SSHChannelTransport
+from TunnelSupervisor import TunnelSupervisor, ReconnectBackoff
+from NodeRoutingTable import NodeRoutingTable
+from NodeRepository import NodeRepository, SQLITE_PRAGMAS
+from NodeAuth import NodeTokenStore, hash_password, verify_password
+from PortAllocator import PortAllocator, PortExhaustedException, PortLeasedException
+from ResponseCache import ResponseCache
+from RouteForwarder import RouteForwarder
+from GatewayMetrics import GatewayMetrics, OnboardingTracker, RouteMetricsMiddleware
+from ServiceGroupBalancer import ServiceGroupBalancer
+from AdmissionControl import AdmissionController
+from ResponseCompression import ResponseCompressor
+from GatewayServer import run_server
+
 # DB
-db = SqliteDatabase('nodes.db')
+db = SqliteDatabase('nodes.db', pragmas=SQLITE_PRAGMAS)
 
 class PeeweeBaseModel(Model):
     class Meta:
         database = db
 
 class Node(PeeweeBaseModel):
-    node_name = CharField(max_length=255)
-    node_password = CharField(max_length=255)
+    node_name = CharField(max_length=255, unique=True)
+    # 이전 버전이 평문으로 저장한 로그인 비밀번호 (첫 로그인 때 해시로 옮기고 비움)
+    node_password = CharField(max_length=255, default="")
+    # 제어 API 로그인 비밀번호의 PBKDF2 해시
+    node_password_hash = CharField(max_length=255, null=True)
+    # 게이트웨이 쪽 터널이 노드 sshd 에 노드 계정으로 로그인할 때 쓰는 비밀번호
+    # 노드 sshd 가 확인하는 값이라 평문으로 보관하며, 로그인 비밀번호와 따로 관리
+    node_ssh_password = CharField(max_length=255, null=True)
     route_port = IntegerField()
     connection_valid = BooleanField(default=False)
     proxy_port = IntegerField(null=True)
+    service_group = CharField(max_length=255, null=True)
+    # 게이트웨이 쪽 터널 임대 (재시작 후 노드를 다시 연결할 때 사용)
+    remote_ssh_port = IntegerField(null=True)
+    # 서비스 이름 -> 게이트웨이 쪽 포트 (JSON)
+    services = TextField(null=True)
+
+# DB 접근은 전용 스레드 풀에서 실행
+node_repository = NodeRepository(db, Node)
 
 # 테이블 생성
-db.connect()
-db.create_tables([Node])
+node_repository.prepare()
 
 server_node_app = FastAPI()
+# 종료 중에는 터널이 끝나도 노드 서비스 임대를 DB 에 남겨 재시작 후 다시 연결
+server_node_app.state.shutting_down = False
+# 종료가 시작되면 set. 끝나지 않는 스트림(/node/status/events)을 닫아 종료를 막지 않도록 함
+server_node_app.state.stopping = asyncio.Event()
+
+# /route 요청 지표 (/metrics)
+gateway_metrics = GatewayMetrics()
+server_node_app.add_middleware(RouteMetricsMiddleware, metrics=gateway_metrics)
+
+# 노드 라우팅 정보 (nodes.db 의 메모리 사본)
+node_routing_table = NodeRoutingTable(node_repository)
+
+# /route 요청은 터널의 SSH 연결에서 direct-tcpip 채널을 바로 열어 백엔드로 전달
+TUNNEL_SSH_CHANNELS = os.getenv('TUNNEL_SSH_CHANNELS', '1').lower() in ('1', 'true', 'yes')
+# 로컬 SOCKS 리스너 (route worker 프로세스는 SSH 연결이 없으므로 이 포트로 전달)
+TUNNEL_SOCKS_LISTENER = os.getenv('TUNNEL_SOCKS_LISTENER', '1').lower() in ('1', 'true', 'yes') \
+    or not TUNNEL_SSH_CHANNELS
+# 노드별 클라이언트 풀
+node_client_registry = NodeClientRegistry(
+    channel_transport_factory=SSHChannelTransport if TUNNEL_SSH_CHANNELS else None
+)
+# 노드별 터널 태스크
+tunnel_supervisor = TunnelSupervisor()
+# 터널용 포트 풀
+port_allocator = PortAllocator()
+# 포트 풀에 미리 확인해 둔 포트를 다시 채우는 주기
+PORT_RESERVE_REFRESH_INTERVAL = float(os.getenv('PORT_RESERVE_REFRESH_INTERVAL', '5'))
+# 노드별 서비스 포트 임대
+node_service_leases = {}
+# GET 응답 캐시
+response_cache = ResponseCache()
+# 서비스 그룹 부하 분산
+service_group_balancer = ServiceGroupBalancer()
+# /route 요청 속도 제한/동시 처리 제한
+admission_controller = AdmissionController()
+# 외부 클라이언트로 보내는 응답 압축
+response_compressor = ResponseCompressor()
+# /node/connect 후 노드의 리버스 포워딩을 기다리는 시간
+TUNNEL_CONNECT_TIMEOUT = float(os.getenv('TUNNEL_CONNECT_TIMEOUT', '30'))
+# 끊긴 터널 감지 (interval * count_max 초 안에 감지)
+TUNNEL_KEEPALIVE_INTERVAL = float(os.getenv('TUNNEL_KEEPALIVE_INTERVAL', '2'))
+TUNNEL_KEEPALIVE_COUNT_MAX = int(os.getenv('TUNNEL_KEEPALIVE_COUNT_MAX', '3'))
+# 노드와의 SSH 연결 압축 (느린 회선에서 JSON 위주 응답의 전송량 감소, 대신 CPU 사용)
+TUNNEL_COMPRESSION_ALGS = ['zlib@openssh.com', 'zlib', 'none'] \
+    if os.getenv('TUNNEL_COMPRESSION', '0').lower() in ('1', 'true', 'yes') else ()
+# 노드의 리버스 포워딩이 열렸는지 다시 확인하는 최대 간격
+TUNNEL_CONNECT_RETRY_MAX_DELAY = float(os.getenv('TUNNEL_CONNECT_RETRY_MAX_DELAY', '0.1'))
+# 노드 SSH 연결 옵션은 한 번만 만들어 재사용 (설정 파일/키 로딩 생략)
+# 노드 계정은 비밀번호로만 인증하므로 공개키/에이전트 인증 시도도 하지 않음
+TUNNEL_SSH_OPTIONS = asyncssh.SSHClientConnectionOptions(
+    known_hosts=None, client_keys=None, agent_path=None,
+    keepalive_interval=TUNNEL_KEEPALIVE_INTERVAL, keepalive_count_max=TUNNEL_KEEPALIVE_COUNT_MAX,
+    compression_algs=TUNNEL_COMPRESSION_ALGS
+)
+# 연속 재연결 실패 허용 횟수
+TUNNEL_RECONNECT_MAX_ATTEMPTS = int(os.getenv('TUNNEL_RECONNECT_MAX_ATTEMPTS', '20'))
+# 재연결 중인 노드로 온 /route 요청을 붙잡아 두는 최대 시간
+ROUTE_HOLD_TIMEOUT = float(os.getenv('ROUTE_HOLD_TIMEOUT', '10'))
+# /routing/changes 최대 대기 시간
+ROUTING_CHANGES_MAX_WAIT = float(os.getenv('ROUTING_CHANGES_MAX_WAIT', '60'))
+# /node/status 한 페이지 최대 노드 수
+NODE_STATUS_PAGE_SIZE = int(os.getenv('NODE_STATUS_PAGE_SIZE', '1000'))
+# /node/status/events 에서 변경이 없을 때 연결 유지용 주석을 보내는 간격
+NODE_STATUS_EVENTS_KEEPALIVE = float(os.getenv('NODE_STATUS_EVENTS_KEEPALIVE', '15'))
+# 드레인 시 처리 중인 /route 요청을 기다리는 최대 시간
+GATEWAY_DRAIN_TIMEOUT = float(os.getenv('GATEWAY_DRAIN_TIMEOUT', '30'))
+# 재시작 후 저장된 터널 임대로 노드를 다시 연결하는 속도(초당)와 노드별 연결 대기 시간
+TUNNEL_REATTACH_RATE = float(os.getenv('TUNNEL_REATTACH_RATE', '20'))
+TUNNEL_REATTACH_TIMEOUT = float(os.getenv('TUNNEL_REATTACH_TIMEOUT', '5'))
+# 관리 API(/gateway/drain 등) 토큰. 비어 있으면 게이트웨이 호스트(loopback)에서 온 요청만 받음
+GATEWAY_ADMIN_TOKEN = os.getenv('GATEWAY_ADMIN_TOKEN', '')
+# 로그인한 노드의 세션 토큰 (제어 API 인증)
+node_token_store = NodeTokenStore()
+# 노드 연결 단계별 시간 (/node/onboarding, /metrics)
+onboarding_tracker = OnboardingTracker()
+# /route 요청 전달
+route_forwarder = RouteForwarder(
+    node_routing_table, node_client_registry, response_cache, service_group_balancer, ROUTE_HOLD_TIMEOUT,
+    admission_controller, response_compressor, onboarding_tracker
+)
+
+@server_node_app.on_event("startup")
+async def load_node_routing_table():
+    # 이전 프로세스의 터널은 남아 있지 않으므로 DB 의 연결 상태를 먼저 정리
+    stale_connections = await node_repository.reset_connections()
+    if stale_connections:
+        print(f"Reset {stale_connections} stale connections")
+    await node_routing_table.load()
+    server_node_app.state.reattach_task = asyncio.create_task(
+        reattach_tunnels(await node_repository.list_tunnel_leases())
+    )
+
+# 노드의 리버스 포워딩은 게이트웨이 호스트의 sshd 에 있으므로 게이트웨이 프로세스가 다시 시작되어도 남아 있음
+# 저장해 둔 포트로 게이트웨이 쪽 터널만 다시 연결해 노드가 연결 과정을 처음부터 반복하지 않도록 함
+# 한꺼번에 연결하지 않고 초당 TUNNEL_REATTACH_RATE 개씩
+async def reattach_tunnels(tunnel_leases):
+    for node_instance in tunnel_leases:
+        node_name = node_instance.node_name
+        # 그사이 노드가 직접 다시 연결한 경우는 건너뜀
+        if node_name in node_routing_table and not tunnel_supervisor.is_active(node_name):
+            services = json.loads(node_instance.services) if node_instance.services else {}
+            service_leases = []
+            try:
+                service_leases = port_allocator.claim_all(services.values(), node_name)
+                port_leases = port_allocator.claim_all(
+                    [node_instance.remote_ssh_port, node_instance.proxy_port], node_name
+                )
+            except PortLeasedException as e:
+                # DB 에 남은 포트가 다른 노드와 겹치면 그 노드가 다시 /node/connect 할 때까지 둠
+                print(f"Skip reattaching {node_name}: {e.message}")
+                for service_lease in service_leases:
+                    port_allocator.release(service_lease)
+                continue
+            # 다시 연결될 때까지 /route 요청은 잠시 대기
+            node_routing_table.set_reconnecting(node_name, True)
+            replace_node_services(node_name, services, service_leases)
+            tunnel_supervisor.start(
+                node_name,
+                functools.partial(
+                    create_reverse_ssh_tunnel,
+                    node_name=node_name,
+                    node_ssh_password=get_ssh_password(node_instance),
+                    remote_ssh_port=node_instance.remote_ssh_port,
+                    proxy_port=node_instance.proxy_port,
+                    port_leases=port_leases,
+                    connect_timeout=TUNNEL_REATTACH_TIMEOUT
+                )
+            )
+        await asyncio.sleep(1 / TUNNEL_REATTACH_RATE)
+
+@server_node_app.on_event("startup")
+async def start_node_client_registry():
+    server_node_app.state.pool_eviction_task = asyncio.create_task(node_client_registry.run_idle_eviction())
+
+async def refill_port_reserve():
+    while True:
+        port_allocator.fill_reserve()
+        await asyncio.sleep(PORT_RESERVE_REFRESH_INTERVAL)
+
+@server_node_app.on_event("startup")
+async def start_port_reserve():
+    server_node_app.state.port_reserve_task = asyncio.create_task(refill_port_reserve())
+
+# 서버가 새 연결을 막고 열린 연결을 기다리기 시작할 때 호출 (lifespan shutdown 보다 먼저)
+# 남은 keep-alive 연결의 새 /route 요청은 503 으로 돌려보내고, 이벤트 스트림은 끝냄
+def begin_gateway_shutdown():
+    server_node_app.state.shutting_down = True
+    admission_controller.start_drain()
+    server_node_app.state.stopping.set()
+
+@server_node_app.on_event("shutdown")
+async def shutdown_gateway():
+    # 처리 중인 요청이 끝나기를 기다린 뒤 터널 정리
+    # 터널 임대는 DB 에 남겨 두어 다음 시작 때 다시 연결
+    begin_gateway_shutdown()
+    if not await admission_controller.wait_drained(GATEWAY_DRAIN_TIMEOUT):
+        print(f"Shutting down with {admission_controller.in_flight} requests in flight")
+    server_node_app.state.reattach_task.cancel()
+    server_node_app.state.pool_eviction_task.cancel()
+    server_node_app.state.port_reserve_task.cancel()
+    await tunnel_supervisor.stop_all()
+    await node_client_registry.close_all()
+    await node_repository.close()
 
 class RequestAccountCheckModel(BaseModel):
     node_name: str
-    node_password: str
 
 class ResponseAccountCheckModel(BaseModel):
     valid: bool
 class MessageModel(BaseModel):
     message: str
-@server_node_app.post("/node/account/check")
-async def post_node_account_valid(request_account_check_model: RequestAccountCheckModel):
-    node_exists = Node.select().where(
-        (Node.node_name == request_account_check_model) & (Node.node_password == request_account_check_model.node_password)
-    ).exists()
+# 토큰이 이 노드의 유효한 토큰인지 확인 (메모리 조회만, 아니면 401/403)
+@server_node_app.post("/node/account/check", response_model=ResponseAccountCheckModel)
+async def post_node_account_valid(request_account_check_model: RequestAccountCheckModel, request: Request):
+    authorize_node(request, request_account_check_model.node_name)
     return {
-        "valid": node_exists
+        "valid": True
+    }
+
+# 비밀번호 확인은 로그인 때만 (해시 계산은 이벤트 루프를 막지 않도록 스레드에서)
+async def authenticate_node(node_name, node_password):
+    credential = await node_repository.get_credential(node_name)
+    if credential is None:
+        return False
+    if credential.node_password_hash is None:
+        # 이전 계정은 평문 비밀번호와 비교한 뒤 해시로 옮기고 평문은 지움
+        # 이전 버전은 같은 비밀번호로 노드 sshd 에도 로그인했으므로 터널용 비밀번호로 남김
+        if not credential.node_password \
+                or not hmac.compare_digest(credential.node_password.encode(), node_password.encode()):
+            return False
+        await node_repository.update_credential(
+            node_name,
+            node_password="",
+            node_password_hash=await asyncio.to_thread(hash_password, node_password),
+            node_ssh_password=credential.node_ssh_password or credential.node_password
+        )
+        return True
+    return await asyncio.to_thread(verify_password, node_password, credential.node_password_hash)
+
+# 제어 API 는 Authorization: Bearer <토큰> 으로 인증 (메모리 조회만)
+def authorize_node(request, node_name):
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    token_node_name = node_token_store.verify(token) if scheme.lower() == "bearer" else None
+    if token_node_name is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired node token")
+    if token_node_name != node_name:
+        raise HTTPException(status_code=403, detail="Token was issued to another node")
+
+def is_admin(request):
+    if GATEWAY_ADMIN_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), GATEWAY_ADMIN_TOKEN.encode())
+    try:
+        return request.client is not None and ipaddress.ip_address(request.client.host).is_loopback
+    except ValueError:
+        return False
+
+def authorize_admin(request):
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# 게이트웨이 쪽 터널이 노드 sshd 에 로그인할 비밀번호 (제어 요청에는 싣지 않음)
+async def get_node_ssh_password(node_name):
+    credential = await node_repository.get_credential(node_name)
+    if credential is None:
+        raise HTTPException(status_code=404, detail="Unknown node")
+    return get_ssh_password(credential)
+
+# 아직 로그인하지 않은 이전 계정은 평문 로그인 비밀번호가 터널용 비밀번호
+def get_ssh_password(node_instance):
+    return node_instance.node_ssh_password or node_instance.node_password
+
+class ResponseNodeLoginModel(BaseModel):
+    token: str
+    expires_in: float
+
+class RequestNodeLoginModel(BaseModel):
+    node_name: str
+    node_password: str
+
+# 비밀번호를 한 번 확인하고 세션 토큰 발급. 이후 제어 요청은 토큰으로 인증
+@server_node_app.post("/node/login", response_model=ResponseNodeLoginModel)
+async def post_node_login(request_node_login_model: RequestNodeLoginModel):
+    node_name = request_node_login_model.node_name
+    if not await authenticate_node(node_name, request_node_login_model.node_password):
+        raise HTTPException(status_code=403, detail="Invalid node account")
+    return {
+        "token": node_token_store.issue(node_name),
+        "expires_in": node_token_store.ttl
     }
 
 class RequestNodeAccount(BaseModel):
     node_name: str
+    # 제어 API 로그인 비밀번호 (해시로만 저장)
     node_password: str
+    # 게이트웨이 쪽 터널이 노드 sshd 에 로그인할 때 쓰는 노드 계정 비밀번호
+    node_ssh_password: str
     route_port: int
+    service_group: Optional[str] = None
 @server_node_app.post("/node/account", response_model=MessageModel)
 async def post_node_account(request_node_account: RequestNodeAccount):
-    new_node = Node.create(
-        node_name=request_node_account.node_name,
-        node_password=request_node_account.node_password,
-        route_port=request_node_account.route_port,
-    )
+    if request_node_account.service_group in node_routing_table:
+        raise HTTPException(status_code=409, detail="Service group name conflicts with a node name")
+    # 그룹 이름과 같은 노드는 /route/{service_group}/... 를 가로채므로 거절
+    if node_routing_table.get_group(request_node_account.node_name):
+        raise HTTPException(status_code=409, detail="Node name conflicts with a service group name")
+    try:
+        await node_routing_table.add(
+            node_name=request_node_account.node_name,
+            node_password_hash=await asyncio.to_thread(hash_password, request_node_account.node_password),
+            route_port=request_node_account.route_port,
+            service_group=request_node_account.service_group,
+            node_ssh_password=request_node_account.node_ssh_password,
+        )
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Node already exists")
+    return {
+        "message": "success"
+    }
+
+class RequestNodePasswordModel(BaseModel):
+    node_name: str
+    # 현재 로그인 비밀번호
+    node_password: str
+    new_node_password: Optional[str] = None
+    node_ssh_password: Optional[str] = None
+
+# 로그인 비밀번호나 터널용 비밀번호 변경. 이미 발급한 토큰은 모두 무효
+@server_node_app.post("/node/account/password", response_model=MessageModel)
+async def post_node_account_password(request_node_password_model: RequestNodePasswordModel):
+    node_name = request_node_password_model.node_name
+    if not await authenticate_node(node_name, request_node_password_model.node_password):
+        raise HTTPException(status_code=403, detail="Invalid node account")
+
+    fields = {}
+    if request_node_password_model.new_node_password is not None:
+        fields["node_password_hash"] = await asyncio.to_thread(
+            hash_password, request_node_password_model.new_node_password
+        )
+    if request_node_password_model.node_ssh_password is not None:
+        fields["node_ssh_password"] = request_node_password_model.node_ssh_password
+    if fields:
+        await node_repository.update_credential(node_name, **fields)
+        node_token_store.revoke(node_name)
     return {
         "message": "success"
     }
@@ -68,189 +375,539 @@ class ResponseNodeStatus(BaseModel):
     connection_valid: bool
     proxy_port: Optional[int]
 
+# DB 대신 라우팅 테이블(메모리)에서 조회
 @server_node_app.get("/node/check", response_model=ResponseNodeStatus)
-def get_node_check(node_name: str):
-    node_instance = Node.select().where(Node.node_name == node_name).get()
+async def get_node_check(node_name: str):
+    route = node_routing_table.get(node_name)
+    if route is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return {
+        "node_name": route.node_name,
+        "route_port": route.route_port,
+        "connection_valid": route.connection_valid,
+        "proxy_port": route.proxy_port
+    }
+
+# 여러 노드 상태를 한 번에 조회 (대시보드용, 메모리에서 조회)
+# node_name 을 주면 해당 노드만, 아니면 이름순으로 cursor 다음부터 limit 개씩
+# format=ndjson 이면 cursor 이후 전체를 한 줄에 한 노드씩 스트리밍
+# 응답의 epoch/version 부터 /node/status/changes 로 이어서 변경만 받을 수 있음
+@server_node_app.get("/node/status")
+async def get_node_status(
+        node_name: Optional[List[str]] = Query(None),
+        cursor: Optional[str] = None,
+        limit: int = NODE_STATUS_PAGE_SIZE,
+        format: str = "json"
+):
+    epoch = node_routing_table.epoch
+    version = node_routing_table.status_version
+    if node_name is not None:
+        routes = [node_routing_table.get(name) for name in node_name]
+        routes, next_cursor = [route for route in routes if route is not None], None
+    elif format == "ndjson":
+        routes, next_cursor = node_routing_table.get_page(cursor)
+    else:
+        routes, next_cursor = node_routing_table.get_page(cursor, max(1, min(limit, NODE_STATUS_PAGE_SIZE)))
+
+    if format == "ndjson":
+        async def stream_routes():
+            # 한 번에 NODE_STATUS_PAGE_SIZE 줄씩 보내고 다른 요청에 양보
+            for start in range(0, len(routes), NODE_STATUS_PAGE_SIZE):
+                yield "".join(
+                    json.dumps(route.to_dict()) + "\n" for route in routes[start:start + NODE_STATUS_PAGE_SIZE]
+                )
+                await asyncio.sleep(0)
+
+        return StreamingResponse(
+            stream_routes(),
+            media_type="application/x-ndjson",
+            headers={"x-status-epoch": epoch, "x-status-version": str(version)}
+        )
     return {
-        "node_name": node_instance.node_name,
-        "route_port": node_instance.route_port,
-        "connection_valid": node_instance.connection_valid,
-        "proxy_port": node_instance.proxy_port
+        "epoch": epoch,
+        "version": version,
+        "nodes": [route.to_dict() for route in routes],
+        "next_cursor": next_cursor
     }
 
+# connection_valid/proxy_port 가 바뀐 노드만 전달 (long polling, epoch 가 다르면 전체 목록)
+@server_node_app.get("/node/status/changes")
+async def get_node_status_changes(epoch: Optional[str] = None, since: int = 0, timeout: float = 0):
+    return await node_routing_table.wait_status_changes(epoch, since, min(timeout, ROUTING_CHANGES_MAX_WAIT))
+
+# /node/status/changes 의 Server-Sent Events 버전. 이벤트 id(epoch:version)로 Last-Event-ID 재연결 시 이어서 받음
+@server_node_app.get("/node/status/events")
+async def get_node_status_events(request: Request, epoch: Optional[str] = None, since: int = 0):
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        epoch, _, last_version = last_event_id.partition(":")
+        since = int(last_version) if last_version.isdigit() else 0
+
+    async def stream_status_events():
+        nonlocal epoch, since
+        while True:
+            changes = await wait_unless_stopping(
+                node_routing_table.wait_status_changes(epoch, since, NODE_STATUS_EVENTS_KEEPALIVE)
+            )
+            if changes is None:
+                return
+            if not changes["full"] and changes["version"] == since:
+                yield ": keepalive\n\n"
+                continue
+            epoch, since = changes["epoch"], changes["version"]
+            yield f"id: {epoch}:{since}\nevent: status\ndata: {json.dumps(changes)}\n\n"
+
+    return StreamingResponse(
+        stream_status_events(), media_type="text/event-stream", headers={"cache-control": "no-cache"}
+    )
+
+# 게이트웨이 종료가 시작되면 기다리던 작업을 취소하고 None
+async def wait_unless_stopping(awaitable):
+    task = asyncio.ensure_future(awaitable)
+    stopping = asyncio.ensure_future(server_node_app.state.stopping.wait())
+    try:
+        await asyncio.wait([task, stopping], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopping.cancel()
+        if not task.done():
+            task.cancel()
+    return task.result() if task.done() else None
+
 class RequestDisconnectModel(BaseModel):
     node_name: str
 @server_node_app.post("/node/disconnect", response_model=MessageModel)
-async def post_node_disconnect(request_disconnect_model: RequestDisconnectModel):
-    Node.update(connection_valid=False).where(Node.node_name == request_disconnect_model.node_name).execute()
+async def post_node_disconnect(request_disconnect_model: RequestDisconnectModel, request: Request):
+    authorize_node(request, request_disconnect_model.node_name)
+    # 연결을 끊은 노드는 다시 연결할 때 새로 로그인
+    node_token_store.revoke(request_disconnect_model.node_name)
+    # 살아있는 터널은 종료 이벤트로 즉시 정리되고, 정리 과정에서 DB 상태를 기록
+    if not tunnel_supervisor.stop(request_disconnect_model.node_name):
+        node_routing_table.update(request_disconnect_model.node_name, connection_valid=False)
+    # 직접 연결을 끊은 노드는 재시작 후에도 다시 연결하지 않음
+    node_repository.queue_status(request_disconnect_model.node_name, remote_ssh_port=None)
+    # /route/{node}/{service}/... 는 바로 막음
+    # 노드의 서비스 포워딩은 노드 쪽 SSH 연결과 함께 남아 있으므로 포트는 미확정 임대로 돌려 다시 등록할 수 있도록 함
+    suspend_node_services(request_disconnect_model.node_name)
+    await node_client_registry.close(request_disconnect_model.node_name)
     return {
         "message": "request disconnect"
     }
 
 # username과 패스워드는 node name, password로 바꾸기
-async def create_reverse_ssh_tunnel(remote_ssh_port, proxy_port, node_name, node_password):
+async def create_reverse_ssh_tunnel(tunnel_handle, remote_ssh_port, proxy_port, node_name, node_ssh_password, port_leases=(), connect_timeout=0, onboarding=None):
+    stop_event = tunnel_handle.stop_event
+    backoff = ReconnectBackoff()
+    try:
+        while not stop_event.is_set():
+            try:
+                await run_reverse_ssh_tunnel(tunnel_handle, remote_ssh_port, proxy_port, node_name, node_ssh_password, connect_timeout, onboarding)
+                backoff.reset()
+            except (OSError, asyncssh.Error):
+                if stop_event.is_set():
+                    break
+                # 처음 연결에 실패한 경우(계정 오류 등)는 재시도하지 않음
+                if tunnel_handle.reconnects == 0 or backoff.attempt >= TUNNEL_RECONNECT_MAX_ATTEMPTS:
+                    if is_current_tunnel(tunnel_handle):
+                        node_repository.queue_status(node_name, remote_ssh_port=None)
+                    raise
+            if stop_event.is_set():
+                break
+
+            # 연결이 끊김: 같은 포트로 재연결하고, 그동안 /route 요청은 잠시 대기
+            node_routing_table.set_reconnecting(node_name, True)
+            tunnel_handle.reconnects += 1
+            connect_timeout = 0
+            onboarding = None
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=backoff.next_delay())
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        # 터널이 끝나면 임대한 포트를 풀로 반환
+        for port_lease in port_leases:
+            port_allocator.release(port_lease)
+        # 새 터널로 교체된 경우에는 노드 상태를 새 터널에 맡김
+        if is_current_tunnel(tunnel_handle):
+            node_routing_table.set_reconnecting(node_name, False)
+            # 서비스 포트도 반환 (게이트웨이 종료 시에는 다시 연결하도록 남김)
+            if not server_node_app.state.shutting_down:
+                replace_node_services(node_name, {}, [])
+
+# 같은 노드의 새 터널로 교체되지 않은 터널인지
+def is_current_tunnel(tunnel_handle):
+    return tunnel_supervisor.get_handle(tunnel_handle.node_name) is tunnel_handle
+
+async def connect_node_ssh(remote_host, remote_ssh_port, node_name, node_ssh_password, connect_timeout, stop_event):
+    # /node/connect 에서는 노드의 리버스 포워딩이 아직 열리지 않았을 수 있으므로 잠시 재시도
+    # 그사이 터널이 종료(교체)되면 재시도하지 않음
+    deadline = asyncio.get_running_loop().time() + connect_timeout
+    retry_delay = 0.05
+    while True:
+        try:
+            # keepalive 로 끊긴 연결을 수 초 안에 감지
+            return await asyncssh.connect(
+                host=remote_host, port=remote_ssh_port, username=node_name, password=node_ssh_password,
+                options=TUNNEL_SSH_OPTIONS
+            )
+        except OSError:
+            if stop_event.is_set() or asyncio.get_running_loop().time() + retry_delay > deadline:
+                raise
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=retry_delay)
+            except asyncio.TimeoutError:
+                retry_delay = min(retry_delay * 2, TUNNEL_CONNECT_RETRY_MAX_DELAY)
+                continue
+            # 기다리는 중에 종료됨
+            raise
+
+async def run_reverse_ssh_tunnel(tunnel_handle, remote_ssh_port, proxy_port, node_name, node_ssh_password, connect_timeout=0, onboarding=None):
     # SSH 서버 정보
     remote_host = '127.0.0.1'
     local_socks_port = proxy_port
 
 
-    async with asyncssh.connect(host=remote_host, port=remote_ssh_port, username=node_name, password=node_password, known_hosts=None) as conn:
+    async with await connect_node_ssh(
+            remote_host, remote_ssh_port, node_name, node_ssh_password, connect_timeout, tunnel_handle.stop_event
+    ) as conn:
+        # 연결하는 사이 새 터널로 교체되었으면 노드 상태를 덮어쓰지 않고 종료
+        if tunnel_handle.stop_event.is_set():
+            return
+        onboarding_tracker.mark(onboarding, "ssh_connect")
         # 리버스 포트 포워딩 설정
-        ssh_listener = await conn.forward_socks("127.0.0.1", local_socks_port)
-        Node.update(proxy_port=proxy_port).where(Node.node_name == node_name).execute()
-        Node.update(connection_valid=True).where(Node.node_name == node_name).execute()
-
-        print(f'SOCKS Established')
-        # 연결 유지
-        while True:
-            node_instance = Node.select().where(Node.node_name == node_name).get()
-            if not node_instance.connection_valid:
-                break
-            await asyncio.sleep(1)  # 1시간 대기
-        ssh_listener.close()
-        print("disconnect")
+        ssh_listener = await conn.forward_socks("127.0.0.1", local_socks_port) if TUNNEL_SOCKS_LISTENER else None
+        onboarding_tracker.mark(onboarding, "socks_forward")
+        try:
+            # 상태가 바뀔 때만 DB 에 기록
+            tunnel_handle.established_at = time.monotonic()
+            await node_client_registry.open(node_name, proxy_port, conn)
+            node_routing_table.update(node_name, proxy_port=proxy_port, connection_valid=True)
+            node_routing_table.set_reconnecting(node_name, False)
+            node_repository.queue_status(node_name, remote_ssh_port=remote_ssh_port)
+            onboarding_tracker.mark(onboarding, "routable")
+
+            # 연결 유지: /node/disconnect 또는 SSH 연결 종료까지 대기
+            connection_closed = asyncio.create_task(conn.wait_closed())
+            stop_requested = asyncio.create_task(tunnel_handle.stop_event.wait())
+            await asyncio.wait([connection_closed, stop_requested], return_when=asyncio.FIRST_COMPLETED)
+            connection_closed.cancel()
+            stop_requested.cancel()
+        finally:
+            tunnel_handle.established_at = None
+            if ssh_listener is not None:
+                ssh_listener.close()
+            # 교체된 터널이 새 터널의 풀과 연결 상태를 지우지 않도록 함
+            if is_current_tunnel(tunnel_handle):
+                await node_client_registry.close(node_name)
+                node_routing_table.update(node_name, connection_valid=False)
 
 
 class RequestProxyModel(BaseModel):
     node_name: str
-    node_password: str
     remote_ssh_port: int
     proxy_port: int
 
 @server_node_app.post("/proxy/provide", response_model=MessageModel)
-async def request_proxy(request_proxy_model: RequestProxyModel, background_tasks: BackgroundTasks):
-    background_tasks.add_task(
-        create_reverse_ssh_tunnel,
-        node_name=request_proxy_model.node_name,
-        node_password=request_proxy_model.node_password,
-        remote_ssh_port=request_proxy_model.remote_ssh_port,
-        proxy_port=request_proxy_model.proxy_port
+async def request_proxy(request_proxy_model: RequestProxyModel, request: Request):
+    authorize_node(request, request_proxy_model.node_name)
+    node_ssh_password = await get_node_ssh_password(request_proxy_model.node_name)
+    onboarding = onboarding_tracker.begin(request_proxy_model.node_name)
+    # 노드가 사용할 포트를 임대로 확정 (다른 노드에 임대된 포트면 409)
+    try:
+        port_leases = port_allocator.claim_all(
+            [request_proxy_model.remote_ssh_port, request_proxy_model.proxy_port], request_proxy_model.node_name
+        )
+    except PortLeasedException as e:
+        raise HTTPException(status_code=409, detail=e.message)
+    tunnel_supervisor.start(
+        request_proxy_model.node_name,
+        functools.partial(
+            create_reverse_ssh_tunnel,
+            node_name=request_proxy_model.node_name,
+            node_ssh_password=node_ssh_password,
+            remote_ssh_port=request_proxy_model.remote_ssh_port,
+            proxy_port=request_proxy_model.proxy_port,
+            port_leases=port_leases,
+            onboarding=onboarding
+        )
     )
     # 진행 메시지
     return {
         "message": "Submit a proxy request "+str(request_proxy_model.proxy_port)
     }
 
-import socket
-import random
+class RequestNodeServicesModel(BaseModel):
+    node_name: str
+    # 서비스 이름 -> 노드가 리버스 포워딩한 게이트웨이 쪽 포트
+    services: Dict[str, int]
+
+@server_node_app.post("/node/services", response_model=MessageModel)
+async def post_node_services(request_node_services_model: RequestNodeServicesModel, request: Request):
+    node_name = request_node_services_model.node_name
+    authorize_node(request, node_name)
+    if node_name not in node_routing_table:
+        raise HTTPException(status_code=404, detail="Unknown node")
+
+    # 게이트웨이 호스트의 다른 포트(게이트웨이 API, sshd, DB 등)로 /route 요청이 가지 않도록
+    # 이 노드에 임대된 포트만 서비스 포트로 받음
+    services = request_node_services_model.services
+    port_allocator.expire_unclaimed()
+    for service_port in services.values():
+        port_lease = port_allocator.get_lease(service_port)
+        if port_lease is None or port_lease.owner != node_name:
+            raise HTTPException(status_code=403, detail=f"Port {service_port} is not leased to this node")
+    replace_node_services(node_name, services, port_allocator.claim_all(services.values(), node_name))
+    return {
+        "message": "Registered services " + ", ".join(services)
+    }
+
+def replace_node_services(node_name, services, service_leases):
+    # 이전 서비스 포트를 반환하고 새 포트로 교체 (빈 services 는 등록 해제)
+    for port_lease in node_service_leases.pop(node_name, []):
+        port_allocator.release(port_lease)
+    if service_leases:
+        node_service_leases[node_name] = service_leases
+    node_routing_table.set_services(node_name, services)
+    node_repository.queue_status(node_name, services=json.dumps(services) if services else None)
+
+def suspend_node_services(node_name):
+    for port_lease in node_service_leases.pop(node_name, []):
+        port_allocator.unclaim(port_lease)
+    node_routing_table.set_services(node_name, {})
+    node_repository.queue_status(node_name, services=None)
+
+class RequestNodeConnectModel(BaseModel):
+    node_name: str
+    # 같은 SSH 연결로 노출할 서비스 이름
+    services: List[str] = []
 
+class ResponseNodeConnectModel(BaseModel):
+    remote_ssh_port: int
+    proxy_port: int
+    services: Dict[str, int]
+
+# 토큰 확인, 포트 할당, 프록시 준비를 한 번에 처리
+# 게이트웨이 쪽 터널은 노드가 remote_ssh_port 리버스 포워딩을 열 때까지 기다렸다가 연결
+@server_node_app.post("/node/connect", response_model=ResponseNodeConnectModel)
+async def post_node_connect(request_node_connect_model: RequestNodeConnectModel, request: Request):
+    node_name = request_node_connect_model.node_name
+    authorize_node(request, node_name)
+    onboarding = onboarding_tracker.begin(node_name)
+    node_ssh_password = await get_node_ssh_password(node_name)
+    onboarding_tracker.mark(onboarding, "account_check")
+
+    port_leases = []
+    try:
+        for _ in range(2 + len(request_node_connect_model.services)):
+            port_leases.append(port_allocator.lease(node_name, claimed=True))
+    except PortExhaustedException as e:
+        for port_lease in port_leases:
+            port_allocator.release(port_lease)
+        raise HTTPException(status_code=503, detail=e.message)
+
+    remote_ssh_lease, proxy_lease, *service_leases = port_leases
+    onboarding_tracker.mark(onboarding, "port_lease")
+    services = {
+        service_name: service_lease.port
+        for service_name, service_lease in zip(request_node_connect_model.services, service_leases)
+    }
+    replace_node_services(node_name, services, service_leases)
+
+    tunnel_supervisor.start(
+        node_name,
+        functools.partial(
+            create_reverse_ssh_tunnel,
+            node_name=node_name,
+            node_ssh_password=node_ssh_password,
+            remote_ssh_port=remote_ssh_lease.port,
+            proxy_port=proxy_lease.port,
+            port_leases=[remote_ssh_lease, proxy_lease],
+            connect_timeout=TUNNEL_CONNECT_TIMEOUT,
+            onboarding=onboarding
+        )
+    )
+    return {
+        "remote_ssh_port": remote_ssh_lease.port,
+        "proxy_port": proxy_lease.port,
+        "services": services
+    }
+
+# 노드의 마지막 연결 과정 단계별 시간 (연결 요청부터 누적, 초)
+@server_node_app.get("/node/onboarding")
+async def get_node_onboarding(node_name: str):
+    trace = onboarding_tracker.get_trace(node_name)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No onboarding record")
+    return trace.to_dict()
+
+@server_node_app.get("/proxy/tunnel/status")
+async def get_proxy_tunnel_status():
+    return {
+        "active": len(tunnel_supervisor),
+        "nodes": tunnel_supervisor.get_active_nodes()
+    }
+
+@server_node_app.get("/proxy/pool/status")
+async def get_proxy_pool_status():
+    return node_client_registry.get_stats()
 
 class PortModel(BaseModel):
     port:int
 
 @server_node_app.get("/port/random", response_model=PortModel)
-def get_random_free_port():
-    while True:
-        port = random.randint(10000, 40000)  # 1024에서 65535 범위 내에서 랜덤 포트 선택
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.bind(("0.0.0.0", port))
-                return {
-                    "port": port
-                }# 포트가 사용 가능하면 반환
-            except OSError:
-                # 포트가 이미 사용 중이면 다음 랜덤 포트를 시도
-                continue
+async def get_random_free_port(request: Request, node_name: Optional[str] = None):
+    # node_name 을 주면 그 노드의 토큰으로 인증하고 임대. 임대한 포트는 /proxy/provide 로 확정되기 전까지 다른 요청에 나가지 않음
+    # 없으면 임대하지 않고 지금 비어 있는 포트만 알려줌
+    try:
+        if node_name is None:
+            return {
+                "port": port_allocator.peek()
+            }
+        authorize_node(request, node_name)
+        port_lease = port_allocator.lease(node_name)
+    except PortExhaustedException as e:
+        raise HTTPException(status_code=503, detail=e.message)
+    return {
+        "port": port_lease.port
+    }
+
+@server_node_app.get("/port/status")
+async def get_port_status():
+    return port_allocator.get_stats()
+
+# /route 워커(RouteWorker)용 라우팅 테이블 변경 목록 (long polling)
+@server_node_app.get("/routing/changes")
+async def get_routing_changes(epoch: Optional[str] = None, since: int = 0, timeout: float = 0):
+    return await node_routing_table.wait_changes(epoch, since, min(timeout, ROUTING_CHANGES_MAX_WAIT))
+
+class RequestGroupMemberModel(BaseModel):
+    node_name: str
+    # None 이면 그룹에서 제외
+    service_group: Optional[str] = None
+
+@server_node_app.post("/group/member", response_model=MessageModel)
+async def post_group_member(request_group_member_model: RequestGroupMemberModel, request: Request):
+    node_name = request_group_member_model.node_name
+    # 관리자이거나 그 노드의 토큰이어야 그룹을 바꿀 수 있음
+    if not is_admin(request):
+        authorize_node(request, node_name)
+    if node_name not in node_routing_table:
+        raise HTTPException(status_code=404, detail="Unknown node")
+    if request_group_member_model.service_group in node_routing_table:
+        raise HTTPException(status_code=409, detail="Service group name conflicts with a node name")
+    if node_routing_table.get(node_name).service_group != request_group_member_model.service_group:
+        # 이전 그룹에서 쌓인 부하 통계는 버리고 새 그룹에서 다시 쌓음
+        service_group_balancer.forget(node_name)
+    node_routing_table.update(node_name, service_group=request_group_member_model.service_group)
+    return {
+        "message": "success"
+    }
+
+@server_node_app.get("/group/status")
+async def get_group_status():
+    return {
+        "groups": node_routing_table.get_groups(),
+        "balancer": service_group_balancer.get_stats()
+    }
+
+@server_node_app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    pool_stats = node_client_registry.get_stats()
+    cache_stats = response_cache.get_stats()
+    port_stats = port_allocator.get_stats()
+    admission_stats = admission_controller.get_stats()
+    token_stats = node_token_store.get_stats()
+    return gateway_metrics.render(tunnel_supervisor.get_handles(), onboarding=onboarding_tracker, gauges=[
+        ("gateway_nodes", "Registered nodes.", len(node_routing_table)),
+        ("gateway_proxy_pools", "Open per-node SOCKS client pools.", pool_stats["nodes"]),
+        ("gateway_cache_entries", "Cached GET responses.", cache_stats["entries"]),
+        ("gateway_cache_bytes", "Bytes held by the response cache.", cache_stats["bytes"]),
+        ("gateway_node_tokens", "Valid node session tokens.", token_stats["tokens"]),
+        ("gateway_ports_leased", "Ports leased from the port pool.", port_stats["leased"]),
+        ("gateway_ports_reserved", "Free ports checked in advance for new nodes.", port_stats["reserved"]),
+    ], counters=[
+        ("gateway_proxy_pool_hits_total", "Requests that reused a node client pool.", pool_stats["hits"]),
+        ("gateway_proxy_pool_misses_total", "Requests that had to open a node client pool.", pool_stats["misses"]),
+        ("gateway_cache_hits_total", "Response cache hits.", cache_stats["hits"]),
+        ("gateway_route_rate_limited_total", "Requests rejected by rate limits.", admission_stats["rate_limited"]),
+        ("gateway_route_queued_total", "Requests that waited for a concurrency slot.", admission_stats["queued"]),
+        ("gateway_route_queue_rejected_total", "Requests rejected by a full or timed out queue.", admission_stats["queue_rejected"]),
+        ("gateway_node_tokens_issued_total", "Node session tokens issued at login.", token_stats["issued"]),
+        ("gateway_node_tokens_rejected_total", "Control requests with an invalid or expired token.", token_stats["rejected"]),
+    ])
+
+@server_node_app.get("/cache/status")
+async def get_cache_status():
+    return response_cache.get_stats()
+
+@server_node_app.get("/admission/status")
+async def get_admission_status():
+    return admission_controller.get_stats()
+
+class ResponseDrainModel(BaseModel):
+    draining: bool
+    in_flight: int
+    drained: bool
+
+# 새 /route 요청을 503 으로 돌려보내고 처리 중인 요청이 끝날 때까지 대기 (로드 밸런서에서 빼기 전에 호출)
+@server_node_app.post("/gateway/drain", response_model=ResponseDrainModel)
+async def post_gateway_drain(request: Request, timeout: float = GATEWAY_DRAIN_TIMEOUT):
+    authorize_admin(request)
+    admission_controller.start_drain()
+    drained = await admission_controller.wait_drained(min(timeout, GATEWAY_DRAIN_TIMEOUT))
+    return {
+        "draining": admission_controller.draining,
+        "in_flight": admission_controller.in_flight,
+        "drained": drained
+    }
+
+@server_node_app.post("/gateway/resume", response_model=ResponseDrainModel)
+async def post_gateway_resume(request: Request):
+    authorize_admin(request)
+    admission_controller.stop_drain()
+    return {
+        "draining": admission_controller.draining,
+        "in_flight": admission_controller.in_flight,
+        "drained": admission_controller.in_flight == 0
+    }
 
 @server_node_app.get("/route/{node_name}/{path:path}")
 async def proxy_get(node_name:str, path: str, request: Request):
-    node_instance = Node.select().where(Node.node_name == node_name).get()
-    route_port = node_instance.route_port
-    proxy_port = node_instance.proxy_port
-    proxy_url = f"socks5://localhost:{proxy_port}"
-    # 백엔드 API로 요청을 프록시 서버를 통해 전달
-    async with httpx.AsyncClient(proxies=proxy_url) as client:
-        # 원래 요청의 쿼리 파라미터 및 헤더를 백엔드로 전달
-        query_params = request.query_params
-        headers = dict(request.headers)
-        backend_response = await client.get(f"http://localhost:{route_port}/{path}", params=query_params, headers=headers)
-
-        return Response(
-            content=backend_response.content,
-            status_code=backend_response.status_code,
-            headers=dict(backend_response.headers)
-        )
+    return await route_forwarder.forward("GET", node_name, path, request, with_body=False)
 
 @server_node_app.post("/route/{node_name}/{path:path}")
 async def proxy_post(node_name:str, path: str, request: Request):
-    node_instance = Node.select().where(Node.node_name == node_name).get()
-    route_port = node_instance.route_port
-    proxy_port = node_instance.proxy_port
-    proxy_url = f"socks5://localhost:{proxy_port}"
-    # 백엔드 API로 요청을 프록시 서버를 통해 전달
-    async with httpx.AsyncClient(proxies=proxy_url) as client:
-        # 원래 요청의 쿼리 파라미터 및 헤더를 백엔드로 전달
-        query_params = request.query_params
-        headers = dict(request.headers)
-        # 요청 본문 읽기
-        body = await request.body()
-
-        # POST 요청을 백엔드로 전달
-        backend_response = await client.post(
-            url=f"http://localhost:{route_port}/{path}",
-            headers=headers,
-            params=query_params,
-            content=body
-        )
-
-        return Response(
-            content=backend_response.content,
-            status_code=backend_response.status_code,
-            headers=dict(backend_response.headers)
-        )
+    return await route_forwarder.forward("POST", node_name, path, request, with_body=True)
 
 # PATCH 요청을 처리하는 프록시 엔드포인트
 @server_node_app.patch("/route/{node_name}/{path:path}")
 async def proxy_patch(node_name: str, path: str, request: Request):
-    # 데이터베이스에서 노드 정보 가져오기
-    node_instance = Node.select().where(Node.node_name == node_name).get()
-    route_port = node_instance.route_port
-    proxy_port = node_instance.proxy_port
-    proxy_url = f"socks5://localhost:{proxy_port}"
-
-    # 프록시 서버를 통해 PATCH 요청 전송
-    async with httpx.AsyncClient(proxies=proxy_url) as client:
-        query_params = request.query_params
-        headers = dict(request.headers)
-        body = await request.body()
-
-        backend_response = await client.patch(
-            url=f"http://localhost:{route_port}/{path}",
-            headers=headers,
-            params=query_params,
-            content=body
-        )
-
-        return Response(
-            content=backend_response.content,
-            status_code=backend_response.status_code,
-            headers=dict(backend_response.headers)
-        )
+    return await route_forwarder.forward("PATCH", node_name, path, request, with_body=True)
 
 # DELETE 요청을 처리하는 프록시 엔드포인트
 @server_node_app.delete("/route/{node_name}/{path:path}")
 async def proxy_delete(node_name: str, path: str, request: Request):
-    # 데이터베이스에서 노드 정보 가져오기
-    node_instance = Node.select().where(Node.node_name == node_name).get()
-    route_port = node_instance.route_port
-    proxy_port = node_instance.proxy_port
-    proxy_url = f"socks5://localhost:{proxy_port}"
-
-    # 프록시 서버를 통해 DELETE 요청 전송
-    async with httpx.AsyncClient(proxies=proxy_url) as client:
-        query_params = request.query_params
-        headers = dict(request.headers)
-
-        backend_response = await client.delete(
-            url=f"http://localhost:{route_port}/{path}",
-            headers=headers,
-            params=query_params
-        )
+    return await route_forwarder.forward("DELETE", node_name, path, request, with_body=False)
+
+# PUT 요청을 처리하는 프록시 엔드포인트
+@server_node_app.put("/route/{node_name}/{path:path}")
+async def proxy_put(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("PUT", node_name, path, request, with_body=True)
+
+@server_node_app.head("/route/{node_name}/{path:path}")
+async def proxy_head(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("HEAD", node_name, path, request, with_body=False)
+
+@server_node_app.options("/route/{node_name}/{path:path}")
+async def proxy_options(node_name: str, path: str, request: Request):
+    return await route_forwarder.forward("OPTIONS", node_name, path, request, with_body=False)
+
+# WebSocket 은 노드 터널을 통해 양방향으로 중계
+@server_node_app.websocket("/route/{node_name}/{path:path}")
+async def proxy_websocket(node_name: str, path: str, websocket: WebSocket):
+    await route_forwarder.forward_websocket(node_name, path, websocket)
 
-        return Response(
-            content=backend_response.content,
-            status_code=backend_response.status_code,
-            headers=dict(backend_response.headers)
-        )
 if __name__ == '__main__':
-    uvicorn.run(server_node_app, host='0.0.0.0', port=58000)
+    run_server(
+        server_node_app, host='0.0.0.0', port=58000, shutdown_timeout=GATEWAY_DRAIN_TIMEOUT,
+        on_shutdown=begin_gateway_shutdown
+    )
@@ -0,0 +1,151 @@
+import os
+import random
+import time
+
+
+class NodeLoadStats:
+    def __init__(self):
+        self.outstanding = 0
+        # 응답 헤더까지 걸린 시간의 지수 이동 평균 (초)
+        self.ewma_latency = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+
+# 같은 서비스 그룹에 속한 노드들로 /route 요청을 분산
+# least_outstanding: 처리 중인 요청이 가장 적은 노드
+# ewma: 지연시간 EWMA * (처리 중 요청 + 1) 이 가장 작은 노드
+# 연속 실패나 느린 노드는 일정 시간 후보에서 제외 (passive ejection)
+class ServiceGroupBalancer:
+    POLICIES = ("least_outstanding", "ewma")
+
+    def __init__(
+            self,
+            policy=None,
+            max_outstanding=None,
+            eject_failures=None,
+            eject_duration=None,
+            slow_threshold=None,
+            ewma_decay=None,
+            clock=time.monotonic
+    ):
+        self.__policy = policy if policy is not None \
+            else os.getenv('SERVICE_GROUP_POLICY', 'least_outstanding')
+        if self.__policy not in self.POLICIES:
+            raise ValueError(f"Unknown balancing policy: {self.__policy}")
+        # 노드별 동시 요청 상한 (0 이면 제한 없음)
+        self.__max_outstanding = max_outstanding if max_outstanding is not None \
+            else int(os.getenv('SERVICE_GROUP_MAX_OUTSTANDING', '0'))
+        self.__eject_failures = eject_failures if eject_failures is not None \
+            else int(os.getenv('SERVICE_GROUP_EJECT_FAILURES', '5'))
+        self.__eject_duration = eject_duration if eject_duration is not None \
+            else float(os.getenv('SERVICE_GROUP_EJECT_DURATION', '30'))
+        # 지연시간 EWMA 가 이 값(초)을 넘으면 제외 (0 이면 사용하지 않음)
+        self.__slow_threshold = slow_threshold if slow_threshold is not None \
+            else float(os.getenv('SERVICE_GROUP_SLOW_THRESHOLD', '0'))
+        self.__ewma_decay = ewma_decay if ewma_decay is not None \
+            else float(os.getenv('SERVICE_GROUP_EWMA_DECAY', '0.3'))
+        self.__clock = clock
+
+        self.__stats = {}
+        self.__rejected = 0
+
+    @property
+    def policy(self):
+        return self.__policy
+
+    def get_node_stats(self, node_name):
+        stats = self.__stats.get(node_name)
+        if stats is None:
+            stats = NodeLoadStats()
+            self.__stats[node_name] = stats
+        return stats
+
+    def is_ejected(self, node_name):
+        stats = self.__stats.get(node_name)
+        return stats is not None and stats.ejected_until > self.__clock()
+
+    def __get_score(self, stats):
+        if self.__policy == "ewma":
+            # 아직 측정값이 없는 노드는 먼저 시도되도록 0 으로 취급
+            return (stats.ewma_latency or 0.0) * (stats.outstanding + 1)
+        return stats.outstanding
+
+    def select(self, node_names):
+        available = [
+            node_name for node_name in node_names
+            if self.__max_outstanding <= 0 or self.get_node_stats(node_name).outstanding < self.__max_outstanding
+        ]
+        candidates = [node_name for node_name in available if not self.is_ejected(node_name)]
+        if not candidates:
+            # 모두 제외된 경우에는 요청을 버리지 않고 제외된 노드라도 사용
+            candidates = available
+        if not candidates:
+            self.__rejected += 1
+            return None
+
+        # 점수가 같은 노드끼리는 무작위로 골라 한 노드에 몰리지 않도록 함
+        best_score = min(self.__get_score(self.get_node_stats(node_name)) for node_name in candidates)
+        return random.choice([
+            node_name for node_name in candidates
+            if self.__get_score(self.get_node_stats(node_name)) == best_score
+        ])
+
+    def begin(self, node_name):
+        stats = self.get_node_stats(node_name)
+        stats.outstanding += 1
+        stats.requests += 1
+
+    def record_latency(self, node_name, latency):
+        stats = self.get_node_stats(node_name)
+        if stats.ewma_latency is None:
+            stats.ewma_latency = latency
+        else:
+            stats.ewma_latency += self.__ewma_decay * (latency - stats.ewma_latency)
+
+    def end(self, node_name, failed=False):
+        stats = self.get_node_stats(node_name)
+        stats.outstanding = max(stats.outstanding - 1, 0)
+        if failed:
+            stats.failures += 1
+            stats.consecutive_failures += 1
+        else:
+            stats.consecutive_failures = 0
+
+        slow = self.__slow_threshold > 0 and stats.ewma_latency is not None \
+            and stats.ewma_latency > self.__slow_threshold
+        if stats.consecutive_failures >= self.__eject_failures or slow:
+            self.eject(node_name)
+
+    def eject(self, node_name):
+        stats = self.get_node_stats(node_name)
+        if stats.ejected_until <= self.__clock():
+            stats.ejections += 1
+        stats.ejected_until = self.__clock() + self.__eject_duration
+        stats.consecutive_failures = 0
+        # 복귀 후 예전 지연시간으로 다시 제외되지 않도록 초기화
+        stats.ewma_latency = None
+
+    def forget(self, node_name):
+        self.__stats.pop(node_name, None)
+
+    def get_stats(self):
+        return {
+            "policy": self.__policy,
+            "max_outstanding": self.__max_outstanding,
+            "rejected": self.__rejected,
+            "nodes": {
+                node_name: {
+                    "outstanding": stats.outstanding,
+                    "ewma_latency": stats.ewma_latency,
+                    "requests": stats.requests,
+                    "failures": stats.failures,
+                    "ejections": stats.ejections,
+                    "ejected": self.is_ejected(node_name),
+                }
+                for node_name, stats in self.__stats.items()
+            },
+        }
@@ -0,0 +1,96 @@
+import unittest
+from server.ServiceGroupBalancer import ServiceGroupBalancer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestServiceGroupBalancer(unittest.TestCase):
+
+    def test_least_outstanding_spreads_requests(self):
+        balancer = ServiceGroupBalancer(policy="least_outstanding", max_outstanding=0)
+        nodes = ["node-a", "node-b", "node-c"]
+
+        selected = []
+        for _ in range(6):
+            node_name = balancer.select(nodes)
+            balancer.begin(node_name)
+            selected.append(node_name)
+
+        # 처리 중인 요청이 고르게 나뉨
+        self.assertEqual(sorted(selected), sorted(nodes * 2))
+
+        balancer.end("node-b")
+        self.assertEqual(balancer.select(nodes), "node-b")
+
+    def test_ewma_prefers_faster_node(self):
+        balancer = ServiceGroupBalancer(policy="ewma", max_outstanding=0)
+        balancer.record_latency("node-a", 0.5)
+        balancer.record_latency("node-b", 0.05)
+
+        self.assertEqual(balancer.select(["node-a", "node-b"]), "node-b")
+
+        # 느린 노드라도 빠른 노드에 요청이 충분히 몰리면 선택됨
+        for _ in range(10):
+            balancer.begin("node-b")
+        self.assertEqual(balancer.select(["node-a", "node-b"]), "node-a")
+
+    def test_concurrency_cap(self):
+        balancer = ServiceGroupBalancer(max_outstanding=1)
+        balancer.begin("node-a")
+        self.assertEqual(balancer.select(["node-a", "node-b"]), "node-b")
+
+        balancer.begin("node-b")
+        self.assertIsNone(balancer.select(["node-a", "node-b"]))
+        self.assertEqual(balancer.get_stats()["rejected"], 1)
+
+    def test_consecutive_failures_eject_node(self):
+        clock = FakeClock()
+        balancer = ServiceGroupBalancer(max_outstanding=0, eject_failures=2, eject_duration=10, clock=clock)
+
+        for _ in range(2):
+            balancer.begin("node-a")
+            balancer.end("node-a", failed=True)
+        self.assertTrue(balancer.is_ejected("node-a"))
+        for _ in range(5):
+            self.assertEqual(balancer.select(["node-a", "node-b"]), "node-b")
+
+        # 모두 제외되면 제외된 노드라도 사용
+        self.assertEqual(balancer.select(["node-a"]), "node-a")
+
+        clock.now = 11
+        self.assertFalse(balancer.is_ejected("node-a"))
+        self.assertEqual(balancer.get_stats()["nodes"]["node-a"]["ejections"], 1)
+
+    def test_slow_node_is_ejected(self):
+        balancer = ServiceGroupBalancer(max_outstanding=0, slow_threshold=1.0)
+        balancer.begin("node-a")
+        balancer.record_latency("node-a", 2.0)
+        balancer.end("node-a")
+
+        self.assertTrue(balancer.is_ejected("node-a"))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            ServiceGroupBalancer(policy="round_robin")
+
+
+    def test_forget_drops_node_stats(self):
+        balancer = ServiceGroupBalancer(max_outstanding=0, eject_failures=1)
+        balancer.begin("node-a")
+        balancer.end("node-a", failed=True)
+        self.assertTrue(balancer.is_ejected("node-a"))
+
+        # 그룹에서 빠진 노드는 통계에서 제외되고, 다시 들어오면 새로 시작합니다.
+        balancer.forget("node-a")
+        self.assertNotIn("node-a", balancer.get_stats()["nodes"])
+        self.assertFalse(balancer.is_ejected("node-a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import random
+import time
+
+
+class TunnelHandle:
+    def __init__(self, node_name):
+        self.node_name = node_name
+        self.stop_event = asyncio.Event()
+        self.task = None
+        # 현재 SSH 연결이 맺어진 시각 (끊긴 동안은 None)
+        self.established_at = None
+        self.reconnects = 0
+
+    def get_uptime(self):
+        if self.established_at is None:
+            return 0.0
+        return time.monotonic() - self.established_at
+
+
+# 재연결 대기 시간: 지수적으로 늘리되 절반은 무작위로 흩어 동시에 재접속하지 않도록 함
+class ReconnectBackoff:
+    def __init__(self, base_delay=None, max_delay=None):
+        self.__base_delay = base_delay if base_delay is not None \
+            else float(os.getenv('TUNNEL_RECONNECT_BASE_DELAY', '0.5'))
+        self.__max_delay = max_delay if max_delay is not None \
+            else float(os.getenv('TUNNEL_RECONNECT_MAX_DELAY', '30'))
+        self.__attempt = 0
+
+    @property
+    def attempt(self):
+        return self.__attempt
+
+    def next_delay(self):
+        delay = min(self.__max_delay, self.__base_delay * (2 ** self.__attempt))
+        self.__attempt += 1
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def reset(self):
+        self.__attempt = 0
+
+
+# 노드별 터널 태스크와 종료 이벤트를 관리
+# DB 를 주기적으로 확인하는 대신 /node/disconnect 가 이벤트를 직접 set 한다
+class TunnelSupervisor:
+    def __init__(self):
+        self.__tunnels = {}
+
+    def start(self, node_name, tunnel_factory):
+        # 같은 노드의 이전 터널은 종료 신호를 보내고 새 터널로 교체
+        self.stop(node_name)
+
+        handle = TunnelHandle(node_name)
+        handle.task = asyncio.create_task(self.__run(handle, tunnel_factory))
+        self.__tunnels[node_name] = handle
+        return handle
+
+    async def __run(self, handle, tunnel_factory):
+        try:
+            await tunnel_factory(handle)
+        finally:
+            if self.__tunnels.get(handle.node_name) is handle:
+                del self.__tunnels[handle.node_name]
+
+    def stop(self, node_name):
+        handle = self.__tunnels.get(node_name)
+        if handle is None:
+            return False
+        handle.stop_event.set()
+        return True
+
+    async def wait_stopped(self, node_name):
+        handle = self.__tunnels.get(node_name)
+        if handle is not None:
+            await asyncio.gather(handle.task, return_exceptions=True)
+
+    async def stop_all(self):
+        handles = list(self.__tunnels.values())
+        for handle in handles:
+            handle.stop_event.set()
+        await asyncio.gather(*(handle.task for handle in handles), return_exceptions=True)
+
+    def is_active(self, node_name):
+        return node_name in self.__tunnels
+
+    def get_active_nodes(self):
+        return list(self.__tunnels)
+
+    def get_handle(self, node_name):
+        return self.__tunnels.get(node_name)
+
+    def get_handles(self):
+        return list(self.__tunnels.values())
+
+    def __len__(self):
+        return len(self.__tunnels)
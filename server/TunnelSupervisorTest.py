@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+from server.TunnelSupervisor import TunnelSupervisor, ReconnectBackoff
+
+
+class TestTunnelSupervisor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stop_signals_tunnel_immediately(self):
+        supervisor = TunnelSupervisor()
+        events = []
+
+        async def tunnel(handle):
+            events.append("established")
+            await handle.stop_event.wait()
+            events.append("teardown")
+
+        supervisor.start("node-a", tunnel)
+        await asyncio.sleep(0)
+        self.assertTrue(supervisor.is_active("node-a"))
+
+        # 종료 신호 이후 폴링 주기 없이 바로 정리됩니다.
+        self.assertTrue(supervisor.stop("node-a"))
+        await asyncio.wait_for(supervisor.wait_stopped("node-a"), timeout=0.1)
+
+        self.assertEqual(events, ["established", "teardown"])
+        self.assertFalse(supervisor.is_active("node-a"))
+        self.assertFalse(supervisor.stop("node-a"))
+
+    async def test_restart_replaces_previous_tunnel(self):
+        supervisor = TunnelSupervisor()
+        stopped = []
+
+        async def tunnel(handle):
+            await handle.stop_event.wait()
+            stopped.append(handle.stop_event)
+
+        first = supervisor.start("node-a", tunnel)
+        second = supervisor.start("node-a", tunnel)
+        await asyncio.wait_for(first.task, timeout=0.1)
+
+        self.assertEqual(stopped, [first.stop_event])
+        self.assertTrue(supervisor.is_active("node-a"))
+
+        await supervisor.stop_all()
+        self.assertTrue(second.task.done())
+        self.assertEqual(len(supervisor), 0)
+
+    async def test_failed_tunnel_is_removed(self):
+        supervisor = TunnelSupervisor()
+
+        async def tunnel(handle):
+            raise OSError("connection refused")
+
+        handle = supervisor.start("node-a", tunnel)
+        await asyncio.gather(handle.task, return_exceptions=True)
+        self.assertFalse(supervisor.is_active("node-a"))
+
+
+class TestReconnectBackoff(unittest.TestCase):
+
+    def test_delay_grows_with_jitter_and_cap(self):
+        backoff = ReconnectBackoff(base_delay=1, max_delay=8)
+        delays = [backoff.next_delay() for _ in range(6)]
+
+        for delay, limit in zip(delays, [1, 2, 4, 8, 8, 8]):
+            self.assertGreaterEqual(delay, limit / 2)
+            self.assertLessEqual(delay, limit)
+
+        backoff.reset()
+        self.assertLessEqual(backoff.next_delay(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
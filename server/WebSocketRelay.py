@@ -0,0 +1,142 @@
+import asyncio
+import base64
+import hashlib
+import os
+
+import httpcore
+from fastapi import WebSocket
+from starlette.websockets import WebSocketDisconnect
+from wsproto.connection import Connection, ConnectionType, ConnectionState
+from wsproto.events import BytesMessage, CloseConnection, Message, Ping, TextMessage
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+RELAY_READ_SIZE = 64 * 1024
+# 핸드셰이크는 게이트웨이가 새로 만들고, 확장(permessage-deflate 등)은 백엔드와 협상하지 않음
+SKIPPED_HANDSHAKE_HEADERS = {
+    "host", "connection", "upgrade", "sec-websocket-key", "sec-websocket-version",
+    "sec-websocket-extensions", "sec-websocket-accept", "content-length", "transfer-encoding",
+}
+
+
+class WebSocketRelayException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def get_accept_key(key):
+    return base64.b64encode(hashlib.sha1(key.encode() + WEBSOCKET_GUID).digest()).decode()
+
+
+# /route/{node_name}/{path} WebSocket 중계
+# 노드 클라이언트(SOCKS 풀)로 Upgrade 요청을 보내고, 101 응답 이후의 연결을 그대로 받아 양방향으로 전달
+# 한쪽 전송이 끝나야 다음 메시지를 읽으므로 느린 쪽에 맞춰 속도가 조절됨
+class WebSocketRelay:
+    def __init__(self, websocket: WebSocket, client, backend_url):
+        self.__websocket = websocket
+        self.__client = client
+        self.__backend_url = backend_url
+        self.__connection = Connection(ConnectionType.CLIENT)
+        self.__network_stream = None
+
+    def get_handshake_headers(self, key):
+        headers = [
+            (name, value) for name, value in self.__websocket.headers.items()
+            if name not in SKIPPED_HANDSHAKE_HEADERS
+        ]
+        headers += [
+            ("connection", "Upgrade"),
+            ("upgrade", "websocket"),
+            ("sec-websocket-version", "13"),
+            ("sec-websocket-key", key),
+        ]
+        return headers
+
+    async def run(self):
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = self.__client.build_request(
+            "GET",
+            self.__backend_url,
+            params=self.__websocket.query_params,
+            headers=self.get_handshake_headers(key)
+        )
+        response = await self.__client.send(request, stream=True)
+        try:
+            if response.status_code != 101:
+                raise WebSocketRelayException(f"Backend refused upgrade: {response.status_code}")
+            if response.headers.get("sec-websocket-accept") != get_accept_key(key):
+                raise WebSocketRelayException("Invalid Sec-WebSocket-Accept")
+
+            self.__network_stream = response.extensions["network_stream"]
+            await self.__websocket.accept(subprotocol=response.headers.get("sec-websocket-protocol"))
+
+            caller_to_backend = asyncio.create_task(self.__pump_caller_to_backend())
+            backend_to_caller = asyncio.create_task(self.__pump_backend_to_caller())
+            try:
+                await asyncio.wait([caller_to_backend, backend_to_caller], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                caller_to_backend.cancel()
+                backend_to_caller.cancel()
+                await asyncio.gather(caller_to_backend, backend_to_caller, return_exceptions=True)
+        finally:
+            await response.aclose()
+
+    async def __send_backend(self, event):
+        await self.__network_stream.write(self.__connection.send(event))
+
+    async def __pump_caller_to_backend(self):
+        try:
+            while True:
+                message = await self.__websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    if self.__connection.state is ConnectionState.OPEN:
+                        await self.__send_backend(CloseConnection(code=message.get("code", 1000)))
+                    return
+                if message.get("text") is not None:
+                    await self.__send_backend(TextMessage(data=message["text"]))
+                elif message.get("bytes") is not None:
+                    await self.__send_backend(BytesMessage(data=message["bytes"]))
+        except (httpcore.NetworkError, OSError, WebSocketDisconnect):
+            pass
+
+    async def __pump_backend_to_caller(self):
+        # 조각난 메시지는 모아서 한 번에 전달 (ASGI 는 메시지 단위)
+        fragments = []
+        close_code = 1000
+        try:
+            while True:
+                data = await self.__network_stream.read(RELAY_READ_SIZE)
+                if not data:
+                    close_code = 1006
+                    break
+                self.__connection.receive_data(data)
+                for event in self.__connection.events():
+                    if isinstance(event, Message):
+                        fragments.append(event.data)
+                        if not event.message_finished:
+                            continue
+                        if isinstance(event, TextMessage):
+                            await self.__websocket.send_text("".join(fragments))
+                        else:
+                            await self.__websocket.send_bytes(b"".join(fragments))
+                        fragments = []
+                    elif isinstance(event, Ping):
+                        await self.__send_backend(event.response())
+                    elif isinstance(event, CloseConnection):
+                        close_code = event.code
+                        if self.__connection.state is ConnectionState.REMOTE_CLOSING:
+                            await self.__send_backend(event.response())
+                        await self.__close_caller(close_code)
+                        return
+        except (httpcore.NetworkError, OSError):
+            close_code = 1011
+        await self.__close_caller(close_code)
+
+    async def __close_caller(self, code):
+        # 1005/1006 같은 예약 코드는 실제 종료 프레임에 쓸 수 없음
+        if code in (1005, 1006, 1015):
+            code = 1011 if code == 1006 else 1000
+        try:
+            await self.__websocket.close(code=code)
+        except RuntimeError:
+            pass
@@ -0,0 +1,287 @@
+import asyncio
+import os
+import sys
+import unittest
+
+import httpx
+from fastapi import WebSocketException
+from wsproto.connection import Connection, ConnectionType
+from wsproto.events import BytesMessage, CloseConnection, Ping, Pong, TextMessage
+
+# RouteForwarder 는 같은 폴더의 모듈을 바로 import 하므로 server 폴더를 경로에 추가
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from RouteForwarder import RouteForwarder
+from WebSocketRelay import WebSocketRelay, WebSocketRelayException, get_accept_key
+
+
+# 101 응답 이후의 백엔드 연결. 백엔드 쪽 wsproto 로 프레임을 만들고 받은 이벤트를 기록
+class FakeNetworkStream:
+    def __init__(self):
+        self.backend = Connection(ConnectionType.SERVER)
+        self.incoming = asyncio.Queue()
+        self.received = []
+
+    async def read(self, max_bytes):
+        return await self.incoming.get()
+
+    async def write(self, data):
+        self.backend.receive_data(data)
+        self.received.extend(self.backend.events())
+
+    def send(self, event):
+        self.incoming.put_nowait(self.backend.send(event))
+
+    def send_raw(self, data):
+        self.incoming.put_nowait(data)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers, network_stream):
+        self.status_code = status_code
+        self.headers = httpx.Headers(headers)
+        self.extensions = {"network_stream": network_stream}
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self, status_code=101, accept_key=None):
+        self.status_code = status_code
+        self.accept_key = accept_key
+        self.network_stream = FakeNetworkStream()
+        self.request = None
+        self.response = None
+
+    def build_request(self, method, url, params=None, headers=None):
+        return httpx.Request(method, url, params=params, headers=headers)
+
+    async def send(self, request, stream=False):
+        self.request = request
+        accept_key = self.accept_key or get_accept_key(request.headers["sec-websocket-key"])
+        self.response = FakeResponse(self.status_code, {"sec-websocket-accept": accept_key}, self.network_stream)
+        return self.response
+
+
+# 게이트웨이로 들어온 쪽 WebSocket (ASGI 메시지 단위)
+class FakeWebSocket:
+    def __init__(self):
+        self.headers = {"host": "gateway", "x-trace": "1"}
+        self.query_params = {"q": "1"}
+        self.client = ("127.0.0.1", 50000)
+        self.incoming = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.accepted = False
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        self.accepted = True
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, data):
+        self.sent.put_nowait(data)
+
+    async def send_bytes(self, data):
+        self.sent.put_nowait(data)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+class TestWebSocketRelay(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.websocket = FakeWebSocket()
+
+    async def run_relay(self, client):
+        return await asyncio.wait_for(WebSocketRelay(self.websocket, client, "http://backend/ws").run(), 5)
+
+    async def test_refused_upgrade(self):
+        client = FakeClient(status_code=403)
+
+        with self.assertRaises(WebSocketRelayException) as context:
+            await self.run_relay(client)
+        self.assertEqual(context.exception.message, "Backend refused upgrade: 403")
+        self.assertFalse(self.websocket.accepted)
+        self.assertTrue(client.response.closed)
+
+    async def test_wrong_accept_key(self):
+        client = FakeClient(accept_key=get_accept_key("other-key"))
+
+        with self.assertRaises(WebSocketRelayException) as context:
+            await self.run_relay(client)
+        self.assertEqual(context.exception.message, "Invalid Sec-WebSocket-Accept")
+        self.assertFalse(self.websocket.accepted)
+        self.assertTrue(client.response.closed)
+
+    async def test_handshake_headers(self):
+        client = FakeClient()
+        client.network_stream.send(CloseConnection(code=1000))
+        await self.run_relay(client)
+
+        headers = client.request.headers
+        self.assertEqual(headers["upgrade"], "websocket")
+        self.assertEqual(headers["x-trace"], "1")
+        self.assertNotEqual(headers["host"], "gateway")
+        self.assertEqual(client.request.url.params["q"], "1")
+
+    async def test_fragmented_messages_are_reassembled(self):
+        client = FakeClient()
+        stream = client.network_stream
+        stream.send(TextMessage(data="hel", message_finished=False))
+        stream.send(TextMessage(data="lo", message_finished=True))
+        stream.send(BytesMessage(data=b"\x00\x01", message_finished=False))
+        stream.send(BytesMessage(data=b"\x02", message_finished=True))
+        stream.send(CloseConnection(code=1000))
+        await self.run_relay(client)
+
+        self.assertTrue(self.websocket.accepted)
+        self.assertEqual(self.websocket.sent.get_nowait(), "hello")
+        self.assertEqual(self.websocket.sent.get_nowait(), b"\x00\x01\x02")
+        self.assertTrue(self.websocket.sent.empty())
+        self.assertTrue(client.response.closed)
+
+    async def test_ping_is_answered_with_pong(self):
+        client = FakeClient()
+        client.network_stream.send(Ping(payload=b"beat"))
+        client.network_stream.send(CloseConnection(code=1000))
+        await self.run_relay(client)
+
+        pongs = [event for event in client.network_stream.received if isinstance(event, Pong)]
+        self.assertEqual([pong.payload for pong in pongs], [b"beat"])
+        self.assertTrue(self.websocket.sent.empty())
+
+    async def test_caller_messages_reach_backend(self):
+        client = FakeClient()
+        relay = asyncio.create_task(self.run_relay(client))
+        self.websocket.incoming.put_nowait({"type": "websocket.receive", "text": "hi"})
+        self.websocket.incoming.put_nowait({"type": "websocket.receive", "bytes": b"\x01"})
+        self.websocket.incoming.put_nowait({"type": "websocket.disconnect", "code": 1001})
+        await relay
+
+        received = client.network_stream.received
+        self.assertEqual(
+            [(type(event), getattr(event, "data", None)) for event in received[:2]],
+            [(TextMessage, "hi"), (BytesMessage, b"\x01")]
+        )
+        self.assertIsInstance(received[2], CloseConnection)
+        self.assertEqual(received[2].code, 1001)
+
+    async def test_close_code_is_passed_to_caller(self):
+        client = FakeClient()
+        client.network_stream.send(CloseConnection(code=4001, reason="bye"))
+        await self.run_relay(client)
+
+        self.assertEqual(self.websocket.close_code, 4001)
+        # 백엔드가 보낸 종료에 응답
+        self.assertIsInstance(client.network_stream.received[-1], CloseConnection)
+
+    async def test_close_without_status_code(self):
+        client = FakeClient()
+        # 상태 코드 없는 종료 프레임은 1005 로 받으며, 실제 종료 프레임에는 쓸 수 없으므로 1000 으로 닫음
+        client.network_stream.send_raw(b"\x88\x00")
+        await self.run_relay(client)
+
+        self.assertEqual(self.websocket.close_code, 1000)
+
+    async def test_abnormal_close(self):
+        client = FakeClient()
+        client.network_stream.send(TextMessage(data="last"))
+        # 종료 프레임 없이 연결이 끊기면 1006 이므로 1011 로 닫음
+        client.network_stream.send_raw(b"")
+        await self.run_relay(client)
+
+        self.assertEqual(self.websocket.sent.get_nowait(), "last")
+        self.assertEqual(self.websocket.close_code, 1011)
+
+
+class FakeRoute:
+    def __init__(self, node_name):
+        self.node_name = node_name
+        self.services = {}
+        self.connection_valid = True
+        self.proxy_port = 1080
+        self.route_port = 8000
+        self.reconnecting = False
+
+
+class FakeRoutingTable:
+    def __init__(self, routes):
+        self.routes = {route.node_name: route for route in routes}
+
+    def get(self, node_name):
+        return self.routes.get(node_name)
+
+    def get_group(self, service_group):
+        return []
+
+
+class FakeClientRegistry:
+    def __init__(self, client):
+        self.client = client
+        self.released = []
+
+    async def get_http1_client(self, node_name, proxy_port):
+        return self.client
+
+    def release(self, node_name, client):
+        self.released.append((node_name, client))
+
+
+class TestForwardWebSocket(unittest.IsolatedAsyncioTestCase):
+
+    def create_forwarder(self, client):
+        self.client_registry = FakeClientRegistry(client)
+        return RouteForwarder(
+            FakeRoutingTable([FakeRoute("node-a")]), self.client_registry, None, None, hold_timeout=0
+        )
+
+    async def test_unknown_node(self):
+        forwarder = self.create_forwarder(FakeClient())
+
+        with self.assertRaises(WebSocketException) as context:
+            await forwarder.forward_websocket("node-b", "ws", FakeWebSocket())
+        self.assertEqual(context.exception.code, 1008)
+
+    async def test_relay_to_node(self):
+        client = FakeClient()
+        client.network_stream.send(TextMessage(data="hello"))
+        client.network_stream.send(CloseConnection(code=1000))
+        forwarder = self.create_forwarder(client)
+        websocket = FakeWebSocket()
+        await asyncio.wait_for(forwarder.forward_websocket("node-a", "ws", websocket), 5)
+
+        self.assertEqual(str(client.request.url), "http://localhost:8000/ws?q=1")
+        self.assertEqual(websocket.sent.get_nowait(), "hello")
+        self.assertEqual(websocket.close_code, 1000)
+        self.assertEqual(self.client_registry.released, [("node-a", client)])
+
+    async def test_refused_upgrade_closes_with_1011(self):
+        client = FakeClient(status_code=502)
+        forwarder = self.create_forwarder(client)
+
+        with self.assertRaises(WebSocketException) as context:
+            await forwarder.forward_websocket("node-a", "ws", FakeWebSocket())
+        self.assertEqual(context.exception.code, 1011)
+        self.assertEqual(context.exception.reason, "Backend refused upgrade: 502")
+        # 실패해도 노드 풀은 사용 중에서 빠짐
+        self.assertEqual(self.client_registry.released, [("node-a", client)])
+
+    async def test_wrong_accept_key_closes_with_1011(self):
+        client = FakeClient(accept_key="invalid")
+        forwarder = self.create_forwarder(client)
+
+        with self.assertRaises(WebSocketException) as context:
+            await forwarder.forward_websocket("node-a", "ws", FakeWebSocket())
+        self.assertEqual(context.exception.code, 1011)
+        self.assertEqual(context.exception.reason, "Invalid Sec-WebSocket-Accept")
+
+
+if __name__ == "__main__":
+    unittest.main()